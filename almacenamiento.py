@@ -0,0 +1,726 @@
+import json
+import queue
+import re
+import sqlite3
+import threading
+import time
+
+# ─────────────────────────────────────────
+#  ALMACENAMIENTO PERSISTENTE (SQLite, WAL)
+# ─────────────────────────────────────────
+# Las lecturas calientes (¿ya postuló?, id del DM, postulaciones de chat en
+# curso) salen de caché en memoria. Las escrituras se aplican primero en la
+# caché y después las persiste un único hilo escritor, que agrupa todo lo
+# pendiente en una sola transacción. Las sentencias de una misma escritura van
+# siempre juntas: si una falla, no se aplica ninguna.
+
+# Respuestas de las que sale cada filtro del panel de revisión
+CAMPO_PLATAFORMA = "p4"
+CAMPO_PAIS       = "p5"
+
+# Lo que entra al índice de texto completo: todas las respuestas y el usuario de Discord
+_TEXTO_INDEXADO = (
+    "(SELECT group_concat(value, ' ') FROM json_each({datos}) "
+    "WHERE key GLOB 'p[0-9]*' OR key IN ('discord', 'discord_name', 'discord_id'))"
+)
+
+MIGRACIONES = [
+    """
+    CREATE TABLE postulaciones (
+        id          INTEGER PRIMARY KEY AUTOINCREMENT,
+        discord_id  TEXT    NOT NULL,
+        origen      TEXT    NOT NULL,
+        estado      TEXT    NOT NULL,
+        datos       TEXT    NOT NULL,
+        creada      REAL    NOT NULL,
+        actualizada REAL    NOT NULL
+    );
+    CREATE INDEX idx_postulaciones_discord ON postulaciones(discord_id);
+    CREATE INDEX idx_postulaciones_estado  ON postulaciones(estado, id);
+    CREATE TABLE enviadas (
+        discord_id TEXT PRIMARY KEY
+    );
+    CREATE TABLE dm_mensajes (
+        discord_id TEXT    PRIMARY KEY,
+        message_id INTEGER NOT NULL
+    );
+    CREATE TABLE chat_activas (
+        user_id INTEGER PRIMARY KEY,
+        datos   TEXT    NOT NULL
+    );
+    """,
+    """
+    ALTER TABLE dm_mensajes ADD COLUMN canal_id INTEGER;
+    """,
+    """
+    CREATE TABLE plazos (
+        clave TEXT PRIMARY KEY,
+        tipo  TEXT NOT NULL,
+        vence REAL NOT NULL,
+        datos TEXT NOT NULL
+    );
+    """,
+    """
+    CREATE TABLE servidores (
+        guild_id INTEGER PRIMARY KEY,
+        datos    TEXT    NOT NULL
+    );
+    ALTER TABLE postulaciones ADD COLUMN guild_id INTEGER;
+    CREATE TABLE enviadas_por_servidor (
+        guild_id   INTEGER NOT NULL DEFAULT 0,
+        discord_id TEXT    NOT NULL,
+        PRIMARY KEY (guild_id, discord_id)
+    );
+    INSERT INTO enviadas_por_servidor (guild_id, discord_id) SELECT 0, discord_id FROM enviadas;
+    DROP TABLE enviadas;
+    ALTER TABLE enviadas_por_servidor RENAME TO enviadas;
+    CREATE TABLE dm_mensajes_por_servidor (
+        guild_id   INTEGER NOT NULL DEFAULT 0,
+        discord_id TEXT    NOT NULL,
+        message_id INTEGER NOT NULL,
+        canal_id   INTEGER,
+        PRIMARY KEY (guild_id, discord_id)
+    );
+    INSERT INTO dm_mensajes_por_servidor (guild_id, discord_id, message_id, canal_id)
+        SELECT 0, discord_id, message_id, canal_id FROM dm_mensajes;
+    DROP TABLE dm_mensajes;
+    ALTER TABLE dm_mensajes_por_servidor RENAME TO dm_mensajes;
+    """,
+    f"""
+    ALTER TABLE postulaciones ADD COLUMN revision_canal_id   INTEGER;
+    ALTER TABLE postulaciones ADD COLUMN revision_mensaje_id INTEGER;
+    ALTER TABLE postulaciones ADD COLUMN plataforma TEXT GENERATED ALWAYS AS (
+        CASE
+            WHEN lower(json_extract(datos, '$.{CAMPO_PLATAFORMA}')) LIKE '%ambos%'   THEN 'ambos'
+            WHEN lower(json_extract(datos, '$.{CAMPO_PLATAFORMA}')) LIKE '%java%'
+             AND lower(json_extract(datos, '$.{CAMPO_PLATAFORMA}')) LIKE '%bedrock%' THEN 'ambos'
+            WHEN lower(json_extract(datos, '$.{CAMPO_PLATAFORMA}')) LIKE '%java%'    THEN 'java'
+            WHEN lower(json_extract(datos, '$.{CAMPO_PLATAFORMA}')) LIKE '%bedrock%' THEN 'bedrock'
+        END
+    ) VIRTUAL;
+    ALTER TABLE postulaciones ADD COLUMN pais TEXT GENERATED ALWAYS AS (
+        lower(trim(json_extract(datos, '$.{CAMPO_PAIS}')))
+    ) VIRTUAL;
+    CREATE INDEX idx_postulaciones_guild      ON postulaciones(guild_id, id);
+    CREATE INDEX idx_postulaciones_plataforma ON postulaciones(plataforma, id);
+    CREATE INDEX idx_postulaciones_pais       ON postulaciones(pais, id);
+    CREATE VIRTUAL TABLE postulaciones_fts USING fts5(
+        respuestas, tokenize = 'unicode61 remove_diacritics 2'
+    );
+    INSERT INTO postulaciones_fts (rowid, respuestas)
+        SELECT id, {_TEXTO_INDEXADO.format(datos="datos")} FROM postulaciones;
+    CREATE TRIGGER postulaciones_fts_alta AFTER INSERT ON postulaciones BEGIN
+        INSERT INTO postulaciones_fts (rowid, respuestas)
+        VALUES (new.id, {_TEXTO_INDEXADO.format(datos="new.datos")});
+    END;
+    """,
+    """
+    CREATE TABLE sets_preguntas (
+        version TEXT PRIMARY KEY,
+        archivo TEXT NOT NULL,
+        datos   TEXT NOT NULL,
+        creado  REAL NOT NULL
+    );
+    """,
+    """
+    CREATE TABLE comandos_bot (
+        id        INTEGER PRIMARY KEY AUTOINCREMENT,
+        tipo      TEXT NOT NULL,
+        datos     TEXT NOT NULL,
+        creado    REAL NOT NULL,
+        vence     REAL NOT NULL,
+        respuesta TEXT,
+        resuelto  REAL
+    );
+    CREATE INDEX idx_comandos_bot_pendientes ON comandos_bot(resuelto, id);
+    """,
+    """
+    CREATE TABLE estado_bot (
+        clave TEXT PRIMARY KEY,
+        valor TEXT NOT NULL
+    );
+    """,
+    """
+    ALTER TABLE postulaciones ADD COLUMN puntaje INTEGER;
+    ALTER TABLE postulaciones ADD COLUMN banderas TEXT;
+    CREATE INDEX idx_postulaciones_puntaje ON postulaciones(coalesce(puntaje, -1), id);
+    """,
+    """
+    CREATE TABLE firmas_respuestas (
+        postulacion_id INTEGER NOT NULL,
+        pregunta       TEXT    NOT NULL,
+        firma          BLOB    NOT NULL,
+        PRIMARY KEY (postulacion_id, pregunta)
+    ) WITHOUT ROWID;
+    CREATE TABLE lsh_bandas (
+        guild_id       INTEGER NOT NULL,
+        pregunta       TEXT    NOT NULL,
+        clave          INTEGER NOT NULL,
+        postulacion_id INTEGER NOT NULL,
+        PRIMARY KEY (guild_id, pregunta, clave, postulacion_id)
+    ) WITHOUT ROWID;
+    """,
+]
+
+ESTADO_EN_COLA   = "en_cola"
+ESTADO_PUBLICADA = "publicada"
+ESTADO_ACEPTADA  = "aceptada"
+ESTADO_RECHAZADA = "rechazada"
+
+
+class YaPostulo(Exception):
+    """La persona ya tiene una postulación enviada en ese servidor."""
+
+
+_COLUMNAS_PANEL = ("p.id, p.discord_id, p.origen, p.estado, p.creada, p.guild_id, p.plataforma, p.pais, p.datos, "
+                   "p.puntaje, p.banderas")
+
+
+def _fila_panel(fila):
+    pid, discord_id, origen, estado, creada, guild_id, plataforma, pais, datos, puntaje, banderas = fila[:11]
+    return {"id": pid, "discord_id": discord_id, "origen": origen, "estado": estado, "creada": creada,
+            "guild_id": guild_id, "plataforma": plataforma, "pais": pais, "datos": json.loads(datos),
+            "puntaje": puntaje, "banderas": json.loads(banderas) if banderas else []}
+
+
+def consulta_fts(texto):
+    """Texto libre → consulta FTS5: cada palabra como prefijo, todas obligatorias."""
+    palabras = re.findall(r"\w+", texto)
+    return " ".join(f'"{p}"*' for p in palabras[:16]) or None
+
+
+def _conectar(ruta):
+    con = sqlite3.connect(ruta, check_same_thread=False, isolation_level=None)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("PRAGMA synchronous=NORMAL")
+    con.execute("PRAGMA busy_timeout=5000")
+    return con
+
+
+def _sentencias(script):
+    """Parte un script SQL en sentencias (respeta los ";" dentro de un trigger)."""
+    actual = ""
+    for linea in script.splitlines(keepends=True):
+        actual += linea
+        if sqlite3.complete_statement(actual):
+            if actual.strip():
+                yield actual
+            actual = ""
+    if actual.strip():
+        yield actual
+
+
+def _activa_a_json(postulacion):
+    datos = dict(postulacion)
+    limite = datos.get("tiempo_limite")
+    if limite is not None and not isinstance(limite, str):
+        datos["tiempo_limite"] = limite.isoformat()
+    datos["respuestas"] = {str(k): v for k, v in datos.get("respuestas", {}).items()}
+    return json.dumps(datos, ensure_ascii=False)
+
+
+def _activa_desde_json(texto):
+    from datetime import datetime
+    datos = json.loads(texto)
+    if datos.get("tiempo_limite"):
+        datos["tiempo_limite"] = datetime.fromisoformat(datos["tiempo_limite"])
+    datos["respuestas"] = {int(k): v for k, v in datos.get("respuestas", {}).items()}
+    return datos
+
+
+class Almacen:
+    def __init__(self, ruta="postulaciones.db", lote_max=256, compartida=False):
+        self.ruta     = ruta
+        self.lote_max = lote_max
+        # Con la web y el bot en procesos separados, las marcas de "ya envió" las
+        # escriben los dos: se consultan en la base en vez de en la caché
+        self.compartida = compartida
+        self._con     = _conectar(ruta)
+        self._migrar()
+        self._con_lectura  = _conectar(ruta)
+        self._lock_lectura = threading.Lock()
+
+        # Caché caliente
+        # (guild_id, discord_id); guild_id 0 son las marcas anteriores a tener varios servidores
+        self.enviadas    = {tuple(r) for r in self._con.execute("SELECT guild_id, discord_id FROM enviadas")}
+        # (guild_id, discord_id) -> (canal_id, message_id); guild_id 0 igual que en enviadas
+        self.dm_mensajes = {
+            (guild_id, discord_id): (canal_id, message_id)
+            for guild_id, discord_id, message_id, canal_id in self._con.execute(
+                "SELECT guild_id, discord_id, message_id, canal_id FROM dm_mensajes"
+            )
+        }
+        self.activas     = {
+            uid: _activa_desde_json(datos)
+            for uid, datos in self._con.execute("SELECT user_id, datos FROM chat_activas")
+        }
+
+        self._pendientes = queue.Queue()
+        self._escritor   = threading.Thread(target=self._bucle_escritor, name="almacen-escritor", daemon=True)
+        self._escritor.start()
+
+    def _migrar(self):
+        # La versión se lee con el lock de escritura tomado: si otro proceso (web y bot
+        # separados) arrancó a la vez, este espera y después ve sus migraciones hechas
+        self._con.execute("BEGIN IMMEDIATE")
+        try:
+            version = self._con.execute("PRAGMA user_version").fetchone()[0]
+            for i, sql in enumerate(MIGRACIONES[version:], start=version + 1):
+                for sentencia in _sentencias(sql):
+                    self._con.execute(sentencia)
+                self._con.execute(f"PRAGMA user_version={i}")
+            self._con.execute("COMMIT")
+        except BaseException:
+            self._con.execute("ROLLBACK")
+            raise
+
+    # ── Escritor ──
+    def _bucle_escritor(self):
+        while True:
+            lote = [self._pendientes.get()]
+            while len(lote) < self.lote_max:
+                try:
+                    lote.append(self._pendientes.get_nowait())
+                except queue.Empty:
+                    break
+            if any(ops is None for ops, _ in lote):
+                self._aplicar([grupo for grupo in lote if grupo[0] is not None])
+                return
+            self._aplicar(lote)
+
+    def _aplicar(self, lote):
+        errores = {}
+        filas = {}
+        try:
+            self._ejecutar_lote(lote, filas)
+        except sqlite3.Error as e:
+            # Un lote fallido no debe arrastrar al resto: se reintenta escritura por escritura
+            print(f"⚠️ Lote de escritura fallido ({e}); reintentando una por una")
+            for grupo in lote:
+                try:
+                    self._ejecutar_lote([grupo], filas)
+                except sqlite3.Error as e_op:
+                    print(f"❌ Error guardando en la base de datos: {e_op}")
+                    if grupo[1] is not None:
+                        errores[id(grupo[1])] = e_op
+        for _, listo in lote:
+            if listo is not None:
+                listo.error = errores.get(id(listo))
+                listo.fila = filas.get(id(listo))
+                listo.set()
+
+    def _ejecutar_lote(self, lote, filas):
+        try:
+            self._con.execute("BEGIN")
+            for ops, listo in lote:
+                cur = None
+                for sql, params in ops:
+                    cur = self._con.execute(sql, params)
+                if listo is not None:
+                    # None si la última sentencia no tocó ninguna fila
+                    filas[id(listo)] = cur.lastrowid if cur is not None and cur.rowcount else None
+            self._con.execute("COMMIT")
+        except sqlite3.Error:
+            try:
+                self._con.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+            raise
+
+    def _escribir(self, ops, esperar=False):
+        """Encola sentencias para el escritor, que las aplica juntas en la misma transacción.
+        Con `esperar`, bloquea hasta el COMMIT y devuelve el lastrowid de la última
+        sentencia (None si esa sentencia no tocó ninguna fila)."""
+        listo = threading.Event() if esperar else None
+        self._pendientes.put((list(ops), listo))
+        if listo is not None:
+            listo.wait()
+            if listo.error is not None:
+                raise listo.error
+            return listo.fila
+
+    def vaciar(self):
+        """Espera a que todo lo encolado hasta ahora quede escrito."""
+        self._escribir([("SELECT 1", ())], esperar=True)
+
+    def cerrar(self):
+        self._pendientes.put((None, None))
+        self._escritor.join(timeout=10)
+        self._con.close()
+        self._con_lectura.close()
+
+    def _consultar(self, sql, params=()):
+        with self._lock_lectura:
+            return self._con_lectura.execute(sql, params).fetchall()
+
+    # ── Postulaciones ──
+    def crear_postulacion(self, discord_id, origen, datos, estado=ESTADO_EN_COLA, marcar_enviada=False,
+                          guild_id=None):
+        """Registra una postulación, espera a que quede escrita y devuelve su id.
+
+        Con `marcar_enviada`, primero reserva la marca de "ya envió" en la misma transacción:
+        si ya existía (otra pestaña, doble clic, el otro proceso), no inserta nada y lanza YaPostulo."""
+        ops = []
+        guild_id = int(guild_id) if guild_id else None
+        marca = (guild_id or 0, str(discord_id))
+        nueva = marca not in self.enviadas
+        condicion = ""
+        if marcar_enviada:
+            self.enviadas.add(marca)
+            ops.append(("INSERT OR IGNORE INTO enviadas (guild_id, discord_id) VALUES (?, ?)", marca))
+            # changes() es 0 si la marca ya estaba; una marca sin servidor (guild 0) también cuenta
+            condicion = (" WHERE changes() > 0 AND (? = 0 OR NOT EXISTS "
+                         "(SELECT 1 FROM enviadas WHERE guild_id = 0 AND discord_id = ?))")
+        ahora = time.time()
+        params = (str(discord_id), origen, estado, json.dumps(datos, ensure_ascii=False), ahora, ahora, guild_id)
+        ops.append((
+            "INSERT INTO postulaciones (discord_id, origen, estado, datos, creada, actualizada, guild_id) "
+            "SELECT ?, ?, ?, ?, ?, ?, ?" + condicion,
+            params + (marca if marcar_enviada else ()),
+        ))
+        try:
+            postulacion_id = self._escribir(ops, esperar=True)
+        except sqlite3.Error:
+            if marcar_enviada and nueva:
+                self.enviadas.discard(marca)
+            raise
+        if postulacion_id is None:
+            raise YaPostulo(discord_id)
+        return postulacion_id
+
+    def actualizar_estado(self, postulacion_id, estado, esperar=False):
+        self._escribir([(
+            "UPDATE postulaciones SET estado = ?, actualizada = ? WHERE id = ?",
+            (estado, time.time(), postulacion_id),
+        )], esperar=esperar)
+
+    def estado_postulacion(self, postulacion_id):
+        filas = self._consultar("SELECT estado FROM postulaciones WHERE id = ?", (postulacion_id,))
+        return filas[0][0] if filas else None
+
+    def actualizar_estados(self, postulacion_ids, estado):
+        """Mismo estado para varias postulaciones, en una sola transacción."""
+        ahora = time.time()
+        self._escribir([
+            ("UPDATE postulaciones SET estado = ?, actualizada = ? WHERE id = ?", (estado, ahora, pid))
+            for pid in postulacion_ids
+        ])
+
+    def actualizar_estado_por_usuario(self, discord_id, estado, guild_id=None):
+        """Cambia el estado de la última postulación del usuario en ese servidor (o en las sin servidor)."""
+        self._escribir([(
+            "UPDATE postulaciones SET estado = ?, actualizada = ? WHERE id = "
+            "(SELECT MAX(id) FROM postulaciones WHERE discord_id = ? AND (guild_id = ? OR guild_id IS NULL))",
+            (estado, time.time(), str(discord_id), int(guild_id or 0)),
+        )])
+
+    def obtener_postulacion(self, postulacion_id):
+        """Devuelve los datos de una postulación, o None si no existe."""
+        filas = self._consultar("SELECT datos FROM postulaciones WHERE id = ?", (postulacion_id,))
+        return json.loads(filas[0][0]) if filas else None
+
+    def postulaciones_en_estado(self, estado):
+        """Devuelve [(id, datos)] en orden de llegada."""
+        return [
+            (pid, json.loads(datos))
+            for pid, datos in self._consultar(
+                "SELECT id, datos FROM postulaciones WHERE estado = ? ORDER BY id", (estado,)
+            )
+        ]
+
+    def siguientes_en_cola(self, despues_de=0, limite=100):
+        """Postulaciones en cola con id mayor a `despues_de`, en orden de llegada: [(id, datos)]."""
+        return [
+            (pid, json.loads(datos))
+            for pid, datos in self._consultar(
+                "SELECT id, datos FROM postulaciones WHERE estado = ? AND id > ? ORDER BY id LIMIT ?",
+                (ESTADO_EN_COLA, despues_de, limite),
+            )
+        ]
+
+    def en_cola_sin_tocar(self, antes_de, limite=100):
+        """Postulaciones en cola sin cambios desde `antes_de` (las que quedaron trabadas): [(id, datos)]."""
+        return [
+            (pid, json.loads(datos))
+            for pid, datos in self._consultar(
+                "SELECT id, datos FROM postulaciones WHERE estado = ? AND actualizada < ? ORDER BY id LIMIT ?",
+                (ESTADO_EN_COLA, antes_de, limite),
+            )
+        ]
+
+    def contar_en_estado(self, estado):
+        return self._consultar("SELECT count(*) FROM postulaciones WHERE estado = ?", (estado,))[0][0]
+
+    def guardar_triaje(self, postulacion_id, puntaje, banderas):
+        self._escribir([(
+            "UPDATE postulaciones SET puntaje = ?, banderas = ? WHERE id = ?",
+            (puntaje, json.dumps(banderas, ensure_ascii=False), postulacion_id),
+        )])
+
+    # ── Respuestas parecidas (ver similares.py) ──
+    def guardar_firmas(self, postulacion_id, guild_id, firmas):
+        """Suma al índice LSH las respuestas de una postulación: { pregunta: (firma, claves) }.
+        Repetirla (reentrega de la cola) no duplica nada."""
+        ops = []
+        for pregunta, (firma, claves) in firmas.items():
+            ops.append((
+                "INSERT OR REPLACE INTO firmas_respuestas (postulacion_id, pregunta, firma) VALUES (?, ?, ?)",
+                (postulacion_id, pregunta, firma),
+            ))
+            ops += [(
+                "INSERT OR IGNORE INTO lsh_bandas (guild_id, pregunta, clave, postulacion_id) VALUES (?, ?, ?, ?)",
+                (guild_id, pregunta, clave, postulacion_id),
+            ) for clave in claves]
+        if ops:
+            self._escribir(ops)
+
+    def candidatos_parecidos(self, guild_id, pregunta, claves, excluir=None, limite=200):
+        """[(postulacion_id, firma)] de las respuestas a `pregunta` del servidor que comparten
+        alguna banda LSH con `claves`; las más nuevas primero, hasta `limite`."""
+        filas = self._consultar(
+            "SELECT f.postulacion_id, f.firma FROM firmas_respuestas f "
+            "WHERE f.pregunta = ? AND f.postulacion_id IN ("
+            "  SELECT DISTINCT postulacion_id FROM lsh_bandas "
+            f"  WHERE guild_id = ? AND pregunta = ? AND clave IN ({','.join('?' * len(claves))}) "
+            "  AND postulacion_id != ? ORDER BY postulacion_id DESC LIMIT ?"
+            ") ORDER BY f.postulacion_id DESC",
+            (pregunta, guild_id, pregunta, *claves, excluir or 0, limite))
+        return [(pid, bytes(firma)) for pid, firma in filas]
+
+    def guardar_revision(self, postulacion_id, canal_id, mensaje_id):
+        """Recuerda el mensaje del canal de revisión, para poder marcarlo desde el panel web."""
+        self._escribir([(
+            "UPDATE postulaciones SET revision_canal_id = ?, revision_mensaje_id = ? WHERE id = ?",
+            (canal_id, mensaje_id, postulacion_id),
+        )])
+
+    def detalle_postulacion(self, postulacion_id):
+        """Fila completa de una postulación (con sus datos ya parseados), o None."""
+        detalles = self.detalles_postulaciones([postulacion_id])
+        return detalles[0] if detalles else None
+
+    def detalles_postulaciones(self, postulacion_ids):
+        """Filas completas de varias postulaciones, con sus datos ya parseados (las que no existen no aparecen)."""
+        detalles = []
+        ids = list(postulacion_ids)
+        for i in range(0, len(ids), 500):
+            parte = ids[i:i + 500]
+            filas = self._consultar(
+                f"SELECT {_COLUMNAS_PANEL}, p.revision_canal_id, p.revision_mensaje_id FROM postulaciones p "
+                f"WHERE p.id IN ({','.join('?' * len(parte))}) ORDER BY p.id", parte)
+            for fila in filas:
+                detalle = _fila_panel(fila)
+                detalle["revision_canal_id"], detalle["revision_mensaje_id"] = fila[-2:]
+                detalles.append(detalle)
+        return detalles
+
+    # ── Panel de revisión ──
+    def buscar_postulaciones(self, texto=None, estado=None, desde=None, hasta=None, plataforma=None,
+                             pais=None, guild_id=None, incluir_sin_servidor=False, antes=None, limite=50,
+                             por_puntaje=False):
+        """Listado del panel, de la más nueva a la más vieja (o de mayor a menor puntaje, las
+        sin puntaje al final). `antes` es la clave de la última postulación de la página
+        anterior: su id, o (puntaje, id) si se ordena por puntaje (paginación sin OFFSET)."""
+        tablas, condiciones, params = "postulaciones p", [], []
+        consulta = consulta_fts(texto) if texto else None
+        if consulta:
+            tablas += " JOIN postulaciones_fts ON postulaciones_fts.rowid = p.id"
+            condiciones.append("postulaciones_fts MATCH ?")
+            params.append(consulta)
+        if guild_id is not None:
+            condiciones.append("(p.guild_id = ? OR p.guild_id IS NULL)" if incluir_sin_servidor else "p.guild_id = ?")
+            params.append(guild_id)
+        for columna, valor in (("p.estado", estado), ("p.plataforma", plataforma), ("p.pais", pais)):
+            if valor:
+                condiciones.append(f"{columna} = ?")
+                params.append(valor)
+        if desde is not None:
+            condiciones.append("p.creada >= ?")
+            params.append(desde)
+        if hasta is not None:
+            condiciones.append("p.creada < ?")
+            params.append(hasta)
+        if antes and por_puntaje:
+            condiciones.append("(coalesce(p.puntaje, -1), p.id) < (?, ?)")
+            params.extend((-1 if antes[0] is None else antes[0], antes[1]))
+        elif antes:
+            condiciones.append("p.id < ?")
+            params.append(antes)
+        where = f" WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        orden = "coalesce(p.puntaje, -1) DESC, p.id DESC" if por_puntaje else "p.id DESC"
+        params.append(limite)
+        filas = self._consultar(f"SELECT {_COLUMNAS_PANEL} FROM {tablas}{where} ORDER BY {orden} LIMIT ?", params)
+        return [_fila_panel(f) for f in filas]
+
+    def paises(self, guild_id=None, incluir_sin_servidor=False):
+        """[(pais, cantidad)] para el filtro del panel."""
+        if guild_id is None:
+            return self._consultar("SELECT pais, COUNT(*) FROM postulaciones WHERE pais != '' "
+                                   "GROUP BY pais ORDER BY COUNT(*) DESC")
+        servidor = "(guild_id = ? OR guild_id IS NULL)" if incluir_sin_servidor else "guild_id = ?"
+        return self._consultar(f"SELECT pais, COUNT(*) FROM postulaciones WHERE {servidor} AND pais != '' "
+                               "GROUP BY pais ORDER BY COUNT(*) DESC", (guild_id,))
+
+    # ── Anti-duplicado (por servidor) ──
+    def ya_envio(self, discord_id, guild_id=None):
+        discord_id = str(discord_id)
+        if self.compartida:
+            return bool(self._consultar(
+                "SELECT 1 FROM enviadas WHERE discord_id = ? AND guild_id IN (?, 0) LIMIT 1",
+                (discord_id, int(guild_id or 0)),
+            ))
+        return (int(guild_id or 0), discord_id) in self.enviadas or (0, discord_id) in self.enviadas
+
+    def quitar_enviada(self, discord_id, guild_id=None):
+        discord_id = str(discord_id)
+        guilds = {int(guild_id or 0), 0}
+        for g in guilds:
+            self.enviadas.discard((g, discord_id))
+        self._escribir([("DELETE FROM enviadas WHERE guild_id = ? AND discord_id = ?", (g, discord_id))
+                        for g in guilds])
+
+    def limpiar_enviadas(self, guild_id=None):
+        """Borra las marcas del servidor (y las sin servidor) y devuelve los discord_ids afectados."""
+        guilds = {int(guild_id or 0), 0}
+        quitadas = {m for m in self.enviadas if m[0] in guilds}
+        if self.compartida:
+            quitadas |= {tuple(m) for m in self._consultar(
+                "SELECT guild_id, discord_id FROM enviadas WHERE guild_id IN (?, 0)", (int(guild_id or 0),))}
+        self.enviadas -= quitadas
+        self._escribir([("DELETE FROM enviadas WHERE guild_id = ?", (g,)) for g in guilds])
+        return {discord_id for _, discord_id in quitadas}
+
+    # ── DMs de estado (por servidor) ──
+    def dm_de(self, discord_id, guild_id=None):
+        """Devuelve (canal_id, message_id) del DM de estado de ese servidor (o el guardado sin
+        servidor); (None, None) si no hay."""
+        discord_id = str(discord_id)
+        return (self.dm_mensajes.get((int(guild_id or 0), discord_id))
+                or self.dm_mensajes.get((0, discord_id), (None, None)))
+
+    def guardar_dm(self, discord_id, message_id, canal_id=None, guild_id=None):
+        clave = (int(guild_id or 0), str(discord_id))
+        self.dm_mensajes[clave] = (canal_id, message_id)
+        self._escribir([(
+            "INSERT OR REPLACE INTO dm_mensajes (guild_id, discord_id, message_id, canal_id) VALUES (?, ?, ?, ?)",
+            (*clave, message_id, canal_id),
+        )])
+
+    def quitar_dm(self, discord_id, guild_id=None):
+        self.limpiar_dms([discord_id], guild_id)
+
+    def limpiar_dms(self, discord_ids=None, guild_id=None):
+        """Borra los DMs guardados del servidor (y los sin servidor) de esos usuarios, o de todos."""
+        guilds = {int(guild_id or 0), 0}
+        if discord_ids is None:
+            claves = [c for c in self.dm_mensajes if c[0] in guilds]
+            ops = [("DELETE FROM dm_mensajes WHERE guild_id = ?", (g,)) for g in guilds]
+        else:
+            claves = [(g, str(d)) for d in discord_ids for g in guilds]
+            ops = [("DELETE FROM dm_mensajes WHERE guild_id = ? AND discord_id = ?", c) for c in claves]
+        for clave in claves:
+            self.dm_mensajes.pop(clave, None)
+        self._escribir(ops)
+
+    # ── Postulaciones por chat en curso ──
+    def guardar_activa(self, user_id, postulacion):
+        self.activas[user_id] = postulacion
+        self._escribir([(
+            "INSERT OR REPLACE INTO chat_activas (user_id, datos) VALUES (?, ?)",
+            (user_id, _activa_a_json(postulacion)),
+        )])
+
+    def quitar_activa(self, user_id):
+        self.activas.pop(user_id, None)
+        self._escribir([("DELETE FROM chat_activas WHERE user_id = ?", (user_id,))])
+
+    # ── Ajustes por servidor ──
+    def servidores(self):
+        """Devuelve { guild_id: ajustes } guardados por el bot."""
+        return {gid: json.loads(datos) for gid, datos in self._consultar("SELECT guild_id, datos FROM servidores")}
+
+    def guardar_servidor(self, guild_id, cambios):
+        """Mezcla `cambios` con los ajustes guardados del servidor."""
+        self._escribir([(
+            "INSERT INTO servidores (guild_id, datos) VALUES (?, ?) "
+            "ON CONFLICT(guild_id) DO UPDATE SET datos = json_patch(datos, excluded.datos)",
+            (guild_id, json.dumps(cambios)),
+        )])
+
+    # ── Sets de preguntas ──
+    def sets_preguntas(self):
+        """Devuelve { version: (archivo, datos) } de todos los sets que se usaron alguna vez."""
+        return {
+            version: (archivo, json.loads(datos))
+            for version, archivo, datos in self._consultar("SELECT version, archivo, datos FROM sets_preguntas")
+        }
+
+    def guardar_set_preguntas(self, version, archivo, datos):
+        """Registra una versión nueva de un set (las versiones no cambian: si ya está, no hace nada)."""
+        self._escribir([(
+            "INSERT OR IGNORE INTO sets_preguntas (version, archivo, datos, creado) VALUES (?, ?, ?, ?)",
+            (version, archivo, json.dumps(datos, ensure_ascii=False), time.time()),
+        )])
+
+    # ── Comandos web → bot (procesos separados) ──
+    def pedir_comando(self, tipo, datos, vence):
+        """Deja un comando para el proceso del bot y devuelve su id."""
+        return self._escribir([(
+            "INSERT INTO comandos_bot (tipo, datos, creado, vence) VALUES (?, ?, ?, ?)",
+            (tipo, json.dumps(datos, ensure_ascii=False), time.time(), vence),
+        )], esperar=True)
+
+    def respuesta_comando(self, comando_id):
+        """La respuesta de un comando, o None si el bot todavía no lo resolvió."""
+        filas = self._consultar(
+            "SELECT respuesta FROM comandos_bot WHERE id = ? AND resuelto IS NOT NULL", (comando_id,))
+        return json.loads(filas[0][0]) if filas else None
+
+    def comandos_pendientes(self, despues_de=0, limite=50):
+        """Comandos sin resolver con id mayor a `despues_de`: [(id, tipo, datos, vence)]."""
+        return [
+            (cid, tipo, json.loads(datos), vence)
+            for cid, tipo, datos, vence in self._consultar(
+                "SELECT id, tipo, datos, vence FROM comandos_bot WHERE resuelto IS NULL AND id > ? "
+                "ORDER BY id LIMIT ?", (despues_de, limite),
+            )
+        ]
+
+    def responder_comando(self, comando_id, respuesta):
+        self._escribir([(
+            "UPDATE comandos_bot SET respuesta = ?, resuelto = ? WHERE id = ?",
+            (json.dumps(respuesta, ensure_ascii=False), time.time(), comando_id),
+        )])
+
+    def purgar_comandos(self, antes_de):
+        """Borra los comandos resueltos o vencidos antes de `antes_de`."""
+        self._escribir([(
+            "DELETE FROM comandos_bot WHERE (resuelto IS NOT NULL AND resuelto < ?) OR vence < ?",
+            (antes_de, antes_de),
+        )])
+
+    # ── Estado del bot ──
+    def estado_bot(self, clave):
+        """Valor guardado por el bot bajo `clave` (p. ej. el hash de los comandos sincronizados), o None."""
+        filas = self._consultar("SELECT valor FROM estado_bot WHERE clave = ?", (clave,))
+        return filas[0][0] if filas else None
+
+    def guardar_estado_bot(self, clave, valor):
+        self._escribir([("INSERT OR REPLACE INTO estado_bot (clave, valor) VALUES (?, ?)", (clave, valor))])
+
+    # ── Plazos ──
+    def plazos(self):
+        """Devuelve [(clave, tipo, vence, datos)] de todos los plazos pendientes."""
+        return [
+            (clave, tipo, vence, json.loads(datos))
+            for clave, tipo, vence, datos in self._consultar("SELECT clave, tipo, vence, datos FROM plazos")
+        ]
+
+    def guardar_plazo(self, clave, tipo, vence, datos):
+        self._escribir([(
+            "INSERT OR REPLACE INTO plazos (clave, tipo, vence, datos) VALUES (?, ?, ?, ?)",
+            (clave, tipo, vence, json.dumps(datos)),
+        )])
+
+    def quitar_plazo(self, clave):
+        self._escribir([("DELETE FROM plazos WHERE clave = ?", (clave,))])
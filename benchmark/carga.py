@@ -0,0 +1,358 @@
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import aiohttp
+
+from discord_falso import DiscordFalso
+
+# ─────────────────────────────────────────
+#  PRUEBA DE CARGA SIN CONEXIÓN
+# ─────────────────────────────────────────
+# Levanta el Discord falso, arranca main.py en otro proceso apuntado a él y hace
+# pasar N usuarios a la vez por login OAuth → /enviar, y M por la postulación
+# por chat. Mide envío → publicación en el canal de revisión (p50/p95/p99),
+# postulaciones por segundo, memoria del proceso del bot y llamadas a la API
+# de Discord por postulación.
+#
+#   python benchmark/carga.py --web 300 --chat 20 --latencia 0.08 --prob-429 0.02
+#   python benchmark/carga.py --web 1000 --limite-canal 5/5 --json resultado.json
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LANZADOR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "lanzar_bot.py")
+
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _memoria_kb(pid):
+    """(VmRSS, VmHWM) en KiB leídos de /proc; (None, None) fuera de Linux."""
+    valores = {}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for linea in f:
+                clave, _, valor = linea.partition(":")
+                if clave in ("VmRSS", "VmHWM"):
+                    valores[clave] = int(valor.split()[0])
+    except OSError:
+        pass
+    return valores.get("VmRSS"), valores.get("VmHWM")
+
+
+def percentil(valores, p):
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    indice = max(0, min(len(ordenados) - 1, int(round(p / 100 * len(ordenados) + 0.5)) - 1))
+    return ordenados[indice]
+
+
+def resumen_latencias(valores):
+    return {
+        "n":   len(valores),
+        "p50": percentil(valores, 50),
+        "p95": percentil(valores, 95),
+        "p99": percentil(valores, 99),
+        "max": max(valores) if valores else None,
+    }
+
+
+class Resultados:
+    def __init__(self):
+        self.web          = []   # envío → revisión (s)
+        self.chat         = []
+        self.enviar_http  = []   # duración del POST /enviar
+        self.login        = []   # /login → /callback
+        self.cola_llena   = 0
+        self.errores      = []
+        self.ultima_publicacion = None
+
+    def publicada(self, instante):
+        if self.ultima_publicacion is None or instante > self.ultima_publicacion:
+            self.ultima_publicacion = instante
+
+
+# ─────────────────────────────────────────
+#  USUARIOS SIMULADOS
+# ─────────────────────────────────────────
+async def usuario_web(conector, base, falso, uid, preguntas, res, timeout):
+    jar = aiohttp.CookieJar(unsafe=True)
+    async with aiohttp.ClientSession(connector=conector, connector_owner=False, cookie_jar=jar) as http:
+        t = time.perf_counter()
+        async with http.get(f"{base}/login", allow_redirects=False) as r:
+            autorizar = r.headers["Location"]
+        async with http.get(f"{autorizar}&usuario={uid}", allow_redirects=False) as r:
+            callback = r.headers["Location"]
+        async with http.get(callback, allow_redirects=False) as r:
+            if r.status != 302 or "error" in r.headers.get("Location", ""):
+                res.errores.append(f"web {uid}: callback {r.status} {r.headers.get('Location')}")
+                return
+        res.login.append(time.perf_counter() - t)
+
+        opciones = preguntas.get("validacion", {}).get("por_pregunta", {})
+        respuestas = {}
+        for i in range(len(preguntas["preguntas"])):
+            clave = f"p{i + 1}"
+            validas = opciones.get(clave, {}).get("opciones")
+            respuestas[clave] = validas[0] if validas else f"Respuesta de prueba {i + 1} del usuario {uid}"
+        publicada = falso.esperar_revision(uid)
+        t0 = time.perf_counter()
+        while True:
+            t_http = time.perf_counter()
+            async with http.post(f"{base}/enviar", json=respuestas) as r:
+                status, retry_after = r.status, r.headers.get("Retry-After")
+                await r.read()
+            res.enviar_http.append(time.perf_counter() - t_http)
+            if status == 503:
+                res.cola_llena += 1
+                await asyncio.sleep(float(retry_after or 1))
+                continue
+            break
+        if status != 200:
+            res.errores.append(f"web {uid}: /enviar respondió {status}")
+            return
+        instante = await asyncio.wait_for(publicada, timeout)
+        res.web.append(instante - t0)
+        res.publicada(instante)
+
+
+async def usuario_chat(falso, uid, nombre, res, timeout):
+    canal_futuro = falso.esperar_canal(nombre)
+    await falso.interaccion(uid, "postular_button")
+    canal = await asyncio.wait_for(canal_futuro, timeout)
+    while True:
+        mensaje = await falso.siguiente_mensaje(canal["id"], timeout)
+        if mensaje["components"]:
+            botones = [b for fila in mensaje["components"] for b in fila.get("components", [])]
+            enviar = next(b for b in botones if b.get("label", "").startswith("Enviar"))
+            # Como una persona, no clica antes de que el bot reciba la respuesta del
+            # envío y registre la vista (el evento podría ganarle a la respuesta HTTP)
+            await asyncio.sleep(0.2)
+            publicada = falso.esperar_revision(uid)
+            t0 = time.perf_counter()
+            await falso.interaccion(uid, enviar["custom_id"], mensaje=mensaje)
+            instante = await asyncio.wait_for(publicada, timeout)
+            res.chat.append(instante - t0)
+            res.publicada(instante)
+            return
+        if mensaje["content"].startswith("**💬 Pregunta"):
+            await falso.escribir(uid, canal["id"], f"Respuesta de chat de {nombre}")
+
+
+async def _con_limite(semaforo, res, etiqueta, corrutina):
+    async with semaforo:
+        try:
+            await corrutina
+        except asyncio.TimeoutError:
+            res.errores.append(f"{etiqueta}: tiempo agotado")
+        except Exception as e:
+            res.errores.append(f"{etiqueta}: {type(e).__name__}: {e}")
+
+
+# ─────────────────────────────────────────
+#  EJECUCIÓN
+# ─────────────────────────────────────────
+async def esperar_web(base, timeout=30):
+    limite = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as http:
+        while time.monotonic() < limite:
+            try:
+                async with http.get(f"{base}/", allow_redirects=False) as r:
+                    if r.status < 500:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("El servidor web no respondió a tiempo")
+
+
+async def ejecutar(args):
+    with open(os.path.join(RAIZ, "preguntas.json"), encoding="utf-8") as f:
+        preguntas = json.load(f)
+
+    total = args.web + args.chat
+    usuarios = [(800000000000000000 + i, f"carga{i:05d}") for i in range(total)]
+    limite = None
+    if args.limite_canal:
+        n, ventana = args.limite_canal.split("/")
+        limite = (int(n), float(ventana))
+    falso = DiscordFalso(usuarios, latencia=args.latencia, jitter=args.jitter,
+                         prob_429=args.prob_429, retry_after=args.retry_after, limite_ruta=limite)
+    url_falso = await falso.iniciar()
+
+    puerto_web = _puerto_libre()
+    base = f"http://127.0.0.1:{puerto_web}"
+    carpeta = tempfile.mkdtemp(prefix="bench-postulaciones-")
+    entorno = dict(os.environ)
+    entorno.update({
+        "DISCORD_FALSO_URL": url_falso,
+        "DISCORD_API_URL":   f"{url_falso}/api",
+        "TOKEN":             "bench",
+        "DISCORD_CLIENT_ID": "bench",
+        "DISCORD_CLIENT_SECRET": "bench",
+        "FLASK_SECRET":      "bench",
+        "PORT":              str(puerto_web),
+        "WEB_URL":           base,
+        "DB_PATH":           os.path.join(carpeta, "postulaciones.db"),
+        "MODO_CHAT":         args.modo_chat,
+        "MIEMBROS_INTENT":   "si" if args.miembros == "intent" else "no",
+        "PYTHONUNBUFFERED":  "1",
+    })
+    # Todos los usuarios simulados salen de 127.0.0.1: los límites por IP no aplican acá
+    for clave in ("LIMITE_LOGIN_IP", "LIMITE_CALLBACK_IP", "LIMITE_ENVIAR_IP"):
+        entorno.setdefault(clave, "1000000/1")
+    for clave in ("CANAL_REVISION_ID", "CANAL_RESULTADOS_ID", "CATEGORIA_POSTULACIONES_ID", "CANAL_HILOS_ID"):
+        entorno.pop(clave, None)
+
+    ruta_log = args.log or os.path.join(carpeta, "bot.log")
+    log = open(ruta_log, "w")
+    proceso_web = None
+    if args.procesos == "separados":
+        # Web y bot en procesos aparte, sobre la misma base (como Procfile.separado)
+        entorno["PROCESO"] = "bot"
+        proceso_web = subprocess.Popen([sys.executable, LANZADOR], env=dict(entorno, PROCESO="web"),
+                                       stdout=log, stderr=subprocess.STDOUT, cwd=RAIZ)
+        print(f"🌐 Web en el PID {proceso_web.pid}")
+    proceso = subprocess.Popen([sys.executable, LANZADOR], env=entorno, stdout=log, stderr=subprocess.STDOUT, cwd=RAIZ)
+    print(f"🚀 Bot en el PID {proceso.pid} (log: {ruta_log})")
+    try:
+        await asyncio.wait_for(falso.listo.wait(), 60)
+        await esperar_web(base)
+        await asyncio.sleep(1)   # el sync va en segundo plano: se da tiempo a que llegue on_ready
+
+        rss_inicio, _ = _memoria_kb(proceso.pid)
+        falso.reiniciar_metricas()
+        res = Resultados()
+        semaforo = asyncio.Semaphore(args.concurrencia)
+        conector = aiohttp.TCPConnector(limit=args.concurrencia)
+
+        print(f"⏱️  {args.web} postulaciones web y {args.chat} por chat ({args.concurrencia} a la vez)…")
+        inicio = time.perf_counter()
+        tareas = []
+        for uid, nombre in usuarios[:args.web]:
+            tareas.append(_con_limite(semaforo, res, f"web {uid}",
+                                      usuario_web(conector, base, falso, uid, preguntas, res, args.timeout)))
+        for uid, nombre in usuarios[args.web:]:
+            tareas.append(_con_limite(semaforo, res, f"chat {uid}", usuario_chat(falso, uid, nombre, res, args.timeout)))
+        await asyncio.gather(*tareas)
+        await conector.close()
+        await asyncio.sleep(args.asentar)   # DMs y cierres de canal que quedan en el despachador
+
+        rss_fin, rss_pico = _memoria_kb(proceso.pid)
+        if args.metricas:
+            async with aiohttp.ClientSession() as http:
+                async with http.get(f"{base}/metrics") as r:
+                    with open(args.metricas, "w", encoding="utf-8") as f:
+                        f.write(await r.text())
+        fin = res.ultima_publicacion or time.perf_counter()
+        completadas = len(res.web) + len(res.chat)
+        llamadas = sum(n for ruta, n in falso.llamadas.items() if not ruta.startswith("OAUTH"))
+        informe = {
+            "config": {k: v for k, v in vars(args).items() if k not in ("json", "log")},
+            "completadas": completadas,
+            "errores": len(res.errores),
+            "duracion_s": fin - inicio,
+            "postulaciones_por_s": completadas / (fin - inicio) if completadas else 0.0,
+            "latencia_web_s": resumen_latencias(res.web),
+            "latencia_chat_s": resumen_latencias(res.chat),
+            "enviar_http_s": resumen_latencias(res.enviar_http),
+            "login_oauth_s": resumen_latencias(res.login),
+            "cola_llena_503": res.cola_llena,
+            "memoria_kb": {"inicio": rss_inicio, "fin": rss_fin, "pico": rss_pico,
+                           "crecimiento": (rss_fin - rss_inicio) if rss_inicio and rss_fin else None},
+            "api": {
+                "llamadas": llamadas,
+                "por_postulacion": llamadas / completadas if completadas else None,
+                "respuestas_429": sum(falso.respuestas_429.values()),
+                "por_ruta": dict(falso.llamadas.most_common()),
+                "429_por_ruta": dict(falso.respuestas_429.most_common()),
+                "desconocidas": dict(falso.desconocidas),
+            },
+            "muestra_errores": res.errores[:20],
+        }
+        imprimir_informe(informe)
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(informe, f, indent=2, ensure_ascii=False)
+            print(f"💾 Informe guardado en {args.json}")
+        return 0 if not res.errores else 1
+    finally:
+        for p in (proceso, proceso_web):
+            if p is None or p.poll() is not None:
+                continue
+            p.send_signal(signal.SIGINT)
+            try:
+                p.wait(15)
+            except subprocess.TimeoutExpired:
+                p.kill()
+        log.close()
+        await falso.cerrar()
+
+
+def _ms(valor):
+    return "—" if valor is None else f"{valor * 1000:.0f} ms"
+
+
+def imprimir_informe(inf):
+    print()
+    print("📊 RESULTADOS")
+    print(f"   Completadas: {inf['completadas']}  ·  errores: {inf['errores']}  ·  503 cola_llena: {inf['cola_llena_503']}")
+    print(f"   Duración: {inf['duracion_s']:.1f} s  ·  {inf['postulaciones_por_s']:.1f} postulaciones/s")
+    for etiqueta, clave in (("Envío → revisión (web)", "latencia_web_s"),
+                            ("Envío → revisión (chat)", "latencia_chat_s"),
+                            ("POST /enviar", "enviar_http_s"),
+                            ("Login OAuth", "login_oauth_s")):
+        l = inf[clave]
+        if l["n"]:
+            print(f"   {etiqueta:<24} n={l['n']:<5} p50={_ms(l['p50']):>8}  p95={_ms(l['p95']):>8}  "
+                  f"p99={_ms(l['p99']):>8}  max={_ms(l['max']):>8}")
+    m = inf["memoria_kb"]
+    if m["inicio"]:
+        print(f"   Memoria del bot: {m['inicio'] / 1024:.1f} → {m['fin'] / 1024:.1f} MiB "
+              f"(+{m['crecimiento'] / 1024:.1f}, pico {m['pico'] / 1024:.1f})")
+    api = inf["api"]
+    por = api["por_postulacion"]
+    print(f"   API de Discord: {api['llamadas']} llamadas ({'—' if por is None else f'{por:.1f}'} por postulación), "
+          f"{api['respuestas_429']} respuestas 429")
+    completadas = inf["completadas"] or 1
+    for ruta, n in list(api["por_ruta"].items())[:12]:
+        print(f"      {n:>7}  {n / completadas:>6.2f}/post  {ruta}")
+    for error in inf["muestra_errores"][:5]:
+        print(f"   ❌ {error}")
+
+
+def main():
+    p = argparse.ArgumentParser(description="Prueba de carga de postulaciones contra un Discord falso")
+    p.add_argument("--web", type=int, default=200, help="usuarios que postulan por la web")
+    p.add_argument("--chat", type=int, default=10, help="usuarios que postulan por chat")
+    p.add_argument("--concurrencia", type=int, default=50)
+    p.add_argument("--modo-chat", choices=("canal", "hilo"), default="canal")
+    p.add_argument("--procesos", choices=("uno", "separados"), default="uno",
+                   help="web y bot en el mismo proceso o en dos (PROCESO=web / PROCESO=bot)")
+    p.add_argument("--miembros", choices=("intent", "cache"), default="intent",
+                   help="lista de miembros del intent privilegiado, o pedidos de a uno (MIEMBROS_INTENT=no)")
+    p.add_argument("--latencia", type=float, default=0.05, help="latencia de cada llamada REST (s)")
+    p.add_argument("--jitter", type=float, default=0.02)
+    p.add_argument("--prob-429", type=float, default=0.0, help="probabilidad de 429 por llamada REST")
+    p.add_argument("--retry-after", type=float, default=1.0)
+    p.add_argument("--limite-canal", help="límite por recurso estilo Discord, p. ej. 5/5 (5 cada 5 s)")
+    p.add_argument("--timeout", type=float, default=120.0, help="espera máxima por postulación (s)")
+    p.add_argument("--asentar", type=float, default=6.0, help="espera final antes de medir memoria (s)")
+    p.add_argument("--json", help="guardar el informe en este archivo")
+    p.add_argument("--log", help="archivo para la salida del bot")
+    p.add_argument("--metricas", help="guardar el /metrics del bot al terminar en este archivo")
+    sys.exit(asyncio.run(ejecutar(p.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
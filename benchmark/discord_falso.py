@@ -0,0 +1,425 @@
+import asyncio
+import itertools
+import json
+import random
+import re
+import time
+from collections import Counter, defaultdict, deque
+from datetime import datetime, timezone
+
+from aiohttp import web, WSMsgType
+
+# ─────────────────────────────────────────
+#  DISCORD FALSO (REST + GATEWAY + OAUTH2)
+# ─────────────────────────────────────────
+# Lo justo de la API de Discord para que main.py arranque y atienda postulaciones
+# sin tocar el servidor real: un gateway que manda READY/GUILD_CREATE y deja
+# inyectar eventos, rutas REST que devuelven objetos creíbles, y el flujo OAuth2
+# /authorize → /token → /users/@me. Cada llamada REST se cuenta por ruta; se le
+# puede sumar latencia y 429 (al azar o por límite de ruta, como Discord).
+
+GUILD_ID = 900000000000000001
+APP_ID   = 900000000000000002
+BOT_ID   = 900000000000000003
+
+_RE_SNOWFLAKE = re.compile(r"/\d{6,}")
+_RE_TOKEN     = re.compile(r"(/(?:webhooks|interactions)/\{id\})/[^/]+")
+
+
+def _ahora_iso():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def plantilla_ruta(metodo, ruta):
+    """"POST /channels/123/messages" → "POST /channels/{id}/messages"."""
+    ruta = _RE_SNOWFLAKE.sub("/{id}", ruta.split("?")[0])
+    ruta = _RE_TOKEN.sub(r"\1/{token}", ruta)
+    return f"{metodo} {ruta}"
+
+
+def _json(datos, status=200, headers=None):
+    # discord.py sólo decodifica si Content-Type es exactamente "application/json"
+    return web.Response(body=json.dumps(datos).encode(), status=status,
+                        headers={"Content-Type": "application/json", **(headers or {})})
+
+
+def usuario(user_id, nombre, bot=False):
+    return {"id": str(user_id), "username": nombre, "global_name": nombre,
+            "discriminator": "0", "avatar": None, "bot": bot}
+
+
+class DiscordFalso:
+    def __init__(self, usuarios=(), *, latencia=0.0, jitter=0.0, prob_429=0.0,
+                 retry_after=1.0, limite_ruta=None):
+        """
+        usuarios:    [(id, nombre)] que son miembros del servidor.
+        latencia:    segundos que tarda cada respuesta REST (más `jitter` al azar).
+        prob_429:    probabilidad de responder 429 a una llamada REST cualquiera.
+        limite_ruta: (n, ventana) por recurso, p. ej. (5, 5.0) = 5 mensajes cada 5 s por canal.
+        """
+        self.latencia    = latencia
+        self.jitter      = jitter
+        self.prob_429    = prob_429
+        self.retry_after = retry_after
+        self.limite_ruta = limite_ruta
+
+        self._ids       = itertools.count(910000000000000000)
+        self.usuarios   = {int(uid): usuario(uid, nombre) for uid, nombre in usuarios}
+        self.bot_user   = usuario(BOT_ID, "PandaMC-Bench", bot=True)
+        self.rol_everyone = {"id": str(GUILD_ID), "name": "@everyone", "permissions": "0",
+                             "position": 0, "color": 0, "hoist": False, "managed": False,
+                             "mentionable": False}
+        self.rol_bot = {"id": str(self._nuevo_id()), "name": "Bot", "permissions": "8",
+                        "position": 1, "color": 0, "hoist": False, "managed": True,
+                        "mentionable": False}
+
+        self.canales = {}
+        self.canal_revision   = self._canal("postulaciones-staff")["id"]
+        self.canal_resultados = self._canal("resultados-postulaciones")["id"]
+        self.categoria        = self._canal("📝 Postulaciones", tipo=4)["id"]
+        self.canal_hilos      = self._canal("postulaciones-chat")["id"]
+        self.canal_panel      = self._canal("postulaciones")["id"]
+
+        # Métricas
+        self.llamadas     = Counter()   # plantilla de ruta -> llamadas
+        self.respuestas_429 = Counter()
+        self.publicaciones_revision = {}   # user_id -> perf_counter de la primera publicación
+        self.mensajes_revision = {}        # message_id -> mensaje del canal de revisión (para GET/PATCH)
+        self.desconocidas = Counter()
+
+        # Sincronización con el conductor de carga
+        self.listo         = asyncio.Event()
+        self._ws           = None
+        self._seq          = 0
+        self._envio        = asyncio.Lock()
+        self._mensajes     = defaultdict(asyncio.Queue)   # canal_id -> mensajes del bot
+        self._canal_de     = {}                           # nombre -> future(canal)
+        self._esperas_revision = {}                       # user_id -> future
+        self._ventanas     = defaultdict(deque)
+        self._runner       = None
+        self.url           = None
+
+    # ── Objetos ──────────────────────────────
+    def _nuevo_id(self):
+        return next(self._ids)
+
+    def _canal(self, nombre, tipo=0, parent_id=None, **extra):
+        canal_id = str(self._nuevo_id())
+        canal = {"id": canal_id, "type": tipo, "guild_id": str(GUILD_ID), "name": nombre,
+                 "position": len(self.canales), "permission_overwrites": [], "nsfw": False,
+                 "parent_id": parent_id, "topic": None, "rate_limit_per_user": 0,
+                 "last_message_id": None, **extra}
+        self.canales[canal_id] = canal
+        return canal
+
+    def miembro(self, user_id):
+        u = self.bot_user if int(user_id) == BOT_ID else self.usuarios[int(user_id)]
+        roles = [self.rol_bot["id"]] if u["bot"] else []
+        return {"user": u, "roles": roles, "joined_at": _ahora_iso(), "deaf": False,
+                "mute": False, "flags": 0, "nick": None, "avatar": None}
+
+    def _guild(self):
+        miembros = [self.miembro(BOT_ID)] + [self.miembro(uid) for uid in self.usuarios]
+        return {
+            "id": str(GUILD_ID), "name": "PandaMC Bench", "icon": None, "owner_id": str(BOT_ID),
+            "roles": [self.rol_everyone, self.rol_bot], "emojis": [], "stickers": [], "features": [],
+            "channels": [c for c in self.canales.values() if c["type"] != 12 and c["type"] != 1],
+            "threads": [], "members": miembros, "member_count": len(miembros), "presences": [],
+            "voice_states": [], "large": False, "unavailable": False, "premium_tier": 0,
+            "mfa_level": 0, "verification_level": 0, "explicit_content_filter": 0,
+            "default_message_notifications": 0, "afk_timeout": 300, "preferred_locale": "es-ES",
+            "joined_at": _ahora_iso(), "nsfw_level": 0, "premium_progress_bar_enabled": False,
+        }
+
+    def mensaje(self, canal_id, autor, contenido="", embeds=None, components=None):
+        canal = self.canales.get(str(canal_id), {})
+        datos = {
+            "id": str(self._nuevo_id()), "channel_id": str(canal_id), "author": autor,
+            "content": contenido or "", "timestamp": _ahora_iso(), "edited_timestamp": None,
+            "tts": False, "mention_everyone": False, "mentions": [], "mention_roles": [],
+            "attachments": [], "embeds": embeds or [], "components": components or [],
+            "pinned": False, "type": 0, "flags": 0,
+        }
+        if canal.get("guild_id"):
+            datos["guild_id"] = canal["guild_id"]
+            if not autor.get("bot"):
+                datos["member"] = {k: v for k, v in self.miembro(autor["id"]).items() if k != "user"}
+        return datos
+
+    # ── Gateway ──────────────────────────────
+    async def _gateway(self, request):
+        ws = web.WebSocketResponse(heartbeat=None)
+        await ws.prepare(request)
+        self._ws, self._seq = ws, 0
+        await ws.send_json({"op": 10, "d": {"heartbeat_interval": 41250}})
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    continue
+                carga = json.loads(msg.data)
+                if carga["op"] == 1:
+                    async with self._envio:
+                        await ws.send_json({"op": 11})
+                elif carga["op"] == 2:
+                    await self.despachar("READY", {
+                        "v": 10, "user": self.bot_user, "guilds": [{"id": str(GUILD_ID), "unavailable": True}],
+                        "session_id": "bench", "resume_gateway_url": self.url.replace("http", "ws") + "/gateway",
+                        "application": {"id": str(APP_ID), "flags": 0},
+                        "shard": carga["d"].get("shard") or [0, 1],
+                    })
+                    await self.despachar("GUILD_CREATE", self._guild())
+                elif carga["op"] == 6:
+                    # No se guarda la sesión: el RESUME se rechaza y el bot vuelve a identificarse
+                    async with self._envio:
+                        await ws.send_json({"op": 9, "d": False})
+        except ConnectionResetError:
+            pass   # el bot se cerró a mitad de lectura
+        self._ws = None
+        return ws
+
+    async def despachar(self, evento, datos):
+        """Manda un evento DISPATCH al bot conectado."""
+        async with self._envio:
+            if self._ws is None or self._ws.closed:
+                return
+            self._seq += 1
+            await self._ws.send_json({"op": 0, "t": evento, "s": self._seq, "d": datos})
+
+    async def interaccion(self, user_id, custom_id, mensaje=None, canal_id=None):
+        """Simula un clic en un botón (interacción de componente)."""
+        canal_id = str(canal_id or (mensaje or {}).get("channel_id") or self.canal_panel)
+        canal = self.canales.get(canal_id, {"id": canal_id, "type": 0})
+        if mensaje is None:
+            mensaje = self.mensaje(canal_id, self.bot_user)
+        await self.despachar("INTERACTION_CREATE", {
+            "id": str(self._nuevo_id()), "application_id": str(APP_ID), "type": 3,
+            "token": f"tok{self._nuevo_id()}", "version": 1, "guild_id": str(GUILD_ID),
+            "channel_id": canal_id, "channel": {"id": canal_id, "type": canal["type"]},
+            "member": {**self.miembro(user_id), "permissions": "0"},
+            "data": {"custom_id": custom_id, "component_type": 2}, "message": mensaje,
+            "attachment_size_limit": 8388608, "locale": "es-ES", "guild_locale": "es-ES",
+            "app_permissions": "8", "entitlements": [], "authorizing_integration_owners": {},
+            "context": 0,
+        })
+
+    async def escribir(self, user_id, canal_id, contenido):
+        """Simula un mensaje del usuario en un canal."""
+        await self.despachar("MESSAGE_CREATE", self.mensaje(canal_id, self.usuarios[int(user_id)], contenido))
+
+    async def siguiente_mensaje(self, canal_id, timeout=30.0):
+        return await asyncio.wait_for(self._mensajes[str(canal_id)].get(), timeout)
+
+    def esperar_canal(self, nombre):
+        """Future que se resuelve con el canal (o hilo) cuyo nombre contenga `nombre`."""
+        return self._canal_de.setdefault(nombre, asyncio.get_running_loop().create_future())
+
+    # ── REST ─────────────────────────────────
+    def _limitada(self, plantilla, ruta):
+        if self.limite_ruta is None or not self.listo.is_set():
+            return False
+        n, ventana = self.limite_ruta
+        recurso = _RE_SNOWFLAKE.search(ruta)
+        clave = (plantilla, recurso.group(0) if recurso else "")
+        ahora = time.monotonic()
+        marcas = self._ventanas[clave]
+        while marcas and marcas[0] <= ahora - ventana:
+            marcas.popleft()
+        if len(marcas) >= n:
+            return ventana - (ahora - marcas[0])
+        marcas.append(ahora)
+        return False
+
+    async def _rest(self, request):
+        ruta = "/" + request.match_info["ruta"]
+        plantilla = plantilla_ruta(request.method, ruta)
+        self.llamadas[plantilla] += 1
+
+        if self.latencia or self.jitter:
+            await asyncio.sleep(self.latencia + random.uniform(0, self.jitter))
+
+        espera = self._limitada(plantilla, ruta)
+        if not espera and self.listo.is_set() and self.prob_429 and random.random() < self.prob_429:
+            espera = self.retry_after
+        if espera:
+            self.respuestas_429[plantilla] += 1
+            return _json(
+                {"message": "You are being rate limited.", "retry_after": round(espera, 3), "global": False},
+                status=429, headers={"Retry-After": str(max(1, int(espera + 0.999))), "Via": "1.1 bench",
+                                     "X-RateLimit-Scope": "user"},
+            )
+
+        try:
+            cuerpo = await request.json() if request.can_read_body else {}
+        except ValueError:
+            cuerpo = {}   # multipart u otro formato que no usamos
+        resultado = await self._responder(request.method, ruta, cuerpo or {}, request)
+        if resultado is None:
+            return web.Response(status=204)
+        return _json(resultado)
+
+    async def _responder(self, metodo, ruta, cuerpo, request):
+        partes = ruta.strip("/").split("/")
+        if ruta == "/users/@me" and metodo == "GET":
+            return self.bot_user
+        if ruta == "/oauth2/applications/@me":
+            return {"id": str(APP_ID), "name": "PandaMC Bench", "description": "", "icon": None,
+                    "bot_public": False, "bot_require_code_grant": False, "owner": self.bot_user,
+                    "verify_key": "0" * 64, "flags": 0}
+        if ruta == "/gateway/bot" or ruta == "/gateway":
+            return {"url": self.url.replace("http", "ws") + "/gateway", "shards": 1,
+                    "session_start_limit": {"total": 1000, "remaining": 1000, "reset_after": 0, "max_concurrency": 1}}
+        if partes[0] == "applications" and partes[-1] == "commands":
+            if metodo == "PUT":
+                self.listo.set()
+            return []
+        if ruta == "/users/@me/channels" and metodo == "POST":
+            destinatario = int(cuerpo["recipient_id"])
+            canal = {"id": str(self._nuevo_id()), "type": 1, "last_message_id": None,
+                     "recipients": [self.usuarios.get(destinatario) or usuario(destinatario, "x")]}
+            self.canales[canal["id"]] = canal
+            return canal
+        if partes[0] == "guilds" and partes[-1] == "channels" and metodo == "POST":
+            canal = self._canal(cuerpo.get("name", "canal"), tipo=cuerpo.get("type", 0),
+                                parent_id=cuerpo.get("parent_id"),
+                                permission_overwrites=cuerpo.get("permission_overwrites", []))
+            await self.despachar("CHANNEL_CREATE", canal)
+            self._avisar_canal(canal)
+            return canal
+        if partes[0] == "guilds" and len(partes) == 4 and partes[2] == "members" and metodo == "GET":
+            return self.miembro(partes[3])
+        if partes[0] == "channels":
+            canal_id = partes[1]
+            if len(partes) == 2:
+                canal = self.canales.get(canal_id, {"id": canal_id, "type": 0, "guild_id": str(GUILD_ID)})
+                if metodo == "DELETE":
+                    self.canales.pop(canal_id, None)
+                    await self.despachar("CHANNEL_DELETE", canal)
+                elif metodo == "PATCH":
+                    if "archived" in cuerpo or "locked" in cuerpo:
+                        canal.setdefault("thread_metadata", {}).update(
+                            {k: cuerpo[k] for k in ("archived", "locked") if k in cuerpo})
+                    else:
+                        canal.update(cuerpo)
+                return canal
+            if partes[2] == "threads" and metodo == "POST":
+                hilo = self._canal(cuerpo.get("name", "hilo"), tipo=cuerpo.get("type", 12), parent_id=canal_id,
+                                   owner_id=str(BOT_ID), message_count=0, member_count=1,
+                                   thread_metadata={"archived": False, "locked": False,
+                                                    "auto_archive_duration": cuerpo.get("auto_archive_duration", 1440),
+                                                    "archive_timestamp": _ahora_iso(), "invitable": False})
+                await self.despachar("THREAD_CREATE", {**hilo, "newly_created": True})
+                self._avisar_canal(hilo)
+                return hilo
+            if partes[2] == "thread-members" or partes[2] == "typing":
+                return None
+            if partes[2] == "messages":
+                if len(partes) > 4 and partes[4] == "reactions":
+                    return None
+                if metodo == "POST":
+                    return self._mensaje_bot(canal_id, cuerpo, referencia=cuerpo.get("message_reference"))
+                guardado = self.mensajes_revision.get(partes[3]) if len(partes) > 3 else None
+                if metodo == "GET" and guardado is not None:
+                    return guardado
+                if metodo == "PATCH":
+                    if guardado is not None:
+                        guardado.update({k: cuerpo[k] for k in ("content", "embeds", "components") if k in cuerpo})
+                        return guardado
+                    return self.mensaje(canal_id, self.bot_user, cuerpo.get("content"),
+                                        cuerpo.get("embeds"), cuerpo.get("components")) | {"id": partes[3]}
+                if metodo == "DELETE":
+                    return None
+        if partes[0] == "interactions" and partes[-1] == "callback":
+            return {"interaction": {"id": partes[1], "type": cuerpo.get("type", 4)}}
+        if partes[0] == "webhooks":
+            if metodo == "DELETE":
+                return None
+            canal_id = self.canal_panel
+            return self.mensaje(canal_id, self.bot_user, cuerpo.get("content"),
+                                cuerpo.get("embeds"), cuerpo.get("components"))
+        self.desconocidas[f"{metodo} {ruta}"] += 1
+        return {}
+
+    def _avisar_canal(self, canal):
+        for nombre, futuro in list(self._canal_de.items()):
+            if nombre in canal["name"] and not futuro.done():
+                futuro.set_result(canal)
+                del self._canal_de[nombre]
+
+    def _mensaje_bot(self, canal_id, cuerpo, referencia=None):
+        mensaje = self.mensaje(canal_id, self.bot_user, cuerpo.get("content"),
+                               cuerpo.get("embeds"), cuerpo.get("components"))
+        if canal_id == self.canal_revision:
+            if referencia:
+                return mensaje   # avisos de decisión en respuesta a una postulación
+            self.mensajes_revision[mensaje["id"]] = mensaje
+            for fila in mensaje["components"]:
+                for boton in fila.get("components", []):
+                    partes = boton.get("custom_id", "").split(":")
+                    if len(partes) == 4 and partes[0] == "revision":
+                        user_id = int(partes[2])
+                        self.publicaciones_revision.setdefault(user_id, time.perf_counter())
+                        futuro = self._esperas_revision.pop(user_id, None)
+                        if futuro is not None and not futuro.done():
+                            futuro.set_result(self.publicaciones_revision[user_id])
+        elif self.canales.get(canal_id, {}).get("type") != 1:
+            self._mensajes[canal_id].put_nowait(mensaje)
+        return mensaje
+
+    def esperar_revision(self, user_id):
+        """Future con el instante (perf_counter) en que la postulación llegó al canal de revisión."""
+        futuro = asyncio.get_running_loop().create_future()
+        if user_id in self.publicaciones_revision:
+            futuro.set_result(self.publicaciones_revision[user_id])
+        else:
+            self._esperas_revision[user_id] = futuro
+        return futuro
+
+    # ── OAuth2 ───────────────────────────────
+    async def _autorizar(self, request):
+        # El conductor agrega ?usuario=<id> para elegir con quién "inicia sesión"
+        self.llamadas["OAUTH authorize"] += 1
+        destino = request.query["redirect_uri"]
+        return web.HTTPFound(f"{destino}?code=codigo-{request.query['usuario']}")
+
+    async def _token(self, request):
+        self.llamadas["OAUTH token"] += 1
+        form = await request.post()
+        codigo = form.get("code", "")
+        if not codigo.startswith("codigo-"):
+            return _json({"error": "invalid_grant"}, status=400)
+        return _json({"access_token": "acceso-" + codigo[len("codigo-"):], "token_type": "Bearer",
+                                  "expires_in": 604800, "scope": "identify"})
+
+    async def _yo(self, request):
+        self.llamadas["OAUTH users/@me"] += 1
+        token = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        if not token.startswith("acceso-"):
+            return _json({"message": "401: Unauthorized"}, status=401)
+        return _json(self.usuarios[int(token[len("acceso-"):])])
+
+    # ── Servidor ─────────────────────────────
+    async def iniciar(self, host="127.0.0.1", puerto=0):
+        app = web.Application(client_max_size=16 * 1024 * 1024)
+        app.router.add_get("/gateway", self._gateway)
+        app.router.add_get("/api/oauth2/authorize", self._autorizar)
+        app.router.add_post("/api/oauth2/token", self._token)
+        app.router.add_get("/api/users/@me", self._yo)
+        app.router.add_route("*", "/api/v10/{ruta:.*}", self._rest)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        sitio = web.TCPSite(self._runner, host, puerto)
+        await sitio.start()
+        puerto = sitio._server.sockets[0].getsockname()[1]
+        self.url = f"http://{host}:{puerto}"
+        return self.url
+
+    def reiniciar_metricas(self):
+        self.llamadas.clear()
+        self.respuestas_429.clear()
+        self.desconocidas.clear()
+
+    async def cerrar(self):
+        if self._ws is not None:
+            await self._ws.close()
+        if self._runner is not None:
+            await self._runner.cleanup()
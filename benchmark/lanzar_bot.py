@@ -0,0 +1,25 @@
+import os
+import runpy
+import sys
+
+import discord
+import discord.webhook.async_
+import yarl
+
+# ─────────────────────────────────────────
+#  ARRANQUE DEL BOT CONTRA EL DISCORD FALSO
+# ─────────────────────────────────────────
+# Lo lanza benchmark/carga.py en un proceso aparte (para medir su memoria sin
+# mezclarla con la del conductor). Redirige REST, webhooks y gateway de
+# discord.py a DISCORD_FALSO_URL y arranca main.py tal cual.
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+base = os.environ["DISCORD_FALSO_URL"].rstrip("/")
+discord.http.Route.BASE = f"{base}/api/v10"
+discord.webhook.async_.Route.BASE = f"{base}/api/v10"
+discord.gateway.DiscordWebSocket.DEFAULT_GATEWAY = yarl.URL(base.replace("http", "ws", 1) + "/gateway")
+
+os.chdir(RAIZ)
+sys.path.insert(0, RAIZ)
+runpy.run_path(os.path.join(RAIZ, "main.py"), run_name="__main__")
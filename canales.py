@@ -0,0 +1,80 @@
+import asyncio
+
+import discord
+
+# ─────────────────────────────────────────
+#  RESOLUCIÓN DE CANALES
+# ─────────────────────────────────────────
+# Índice { guild_id: { destino: channel_id } } que se llena la primera vez y
+# después se resuelve con guild.get_channel (O(1)). Los eventos de canales del
+# gateway invalidan el índice del servidor. La creación automática va con un
+# lock por (servidor, destino) para no duplicar canales. Los ids configurados
+# salen de los ajustes de cada servidor, y los canales creados se guardan ahí.
+
+# destino -> (clave en los ajustes del servidor, nombre por defecto, es_categoria)
+DESTINOS = {
+    "revision":   ("canal_revision_id",          "postulaciones-staff",      False),
+    "resultados": ("canal_resultados_id",        "resultados-postulaciones", False),
+    "categoria":  ("categoria_postulaciones_id", "📝 Postulaciones",         True),
+    "hilos":      ("canal_hilos_id",             "postulaciones-chat",       False),
+}
+
+
+class ResolutorCanales:
+    def __init__(self, servidores):
+        self.servidores = servidores
+        self._indice = {}
+        self._locks  = {}
+
+    def _buscar(self, guild, destino):
+        clave, nombre, es_categoria = DESTINOS[destino]
+        canal_id = self._indice.get(guild.id, {}).get(destino)
+        if canal_id:
+            canal = guild.get_channel(canal_id)
+            if canal:
+                return canal
+        canal = None
+        canal_config = self.servidores.obtener(guild.id).get(clave)
+        if canal_config:
+            canal = guild.get_channel(canal_config)
+        if not canal:
+            canales = guild.categories if es_categoria else guild.text_channels
+            canal = discord.utils.get(canales, name=nombre)
+        if canal:
+            self._indice.setdefault(guild.id, {})[destino] = canal.id
+        return canal
+
+    async def obtener(self, guild, destino, crear=False):
+        """Devuelve el canal (o categoría) del destino; con `crear`, lo crea si no existe."""
+        canal = self._buscar(guild, destino)
+        if canal or not crear:
+            return canal
+        lock = self._locks.setdefault((guild.id, destino), asyncio.Lock())
+        async with lock:
+            # Otra tarea pudo haberlo creado mientras esperábamos
+            canal = self._buscar(guild, destino)
+            if canal:
+                return canal
+            clave, nombre, es_categoria = DESTINOS[destino]
+            if es_categoria:
+                canal = await guild.create_category(nombre)
+            else:
+                canal = await guild.create_text_channel(name=nombre)
+            self.servidores.actualizar(guild.id, **{clave: canal.id})
+            self._indice.setdefault(guild.id, {})[destino] = canal.id
+            return canal
+
+    async def revision(self, guild, crear=True):
+        return await self.obtener(guild, "revision", crear)
+
+    async def resultados(self, guild):
+        return await self.obtener(guild, "resultados")
+
+    async def categoria(self, guild, crear=True):
+        return await self.obtener(guild, "categoria", crear)
+
+    async def hilos(self, guild, crear=True):
+        return await self.obtener(guild, "hilos", crear)
+
+    def invalidar(self, guild_id):
+        self._indice.pop(guild_id, None)
@@ -0,0 +1,209 @@
+import asyncio
+import itertools
+import random
+from collections import deque
+
+import discord
+
+from metricas import registro
+
+# ─────────────────────────────────────────
+#  DESPACHADOR DE ENVÍOS A DISCORD
+# ─────────────────────────────────────────
+# Todo lo que sale hacia Discord pasa por acá. Cada envío pertenece a una
+# "ruta" (canal, DM o interacción): los envíos de una misma ruta salen en
+# orden, uno a la vez; rutas distintas salen en paralelo. Entre lo que espera,
+# sale primero lo de menor número de prioridad.
+#
+# Un envío que espera para reintentar no ocupa un worker: vuelve a la cola
+# cuando se cumple la espera (su ruta sigue reservada para no desordenarla).
+# Los timeouts y errores de conexión solo se reintentan en envíos idempotentes
+# (editar, leer): un mensaje nuevo pudo haber llegado a Discord igual.
+#
+# Lo que falla en un envío (incluso una cancelación) queda en su futuro, nunca
+# tumba al worker. Al cerrar, lo que todavía esperaba turno falla con
+# RuntimeError para que nadie se quede esperando.
+
+PRIORIDAD_INTERACCION = 0
+PRIORIDAD_REVISION    = 1
+PRIORIDAD_DM          = 2
+PRIORIDAD_RESULTADO   = 2
+
+
+_reintentos = registro.contador("despachador_reintentos_total",
+                                "Reintentos de envíos a Discord por tipo de ruta", ("tipo",))
+_fallidos   = registro.contador("despachador_fallidos_total",
+                                "Envíos a Discord que fallaron del todo, por tipo de ruta", ("tipo",))
+
+
+def _tipo(ruta):
+    return ruta.partition(":")[0]
+
+
+def ruta_canal(canal):
+    return f"canal:{canal.id}"
+
+def ruta_dm(user_id):
+    return f"dm:{user_id}"
+
+def ruta_interaccion(interaction):
+    return f"interaccion:{interaction.id}"
+
+
+def _cancelando():
+    """True si pidieron cancelar la tarea actual y no solo lo que estaba esperando (3.11+)."""
+    tarea = asyncio.current_task()
+    return tarea is not None and getattr(tarea, "cancelling", lambda: 0)() > 0
+
+
+def _es_reintentable(error, idempotente):
+    if isinstance(error, (discord.Forbidden, discord.NotFound)):
+        return False
+    if isinstance(error, discord.HTTPException):
+        return error.status == 429 or error.status >= 500
+    return idempotente and isinstance(error, (asyncio.TimeoutError, OSError))
+
+
+class Despachador:
+    def __init__(self, workers=8, reintentos=4, espera_base=0.5, espera_max=30.0):
+        self.workers     = workers
+        self.reintentos  = reintentos
+        self.espera_base = espera_base
+        self.espera_max  = espera_max
+        self._cola       = None
+        self._tareas     = []
+        self._orden      = itertools.count()
+        self._rutas_ocupadas = set()
+        self._en_espera  = {}   # ruta -> deque de trabajos esperando a que se libere
+        self._demorados  = {}   # TimerHandle -> trabajo de los reintentos que esperan volver a la cola
+        self._cerrado    = False
+        registro.medidor("despachador_pendientes", "Envíos a Discord esperando turno",
+                         funcion=self.pendientes)
+
+    def pendientes(self):
+        en_cola = self._cola.qsize() if self._cola is not None else 0
+        return en_cola + len(self._demorados) + sum(len(d) for d in list(self._en_espera.values()))
+
+    def _asegurar_workers(self):
+        if self._tareas:
+            return
+        self._cola = asyncio.PriorityQueue()
+        for n in range(max(1, self.workers)):
+            self._tareas.append(asyncio.create_task(self._worker(n)))
+
+    async def enviar(self, ruta, prioridad, fabrica, *, reintentos=None, idempotente=False):
+        """Encola `fabrica()` (una función que devuelve la corrutina) y espera su resultado.
+        `idempotente` permite reintentar también tras un timeout o un error de conexión."""
+        if self._cerrado:
+            raise RuntimeError("el despachador está cerrado")
+        self._asegurar_workers()
+        futuro = asyncio.get_running_loop().create_future()
+        trabajo = (prioridad, next(self._orden), ruta, fabrica,
+                   self.reintentos if reintentos is None else reintentos, idempotente, futuro, 0)
+        self._cola.put_nowait(trabajo)
+        return await futuro
+
+    def programar(self, ruta, prioridad, fabrica, *, descripcion="envío", al_fallar=None, idempotente=False):
+        """Como `enviar`, pero sin esperar; los errores quedan en el log (y van a `al_fallar`)."""
+        async def _envolver():
+            try:
+                return await self.enviar(ruta, prioridad, fabrica, idempotente=idempotente)
+            except Exception as e:
+                print(f"❌ Falló {descripcion} ({ruta}): {e}")
+                if al_fallar is not None:
+                    al_fallar(e)
+        return asyncio.create_task(_envolver())
+
+    async def _worker(self, n):
+        while True:
+            trabajo = await self._cola.get()
+            ruta, intento = trabajo[2], trabajo[-1]
+            # Un reintento ya tiene su ruta reservada
+            if intento == 0:
+                if ruta in self._rutas_ocupadas:
+                    self._en_espera.setdefault(ruta, deque()).append(trabajo)
+                    continue
+                self._rutas_ocupadas.add(ruta)
+            demorado = False
+            try:
+                demorado = await self._ejecutar(trabajo)
+            finally:
+                if not demorado and not self._cerrado:
+                    self._liberar(ruta)
+
+    def _liberar(self, ruta):
+        pendientes = self._en_espera.get(ruta)
+        self._rutas_ocupadas.discard(ruta)
+        if pendientes:
+            self._cola.put_nowait(pendientes.popleft())
+            if not pendientes:
+                del self._en_espera[ruta]
+
+    async def _ejecutar(self, trabajo):
+        """Hace un intento. Devuelve True si quedó programado un reintento (la ruta sigue tomada)."""
+        prioridad, orden, ruta, fabrica, reintentos, idempotente, futuro, intento = trabajo
+        if futuro.cancelled():
+            return False
+        try:
+            resultado = await fabrica()
+        except asyncio.CancelledError as e:
+            cerrando = self._cerrado or _cancelando()   # cancelan al worker, no solo al envío
+            _fallidos.etiquetar(_tipo(ruta)).inc()
+            if not futuro.done():
+                futuro.set_exception(RuntimeError("el despachador se cerró durante el envío") if cerrando else e)
+            if cerrando:
+                raise
+            return False
+        except Exception as e:
+            if intento >= reintentos or not _es_reintentable(e, idempotente):
+                _fallidos.etiquetar(_tipo(ruta)).inc()
+                if not futuro.done():
+                    futuro.set_exception(e)
+                return False
+            espera = min(self.espera_max, self.espera_base * (2 ** intento))
+            retry_after = getattr(getattr(e, "response", None), "headers", {}).get("Retry-After")
+            if retry_after:
+                try:
+                    espera = max(espera, float(retry_after))
+                except ValueError:
+                    pass
+            _reintentos.etiquetar(_tipo(ruta)).inc()
+            print(f"⚠️ Reintento {intento + 1}/{reintentos} en {ruta}: {e}")
+            # Mantiene prioridad y turno; el worker queda libre mientras tanto
+            reintento = (prioridad, orden, ruta, fabrica, reintentos, idempotente, futuro, intento + 1)
+            self._demorar(espera + random.uniform(0, espera / 2), reintento)
+            return True
+        if not futuro.done():
+            futuro.set_result(resultado)
+        return False
+
+    def _demorar(self, espera, trabajo):
+        def _volver():
+            self._demorados.pop(handle, None)
+            if self._cola is not None:
+                self._cola.put_nowait(trabajo)
+        handle = asyncio.get_running_loop().call_later(espera, _volver)
+        self._demorados[handle] = trabajo
+
+    async def cerrar(self):
+        self._cerrado = True
+        pendientes = list(self._demorados.values())
+        for handle in self._demorados:
+            handle.cancel()
+        self._demorados.clear()
+        for tarea in self._tareas:
+            tarea.cancel()
+        await asyncio.gather(*self._tareas, return_exceptions=True)
+        self._tareas.clear()
+        if self._cola is not None:
+            while not self._cola.empty():
+                pendientes.append(self._cola.get_nowait())
+        for esperando in self._en_espera.values():
+            pendientes.extend(esperando)
+        self._en_espera.clear()
+        self._rutas_ocupadas.clear()
+        for trabajo in pendientes:
+            futuro = trabajo[-2]
+            if not futuro.done():
+                futuro.set_exception(RuntimeError("el despachador se cerró antes del envío"))
+        self._cola = None
@@ -0,0 +1,71 @@
+import threading
+import time
+from collections import OrderedDict
+
+# ─────────────────────────────────────────
+#  LÍMITES DE FRECUENCIA (token bucket)
+# ─────────────────────────────────────────
+# Un balde por clave (IP o discord_id) que se llena a `por_segundo` fichas hasta
+# `capacidad`; cada request gasta una. Un balde que estuvo quieto el tiempo que
+# tarda en llenarse es igual a uno nuevo, así que se descarta: solo se guardan
+# las claves activas. El dict está ordenado por último uso y la limpieza mira
+# solo la punta, así que cada request cuesta O(1) amortizado.
+
+
+def parsear_limite(texto):
+    """"10/60" → (10, 10/60): ráfaga de 10 que se repone en 60 s. "0" o vacío → None (sin límite)."""
+    texto = (texto or "").strip()
+    if not texto or texto == "0":
+        return None
+    capacidad, _, segundos = texto.partition("/")
+    capacidad = float(capacidad)
+    segundos = float(segundos or 1)
+    if capacidad <= 0 or segundos <= 0:
+        return None
+    return capacidad, capacidad / segundos
+
+
+class LimitadorTokens:
+    def __init__(self, capacidad, por_segundo, maximo_claves=100_000):
+        self.capacidad     = float(capacidad)
+        self.por_segundo   = float(por_segundo)
+        self.inactivo      = self.capacidad / self.por_segundo   # lo que tarda en llenarse
+        self.maximo_claves = maximo_claves
+        self._baldes       = OrderedDict()   # { clave: [fichas, último uso] }
+        self._lock         = threading.Lock()
+
+    @classmethod
+    def desde_texto(cls, texto, **kwargs):
+        """Limitador a partir de "capacidad/segundos"; None si el límite está apagado."""
+        limite = parsear_limite(texto)
+        return cls(*limite, **kwargs) if limite else None
+
+    def consumir(self, clave, costo=1):
+        """Gasta `costo` fichas. Devuelve 0 si alcanzó; si no, los segundos que faltan."""
+        ahora = time.monotonic()
+        with self._lock:
+            balde = self._baldes.get(clave)
+            if balde is None:
+                balde = self._baldes[clave] = [self.capacidad, ahora]
+            else:
+                balde[0] = min(self.capacidad, balde[0] + (ahora - balde[1]) * self.por_segundo)
+                balde[1] = ahora
+                self._baldes.move_to_end(clave)
+            if balde[0] >= costo:
+                balde[0] -= costo
+                espera = 0.0
+            else:
+                espera = (costo - balde[0]) / self.por_segundo
+            self._podar(ahora)
+        return espera
+
+    def _podar(self, ahora):
+        baldes = self._baldes
+        while baldes:
+            _, (_, ultimo) = next(iter(baldes.items()))
+            if ahora - ultimo < self.inactivo and len(baldes) <= self.maximo_claves:
+                break
+            baldes.popitem(last=False)
+
+    def __len__(self):
+        return len(self._baldes)
@@ -2,24 +2,75 @@ import discord
 from discord.ext import commands
 from discord import app_commands
 import asyncio
+import functools
+import hashlib
+import itertools
 import json
+import math
 import os
-import secrets
+import re
+import time
 import urllib.parse
-import urllib.request
 try:
-    import requests as _requests
+    import waitress as _waitress
 except ImportError:
-    _requests = None
+    _waitress = None
 from datetime import datetime, timedelta
-from flask import Flask, send_from_directory, jsonify, request, redirect, session
+from flask import Flask, Response, jsonify, request, redirect, session
+from werkzeug.middleware.proxy_fix import ProxyFix
 import threading
+from almacenamiento import (
+    Almacen, YaPostulo, ESTADO_EN_COLA, ESTADO_PUBLICADA, ESTADO_ACEPTADA, ESTADO_RECHAZADA,
+)
+from paginas import PaginasEstaticas
+from canales import ResolutorCanales
+from servidores import ConfigServidores, SetsPreguntas
+from validacion import ValidadorPostulacion
+from metricas import registro, traza_api_discord
+from limites import LimitadorTokens
+from sesiones import InterfazSesionesServidor, SesionesArchivos, SesionesSQLite, clave_firma
+from plazos import PlanificadorPlazos
+from miembros import CacheMiembros
+import similares
+import triaje
+from tareas import TareasFondo
+from oauth_discord import ClienteOAuthDiscord, ErrorOAuth, DISCORD_AUTH_URL
+from despachador import (
+    Despachador, ruta_canal, ruta_dm, ruta_interaccion,
+    PRIORIDAD_INTERACCION, PRIORIDAD_REVISION, PRIORIDAD_DM, PRIORIDAD_RESULTADO,
+)
 
 # ─────────────────────────────────────────
 #  SERVIDOR WEB (Flask)
 # ─────────────────────────────────────────
 app_web = Flask(__name__, static_folder='web')
-app_web.secret_key = os.environ.get("FLASK_SECRET", secrets.token_hex(32))
+# Sin FLASK_SECRET, la clave de firma se genera una vez en SECRETO_ARCHIVO: así las
+# sesiones sobreviven a un reinicio y todos los workers firman con la misma
+app_web.secret_key = os.environ.get("FLASK_SECRET") or clave_firma(os.environ.get("SECRETO_ARCHIVO", "secreto_flask.key"))
+
+# SESIONES=sqlite|archivos guarda los datos de sesión en el servidor (la cookie solo
+# lleva el id), compartidos entre workers; vacío deja la cookie firmada de Flask.
+SESIONES = os.environ.get("SESIONES", "").lower()
+if SESIONES in ("sqlite", "archivos"):
+    if SESIONES == "sqlite":
+        almacen_sesiones = SesionesSQLite(os.environ.get("SESIONES_DB", "sesiones.db"))
+    else:
+        almacen_sesiones = SesionesArchivos(os.environ.get("SESIONES_CARPETA", "sesiones"))
+    app_web.session_interface = InterfazSesionesServidor(
+        almacen_sesiones,
+        ttl=int(os.environ.get("SESIONES_TTL", 7 * 86400)),
+        cache_max=int(os.environ.get("SESIONES_CACHE_MAX", 1024)),
+        cache_ttl=float(os.environ.get("SESIONES_CACHE_SEG", 5)),
+    )
+elif SESIONES:
+    print(f"⚠️ SESIONES={SESIONES!r} no es válido (sqlite o archivos); se usan cookies firmadas")
+# Tope global de cuerpo para cualquier ruta; /enviar además usa el de su set de preguntas
+app_web.config["MAX_CONTENT_LENGTH"] = int(os.environ.get("WEB_MAX_BYTES", 256 * 1024))
+app_web.config["SEND_FILE_MAX_AGE_DEFAULT"] = int(os.environ.get("ESTATICOS_MAX_AGE", 86400))
+
+# "/" cambia según la sesión: el navegador revalida siempre, pero con ETag recibe un 304 sin cuerpo
+paginas = PaginasEstaticas('web', ['login.html', 'index.html', 'cerrado.html', 'revision.html'],
+                           cache_control=os.environ.get("PAGINAS_CACHE_CONTROL", "private, no-cache"))
 
 DISCORD_CLIENT_ID     = os.environ.get("DISCORD_CLIENT_ID", "")
 DISCORD_CLIENT_SECRET = os.environ.get("DISCORD_CLIENT_SECRET", "")
@@ -27,41 +78,187 @@ WEB_URL               = os.environ.get("WEB_URL", "http://localhost:5000").rstri
 print(f"DEBUG CLIENT_ID={DISCORD_CLIENT_ID!r}")
 print(f"DEBUG CLIENT_SECRET={DISCORD_CLIENT_SECRET[:4] if DISCORD_CLIENT_SECRET else 'VACIO'}...")
 
-DISCORD_AUTH_URL = "https://discord.com/api/oauth2/authorize"
-DISCORD_TOKEN_URL = "https://discord.com/api/oauth2/token"
-DISCORD_USER_URL  = "https://discord.com/api/users/@me"
-
 # URL de imagen de estado pendiente
 IMG_PENDIENTE = "https://media.discordapp.net/attachments/1145130881124667422/1473774273335398524/pendiente_mine.png?ex=69976ec0&is=69961d40&hm=1c0c4ba8c3734d1874a3abc1e39db5c233fa359c9b445b64ae3c57bd6c5a3595&=&format=webp&quality=lossless&width=562&height=562"
 
 def get_redirect_uri():
     return f"{WEB_URL}/callback"
 
+oauth = ClienteOAuthDiscord(
+    DISCORD_CLIENT_ID, DISCORD_CLIENT_SECRET, get_redirect_uri(),
+    timeout_conexion=float(os.environ.get("OAUTH_TIMEOUT_CONEXION", 3)),
+    timeout_lectura=float(os.environ.get("OAUTH_TIMEOUT_LECTURA", 7)),
+    cache_ttl=float(os.environ.get("OAUTH_CACHE_TTL", 60)),
+)
+
 # ─────────────────────────────────────────
 #  ESTADO GLOBAL
 # ─────────────────────────────────────────
-postulaciones_web_pendientes = []
-postulaciones_enviadas = set()   # discord_ids que ya enviaron formulario web
-estado_postulaciones = {"abierto": True}
+# PROCESO=todo corre la web (en un hilo) y el bot juntos. Con PROCESO=web y PROCESO=bot
+# cada uno va en su propio proceso (ver Procfile.separado) y se hablan por SQLite:
+# la web deja las postulaciones "en cola" y los pedidos del panel en comandos_bot, y
+# el bot los levanta cada IPC_INTERVALO segundos.
+PROCESO       = os.environ.get("PROCESO", "todo").lower()
+IPC_INTERVALO = float(os.environ.get("IPC_INTERVALO", 0.25))
+
+# Cola web → bot. La crea el loop del bot; Flask solo encola vía call_soon_threadsafe.
+# El semáforo acota los lugares ocupados (en cola + en proceso) sin tocar el loop.
+COLA_WEB_MAX      = int(os.environ.get("COLA_WEB_MAX", 500))
+CONSUMIDORES_WEB  = int(os.environ.get("CONSUMIDORES_WEB", 4))
+COLA_RETRY_AFTER  = int(os.environ.get("COLA_RETRY_AFTER", 10))
+# Una postulación que no se pudo publicar sigue "en cola" y se reintenta pasado este tiempo
+COLA_REINTENTO    = float(os.environ.get("COLA_REINTENTO", 60))
+cola_postulaciones_web = None   # asyncio.Queue, se crea al arrancar el bot
+_lugares_cola_web = threading.BoundedSemaphore(COLA_WEB_MAX)
+_en_curso_web     = set()       # ids en la cola o publicándose: nunca dos copias a la vez
+_loop_bot = None
+
+# Pool del triaje (ver TRIAJE). Va antes que cualquier hilo (el escritor de SQLite,
+# waitress, los executors): sus workers nacen con fork y así no copian un lock tomado.
+# Solo el proceso del bot publica.
+TRIAJE_PROCESOS = int(os.environ.get("TRIAJE_PROCESOS", 2))
+pool_triaje = triaje.crear_pool(TRIAJE_PROCESOS) if PROCESO != "web" else None
+
+# Postulaciones, anti-duplicado (discord_ids que ya enviaron formulario web) y
+# message_id de los DMs de estado viven en SQLite, con caché en memoria.
+almacen = Almacen(os.environ.get("DB_PATH", "postulaciones.db"), compartida=PROCESO != "todo")
+
+# ─────────────────────────────────────────
+#  MÉTRICAS
+# ─────────────────────────────────────────
+# Se exponen en /metrics (formato Prometheus). Con METRICAS_TOKEN, la ruta pide
+# "Authorization: Bearer <token>".
+METRICAS_TOKEN = os.environ.get("METRICAS_TOKEN", "")
+
+metrica_http = registro.histograma(
+    "postulaciones_http_duracion_segundos", "Duración de las respuestas del servidor web", ("ruta", "codigo"))
+metrica_oauth = registro.histograma(
+    "postulaciones_oauth_callback_duracion_segundos", "Canje del code y /users/@me en /callback", ("resultado",))
+metrica_triaje = registro.histograma(
+    "postulaciones_triaje_segundos", "Evaluación de las reglas de triaje (incluye la espera del pool)")
+metrica_parecidas = registro.contador(
+    "postulaciones_parecidas_total", "Postulaciones publicadas con respuestas casi iguales a otras")
+metrica_espera_cola = registro.histograma(
+    "postulaciones_cola_web_espera_segundos", "Tiempo de una postulación web en la cola hasta que la toma un consumidor")
+metrica_dm_fallidos = registro.contador(
+    "postulaciones_dm_fallidos_total", "DMs al postulante que no se pudieron enviar o editar", ("tipo",))
+registro.medidor("postulaciones_cola_web_profundidad", "Postulaciones web esperando en la cola",
+                 funcion=lambda: cola_postulaciones_web.qsize() if cola_postulaciones_web is not None else 0)
+registro.medidor("postulaciones_chat_activas", "Postulaciones por chat en curso",
+                 funcion=lambda: len(postulaciones_activas))
+
+# ─────────────────────────────────────────
+#  LÍMITES DE FRECUENCIA
+# ─────────────────────────────────────────
+# Token bucket por ruta y por clave, como "capacidad/segundos" ("0" lo apaga).
+# /callback hace dos llamadas a Discord y /enviar ocupa un lugar en la cola, por
+# eso son los más ajustados. Detrás de un proxy, PROXIES_CONFIABLES dice cuántos
+# saltos de X-Forwarded-For creer para sacar la IP del cliente.
+PROXIES_CONFIABLES = int(os.environ.get("PROXIES_CONFIABLES", 0))
+if PROXIES_CONFIABLES:
+    app_web.wsgi_app = ProxyFix(app_web.wsgi_app, x_for=PROXIES_CONFIABLES)
+
+LIMITE_CLAVES_MAX = int(os.environ.get("LIMITE_CLAVES_MAX", 100_000))
+limites_web = {
+    (ruta, tipo): LimitadorTokens.desde_texto(os.environ.get(variable, defecto), maximo_claves=LIMITE_CLAVES_MAX)
+    for ruta, tipo, variable, defecto in (
+        ("/login",    "ip",      "LIMITE_LOGIN_IP",       "20/60"),
+        ("/callback", "ip",      "LIMITE_CALLBACK_IP",    "10/60"),
+        ("/enviar",   "ip",      "LIMITE_ENVIAR_IP",      "10/60"),
+        ("/enviar",   "usuario", "LIMITE_ENVIAR_USUARIO", "3/60"),
+    )
+}
 
-# Guarda message_id del DM enviado al postulante para poder editarlo después
-# { discord_id (str) : dm_message_id (int) }
-dm_mensajes_postulacion = {}
+metrica_limitadas = registro.contador(
+    "postulaciones_limite_rechazos_total", "Requests rechazadas con 429 por límite de frecuencia", ("ruta", "clave"))
+registro.medidor("postulaciones_limite_claves", "Claves (IPs y usuarios) con balde activo",
+                 funcion=lambda: sum(len(l) for l in limites_web.values() if l is not None))
+
+def limite_excedido(ruta, como_json=True, **claves):
+    """Gasta una ficha de cada límite de la ruta; si alguno se agotó, devuelve la respuesta 429."""
+    espera = 0.0
+    for tipo, clave in claves.items():
+        limitador = limites_web.get((ruta, tipo))
+        if limitador is None or not clave:
+            continue
+        faltan = limitador.consumir(clave)
+        if faltan:
+            metrica_limitadas.etiquetar(ruta, tipo).inc()
+            espera = max(espera, faltan)
+    if not espera:
+        return None
+    if como_json:
+        resp = jsonify({"ok": False, "error": "limite"})
+    else:
+        resp = Response("Demasiados intentos. Espera unos segundos y vuelve a probar.\n", mimetype="text/plain")
+    resp.status_code = 429
+    resp.headers["Retry-After"] = str(math.ceil(espera))
+    return resp
 
 # ──────────────────────────────────────────
 #  RUTAS WEB
 # ──────────────────────────────────────────
 
+@app_web.before_request
+def _inicio_request():
+    request.environ["postulaciones.inicio"] = time.perf_counter()
+
+@app_web.after_request
+def _medir_request(resp):
+    inicio = request.environ.get("postulaciones.inicio")
+    if inicio is not None:
+        ruta = request.url_rule.rule if request.url_rule else "otra"
+        metrica_http.etiquetar(ruta, str(resp.status_code)).observar(time.perf_counter() - inicio)
+    return resp
+
+@app_web.route('/metrics')
+def metricas():
+    if METRICAS_TOKEN and request.headers.get("Authorization") != f"Bearer {METRICAS_TOKEN}":
+        return Response("unauthorized\n", status=401, mimetype="text/plain")
+    return Response(registro.exponer(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+def servidor_de_sesion():
+    """Servidor al que apunta la sesión web (el del link del panel, o el principal)."""
+    return servidores.resolver(session.get("servidor"))
+
 @app_web.route('/')
 def index():
+    # El panel de cada servidor enlaza a "/?servidor=<guild_id>"
+    if request.args.get("servidor"):
+        session["servidor"] = request.args["servidor"]
     if not session.get("discord_user"):
-        return send_from_directory('web', 'login.html')
-    if not estado_postulaciones["abierto"]:
-        return send_from_directory('web', 'cerrado.html')
-    return send_from_directory('web', 'index.html')
+        return paginas.servir('login.html')
+    if not servidores.abierto(servidor_de_sesion()):
+        return paginas.servir('cerrado.html')
+    return paginas.servir('index.html')
+
+@app_web.route('/preguntas')
+def preguntas_formulario():
+    """Set vigente del servidor de la sesión, para armar el formulario web."""
+    preguntas = preguntas_de(servidor_de_sesion())
+    if request.if_none_match.contains(preguntas["version"]):
+        return Response(status=304)
+    reglas = preguntas.get("validacion", {})
+    por_pregunta = reglas.get("por_pregunta", {})
+    resp = jsonify({
+        "ok": True,
+        "version": preguntas["version"],
+        "preguntas": [
+            {"campo": f"p{i+1}", "texto": texto,
+             "opciones": por_pregunta.get(f"p{i+1}", {}).get("opciones"),
+             "largo_maximo": campo[2], "requerida": campo[1]}
+            for i, (texto, campo) in enumerate(zip(preguntas["preguntas"], validador_de(preguntas).campos))
+        ],
+    })
+    resp.set_etag(preguntas["version"])
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
 
 @app_web.route('/login')
 def login():
+    limitada = limite_excedido("/login", como_json=False, ip=request.remote_addr)
+    if limitada:
+        return limitada
     params = urllib.parse.urlencode({
         "client_id":     DISCORD_CLIENT_ID,
         "redirect_uri":  get_redirect_uri(),
@@ -72,53 +269,41 @@ def login():
 
 @app_web.route('/callback')
 def callback():
+    limitada = limite_excedido("/callback", como_json=False, ip=request.remote_addr)
+    if limitada:
+        return limitada
     code = request.args.get("code")
     if not code:
         return redirect("/?error=no_code")
 
+    inicio = time.perf_counter()
     try:
-        data = urllib.parse.urlencode({
-            "client_id":     DISCORD_CLIENT_ID,
-            "client_secret": DISCORD_CLIENT_SECRET,
-            "grant_type":    "authorization_code",
-            "code":          code,
-            "redirect_uri":  get_redirect_uri(),
-        }).encode()
-
-        headers = {
-            "Content-Type": "application/x-www-form-urlencoded",
-            "User-Agent": "DiscordBot (PandaMC, 1.0)"
-        }
-        if _requests:
-            r = _requests.post(DISCORD_TOKEN_URL, data=data, headers=headers)
-            token_data = r.json()
-        else:
-            req = urllib.request.Request(DISCORD_TOKEN_URL, data=data, headers=headers, method="POST")
-            with urllib.request.urlopen(req) as resp:
-                token_data = json.loads(resp.read())
-
+        token_data = oauth.canjear_codigo(code)
         access_token = token_data.get("access_token")
         if not access_token:
             print(f"No access token, response: {token_data}")
+            metrica_oauth.etiquetar("sin_token").observar(time.perf_counter() - inicio)
             return redirect("/?error=no_token")
 
-        if _requests:
-            r2 = _requests.get(DISCORD_USER_URL, headers={"Authorization": f"Bearer {access_token}", "User-Agent": "DiscordBot (PandaMC, 1.0)"})
-            user_data = r2.json()
-        else:
-            req2 = urllib.request.Request(DISCORD_USER_URL, headers={"Authorization": f"Bearer {access_token}"})
-            with urllib.request.urlopen(req2) as resp2:
-                user_data = json.loads(resp2.read())
+        user_data = oauth.obtener_usuario(access_token)
+        metrica_oauth.etiquetar("ok").observar(time.perf_counter() - inicio)
 
+        if hasattr(session, "rotar"):
+            session.rotar()   # sesión del lado del servidor: id nuevo al iniciar sesión
         session["discord_user"] = {
             "id":          user_data.get("id"),
             "username":    user_data.get("username"),
             "global_name": user_data.get("global_name") or user_data.get("username"),
             "avatar":      user_data.get("avatar"),
         }
-        return redirect("/")
+        return redirect(session.pop("volver", "/"))
 
+    except ErrorOAuth as e:
+        metrica_oauth.etiquetar("error").observar(time.perf_counter() - inicio)
+        print(f"OAuth error: {e} (status={e.status}, cuerpo={e.cuerpo})")
+        return redirect("/?error=oauth_failed")
     except Exception as e:
+        metrica_oauth.etiquetar("error").observar(time.perf_counter() - inicio)
         import traceback
         print(f"OAuth error: {e}")
         print(f"OAuth error detail: {traceback.format_exc()}")
@@ -142,7 +327,7 @@ def ya_postulo():
     user = session.get("discord_user")
     if not user:
         return jsonify({"enviado": False})
-    enviado = user.get("id") in postulaciones_enviadas
+    enviado = almacen.ya_envio(user.get("id"), servidor_de_sesion())
     return jsonify({"enviado": enviado})
 
 @app_web.route('/enviar', methods=['POST'])
@@ -151,55 +336,425 @@ def recibir_postulacion():
     if not user:
         return jsonify({"ok": False, "error": "No autenticado"}), 401
 
+    limitada = limite_excedido("/enviar", ip=request.remote_addr, usuario=user.get("id"))
+    if limitada:
+        return limitada
+
+    guild_id = servidor_de_sesion()
+    if not servidores.abierto(guild_id):
+        return jsonify({"ok": False, "error": "cerrado"}), 403
+
     # ── Anti-duplicado ──
-    if user.get("id") in postulaciones_enviadas:
+    if almacen.ya_envio(user.get("id"), guild_id):
         return jsonify({"ok": False, "error": "ya_postulo"}), 409
 
-    data = None
+    # ── Tamaño: se decide con Content-Length, antes de leer el cuerpo ──
+    preguntas = preguntas_de(guild_id)
+    validador = validador_de(preguntas)
+    largo = request.content_length
+    if largo is None:
+        return jsonify({"ok": False, "error": "sin_largo"}), 411
+    if largo > validador.bytes_maximo:
+        return jsonify({"ok": False, "error": "demasiado_grande"}), 413
+
+    # ── Una sola lectura del cuerpo, parseada directo del stream ──
     try:
-        data = request.get_json(force=True, silent=True)
-    except Exception:
-        pass
-    if not data:
-        try:
-            data = json.loads(request.data.decode('utf-8'))
-        except Exception:
-            pass
-    if not data:
-        return jsonify({"ok": False, "error": "Sin datos"}), 400
+        crudo = json.load(request.stream)
+    except ValueError:
+        return jsonify({"ok": False, "error": "json_invalido"}), 400
+
+    # El formulario manda la versión con la que se armó; si el set cambió mientras se
+    # completaba, se valida (y se guarda) contra esa versión, no contra la nueva
+    version = crudo.pop("version", None) if isinstance(crudo, dict) else None
+    if version and version != preguntas["version"]:
+        anterior = sets_preguntas.version(version)
+        if not anterior or anterior["archivo"] != preguntas["archivo"]:
+            return jsonify({"ok": False, "error": "version"}), 409
+        preguntas, validador = anterior, validador_de(anterior)
+
+    data, errores = validador.validar(crudo)
+    if errores:
+        return jsonify({"ok": False, "error": "invalido", "campos": errores}), 400
 
     data["discord"]      = user.get("username")
     data["discord_id"]   = user.get("id")
     data["discord_name"] = user.get("global_name")
+    data["guild_id"]     = str(guild_id) if guild_id else None
+    data["preguntas_version"] = preguntas["version"]
 
-    # Marcar como enviado ANTES de procesar para evitar doble clic
-    postulaciones_enviadas.add(user.get("id"))
-    postulaciones_web_pendientes.append(data)
+    try:
+        encolada = encolar_postulacion_web(data)
+    except YaPostulo:
+        return jsonify({"ok": False, "error": "ya_postulo"}), 409
+    if not encolada:
+        resp = jsonify({"ok": False, "error": "cola_llena"})
+        resp.status_code = 503
+        resp.headers["Retry-After"] = str(COLA_RETRY_AFTER)
+        return resp
     return jsonify({"ok": True})
 
-def iniciar_servidor_web():
-    port = int(os.environ.get('PORT', 5000))
-    app_web.run(host='0.0.0.0', port=port, debug=False, use_reloader=False)
+def encolar_postulacion_web(data):
+    """Guarda la postulación y la pasa al loop del bot. Devuelve False si no hay lugar;
+    lanza YaPostulo si la persona ya había enviado una."""
+    loop = _loop_bot
+    if PROCESO != "todo" or loop is None or cola_postulaciones_web is None or loop.is_closed():
+        # Sin el loop del bot andando (todavía arrancando, o apagándose) queda guardada
+        # "en cola" y la levanta la recuperación al arrancar o el reintento
+        return encolar_para_el_bot(data)
+    if not _lugares_cola_web.acquire(blocking=False):
+        return False
+    try:
+        # La marca de enviada se reserva en la misma transacción: un doble clic da YaPostulo
+        data["postulacion_id"] = almacen.crear_postulacion(
+            data["discord_id"], "web", data, marcar_enviada=True, guild_id=data.get("guild_id")
+        )
+    except YaPostulo:
+        _lugares_cola_web.release()
+        raise
+    except Exception as e:
+        print(f"No se pudo encolar la postulación web: {e}")
+        _lugares_cola_web.release()
+        return False
+    data["_encolada_en"] = time.monotonic()   # no se persiste: ya se guardó arriba
+    _en_curso_web.add(data["postulacion_id"])
+    try:
+        loop.call_soon_threadsafe(cola_postulaciones_web.put_nowait, data)
+    except RuntimeError:
+        # El loop se cerró: ya está guardada "en cola", la toma el próximo arranque
+        _en_curso_web.discard(data["postulacion_id"])
+        _lugares_cola_web.release()
+    return True
+
+def encolar_para_el_bot(data):
+    """La postulación queda "en cola" en SQLite y el bot la levanta de ahí (procesos separados,
+    o el bot sin loop todavía). Devuelve False si ya hay COLA_WEB_MAX esperando."""
+    try:
+        if almacen.contar_en_estado(ESTADO_EN_COLA) >= COLA_WEB_MAX:
+            return False
+        data["postulacion_id"] = almacen.crear_postulacion(
+            data["discord_id"], "web", data, marcar_enviada=True, guild_id=data.get("guild_id")
+        )
+    except YaPostulo:
+        raise
+    except Exception as e:
+        print(f"No se pudo encolar la postulación web: {e}")
+        return False
+    return True
+
+# ─────────────────────────────────────────
+#  PANEL DE REVISIÓN (web)
+# ─────────────────────────────────────────
+# Mismo login de Discord que el formulario. Puede revisar quien figure en
+# REVISORES_IDS o, si esa lista está vacía, quien tenga el rol ROL_REVISOR_ID o
+# permiso de administrar el servidor. El permiso se consulta al bot y queda en
+# la sesión unos minutos. Las decisiones corren en el loop del bot con la misma
+# lógica que los botones del canal de revisión.
+REVISORES_IDS  = {i.strip() for i in os.environ.get("REVISORES_IDS", "").split(",") if i.strip()}
+ROL_REVISOR_ID = int(os.environ.get("ROL_REVISOR_ID", 0)) or None
+REVISOR_TTL    = int(os.environ.get("REVISOR_TTL", 300))
+PANEL_POR_PAGINA = 50
+
+def ejecutar_en_bot(coro, timeout=15):
+    """Corre una corrutina en el loop del bot desde un hilo web y devuelve su resultado."""
+    loop = _loop_bot
+    if loop is None or loop.is_closed():
+        coro.close()
+        raise RuntimeError("el bot no está conectado")
+    return asyncio.run_coroutine_threadsafe(coro, loop).result(timeout)
+
+# Lo que el panel le pide al bot, por nombre: en el mismo proceso corre directo en
+# su loop; con los procesos separados viaja por la tabla comandos_bot.
+COMANDOS_BOT = {}
+
+def pedir_al_bot(tipo, timeout=15, **datos):
+    """Corre un comando del bot y devuelve su resultado (serializable a JSON)."""
+    if PROCESO != "web":
+        return ejecutar_en_bot(COMANDOS_BOT[tipo](**datos), timeout)
+    comando_id = almacen.pedir_comando(tipo, datos, time.time() + timeout)
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        respuesta = almacen.respuesta_comando(comando_id)
+        if respuesta is not None:
+            if "error" in respuesta:
+                raise RuntimeError(respuesta["error"])
+            return respuesta["resultado"]
+        time.sleep(0.05)
+    raise TimeoutError(f"el bot no respondió el comando {tipo}")
+
+def revisor_de_sesion():
+    """(discord_id, guild_id) si el usuario de la sesión puede revisar; si no, None."""
+    user = session.get("discord_user")
+    guild_id = servidor_de_sesion()
+    if not user or not guild_id:
+        return None
+    permiso = session.get("revisor")
+    if not permiso or permiso.get("guild_id") != guild_id or permiso.get("hasta", 0) < time.time():
+        if REVISORES_IDS:
+            puede = user.get("id") in REVISORES_IDS
+        else:
+            try:
+                puede = pedir_al_bot("es_revisor", guild_id=guild_id, user_id=int(user["id"]))
+            except Exception as e:
+                print(f"No se pudo verificar al revisor {user.get('id')}: {e}")
+                return None
+        permiso = session["revisor"] = {"guild_id": guild_id, "puede": puede, "hasta": time.time() + REVISOR_TTL}
+    return (user["id"], guild_id) if permiso["puede"] else None
+
+def _filtros_panel(guild_id):
+    args = request.args
+    filtros = {
+        "texto":      args.get("q", "").strip()[:200] or None,
+        "estado":     args.get("estado") or None,
+        "plataforma": args.get("plataforma") or None,
+        "pais":       args.get("pais", "").strip().lower() or None,
+        "guild_id":   guild_id,
+        "incluir_sin_servidor": guild_id == servidores.principal_id,
+    }
+    for clave, dias in (("desde", 0), ("hasta", 1)):
+        if args.get(clave):
+            try:
+                fecha = datetime.strptime(args[clave], "%Y-%m-%d") + timedelta(days=dias)
+            except ValueError:
+                return None
+            filtros[clave] = fecha.timestamp()
+    # Por puntaje, la clave de paginación es "puntaje:id" (puntaje vacío = sin puntaje)
+    filtros["por_puntaje"] = args.get("orden") == "puntaje"
+    try:
+        if not args.get("antes"):
+            filtros["antes"] = None
+        elif filtros["por_puntaje"]:
+            puntaje, _, pid = args["antes"].partition(":")
+            filtros["antes"] = (int(puntaje) if puntaje else None, int(pid))
+        else:
+            filtros["antes"] = int(args["antes"]) or None
+    except ValueError:
+        return None
+    return filtros
+
+@app_web.route('/revision')
+def panel_revision():
+    if not session.get("discord_user"):
+        session["volver"] = "/revision"
+        return redirect("/login")
+    if not revisor_de_sesion():
+        return Response("No tienes permiso para revisar postulaciones.\n", status=403, mimetype="text/plain")
+    return paginas.servir('revision.html')
+
+@app_web.route('/revision/api/postulaciones')
+def panel_listado():
+    revisor = revisor_de_sesion()
+    if not revisor:
+        return jsonify({"ok": False, "error": "sin_permiso"}), 403
+    filtros = _filtros_panel(revisor[1])
+    if filtros is None:
+        return jsonify({"ok": False, "error": "filtro_invalido"}), 400
+    filas = almacen.buscar_postulaciones(limite=PANEL_POR_PAGINA, **filtros)
+    items = [{
+        "id": f["id"], "discord_id": f["discord_id"], "origen": f["origen"], "estado": f["estado"],
+        "creada": f["creada"], "plataforma": f["plataforma"], "pais": f["pais"],
+        "discord": f["datos"].get("discord"), "discord_name": f["datos"].get("discord_name"),
+        "puntaje": f["puntaje"], "banderas": len(f["banderas"]),
+    } for f in filas]
+    siguiente = None
+    if len(items) == PANEL_POR_PAGINA:
+        ultimo = items[-1]
+        siguiente = (f"{'' if ultimo['puntaje'] is None else ultimo['puntaje']}:{ultimo['id']}"
+                     if filtros["por_puntaje"] else ultimo["id"])
+    return jsonify({"ok": True, "postulaciones": items, "siguiente": siguiente})
+
+@app_web.route('/revision/api/paises')
+def panel_paises():
+    revisor = revisor_de_sesion()
+    if not revisor:
+        return jsonify({"ok": False, "error": "sin_permiso"}), 403
+    guild_id = revisor[1]
+    paises = almacen.paises(guild_id, incluir_sin_servidor=guild_id == servidores.principal_id)
+    return jsonify({"ok": True, "paises": [{"pais": p, "cantidad": n} for p, n in paises]})
+
+@app_web.route('/revision/api/postulaciones/<int:postulacion_id>')
+def panel_detalle(postulacion_id):
+    revisor = revisor_de_sesion()
+    if not revisor:
+        return jsonify({"ok": False, "error": "sin_permiso"}), 403
+    ficha = almacen.detalle_postulacion(postulacion_id)
+    if not ficha or (ficha["guild_id"] or servidores.principal_id) != revisor[1]:
+        return jsonify({"ok": False, "error": "no_existe"}), 404
+    datos = ficha.pop("datos")
+    preguntas = preguntas_version(datos.get("preguntas_version"), revisor[1]).get("preguntas", [])
+    ficha.pop("revision_canal_id"); ficha.pop("revision_mensaje_id")
+    ficha["discord"], ficha["discord_name"] = datos.get("discord"), datos.get("discord_name")
+    ficha["respuestas"] = [
+        {"numero": i + 1, "pregunta": preguntas[i] if i < len(preguntas) else f"Pregunta {i+1}",
+         "respuesta": datos[f"p{i+1}"]}
+        for i in range(max(len(preguntas), len(datos))) if datos.get(f"p{i+1}")
+    ]
+    return jsonify({"ok": True, "postulacion": ficha})
+
+@app_web.route('/revision/api/postulaciones/<int:postulacion_id>/<accion>', methods=['POST'])
+def panel_decidir(postulacion_id, accion):
+    revisor = revisor_de_sesion()
+    if not revisor:
+        return jsonify({"ok": False, "error": "sin_permiso"}), 403
+    if accion not in ("aceptar", "rechazar"):
+        return jsonify({"ok": False, "error": "accion_invalida"}), 404
+    # Un formulario de otro sitio no puede mandar JSON sin preflight de CORS
+    if not request.is_json:
+        return jsonify({"ok": False, "error": "se_espera_json"}), 415
+    try:
+        error = pedir_al_bot("decidir", timeout=30, postulacion_id=postulacion_id, accion=accion,
+                             revisor_id=revisor[0], guild_id=revisor[1])
+    except Exception as e:
+        print(f"Error aplicando la decisión del panel sobre {postulacion_id}: {e}")
+        return jsonify({"ok": False, "error": "bot_no_disponible"}), 503
+    if error:
+        return jsonify({"ok": False, "error": error}), 404 if error == "no_existe" else 409
+    return jsonify({"ok": True})
+
+@app_web.route('/revision/api/lote', methods=['POST'])
+def panel_lote():
+    revisor = revisor_de_sesion()
+    if not revisor:
+        return jsonify({"ok": False, "error": "sin_permiso"}), 403
+    cuerpo = request.get_json(silent=True) if request.is_json else None
+    if not isinstance(cuerpo, dict) or cuerpo.get("accion") not in ("aceptar", "rechazar"):
+        return jsonify({"ok": False, "error": "pedido_invalido"}), 400
+    try:
+        ids = {int(i) for i in cuerpo.get("ids", [])}
+    except (TypeError, ValueError):
+        return jsonify({"ok": False, "error": "pedido_invalido"}), 400
+    if not ids or len(ids) > LOTE_MAX:
+        return jsonify({"ok": False, "error": "cantidad_invalida", "maximo": LOTE_MAX}), 400
+
+    try:
+        resultado = pedir_al_bot("lote", timeout=60, guild_id=revisor[1], accion=cuerpo["accion"],
+                                 ids=sorted(ids), revisor_id=revisor[0])
+    except Exception as e:
+        print(f"Error aplicando el lote del panel: {e}")
+        return jsonify({"ok": False, "error": "bot_no_disponible"}), 503
+    if resultado is None:
+        return jsonify({"ok": False, "error": "sin_servidor"}), 409
+    resueltas, omitidas, trabajo = resultado
+    return jsonify({"ok": True, "resueltas": resueltas, "omitidas": omitidas, "trabajo": trabajo})
+
+@app_web.route('/revision/api/lote/<int:trabajo_id>')
+def panel_lote_avance(trabajo_id):
+    revisor = revisor_de_sesion()
+    if not revisor:
+        return jsonify({"ok": False, "error": "sin_permiso"}), 403
+    try:
+        trabajo = pedir_al_bot("avance_lote", trabajo_id=trabajo_id, guild_id=revisor[1])
+    except Exception as e:
+        print(f"Error consultando el lote {trabajo_id}: {e}")
+        return jsonify({"ok": False, "error": "bot_no_disponible"}), 503
+    if not trabajo:
+        return jsonify({"ok": False, "error": "no_existe"}), 404
+    return jsonify({"ok": True, "trabajo": trabajo})
+
+def iniciar_servidor_web(app=app_web, port=None, hilos=None):
+    port = port or int(os.environ.get('PORT', 5000))
+    modo = os.environ.get("SERVIDOR_WEB", "produccion" if _waitress else "desarrollo")
+    if modo == "produccion" and _waitress:
+        hilos = hilos or int(os.environ.get("WEB_HILOS", 16))
+        print(f"🌐 Servidor web (waitress) en :{port} con {hilos} hilos")
+        _waitress.serve(
+            app, host='0.0.0.0', port=port, threads=hilos,
+            connection_limit=int(os.environ.get("WEB_CONEXIONES_MAX", 1000)),
+            channel_timeout=int(os.environ.get("WEB_TIMEOUT", 30)),
+            ident="PandaMC",
+        )
+        return
+    if modo == "produccion":
+        print("⚠️ waitress no está instalado; usando el servidor de desarrollo de Flask")
+    app.run(host='0.0.0.0', port=port, debug=False, use_reloader=False, threaded=True)
+
+# Con PROCESO=bot la web corre aparte; las métricas del bot (cola, API de Discord)
+# se exponen solas en METRICAS_PUERTO si está configurado.
+app_metricas = Flask("metricas")
+app_metricas.add_url_rule('/metrics', view_func=metricas)
 
 # ─────────────────────────────────────────
 #  BOT DE DISCORD
 # ─────────────────────────────────────────
+# MIEMBROS_INTENT=no corre sin el intent privilegiado de miembros: discord.py no
+# descarga ni guarda la lista completa del servidor y los miembros se piden de a
+# uno (ver miembros.py). Conviene en servidores grandes.
+MIEMBROS_INTENT = os.environ.get("MIEMBROS_INTENT", "si").lower() not in ("no", "0", "false")
+
 intents = discord.Intents.default()
 intents.message_content = True
-intents.members = True
-
-bot = commands.Bot(command_prefix="!", intents=intents)
+intents.members = MIEMBROS_INTENT
+
+# BOT_SHARDING=auto reparte los servidores en shards (AutoShardedBot). Con SHARD_COUNT y
+# SHARD_IDS cada proceso puede correr sólo algunos shards de un mismo despliegue.
+BOT_SHARDING = os.environ.get("BOT_SHARDING", "no")
+
+# on_ready se repite en cada reconexión al gateway: lo que se hace una sola vez
+# (vistas persistentes, tareas de fondo, sincronizar comandos) va en setup_hook,
+# que corre una vez antes de conectar. Al cerrar se cancelan las tareas de fondo.
+class BotPostulaciones(commands.AutoShardedBot if BOT_SHARDING == "auto" else commands.Bot):
+    async def setup_hook(self):
+        await preparar_bot()
+
+    async def close(self):
+        await detener_bot()
+        await super().close()
+
+if BOT_SHARDING == "auto":
+    bot = BotPostulaciones(
+        command_prefix="!", intents=intents, http_trace=traza_api_discord(),
+        shard_count=int(os.environ.get("SHARD_COUNT", 0)) or None,
+        shard_ids=[int(n) for n in os.environ.get("SHARD_IDS", "").split(",") if n.strip()] or None,
+    )
+else:
+    bot = BotPostulaciones(command_prefix="!", intents=intents, http_trace=traza_api_discord())
 
 TOKEN = os.environ.get("TOKEN", "")
-config = {
-    "token": TOKEN,
+config = {"token": TOKEN}
+
+# Valores por defecto de cada servidor; servidores.json y lo guardado en la base los pisan.
+ajustes_por_defecto = {
     "categoria_postulaciones_id": int(os.environ.get("CATEGORIA_POSTULACIONES_ID", 0)) or None,
     "canal_revision_id":          int(os.environ.get("CANAL_REVISION_ID", 0)) or None,
     "canal_resultados_id":        int(os.environ.get("CANAL_RESULTADOS_ID", 0)) or None,
+    "canal_hilos_id":             int(os.environ.get("CANAL_HILOS_ID", 0)) or None,
+    "preguntas":                  os.environ.get("PREGUNTAS_ARCHIVO", "preguntas.json"),
+    "abierto":                    True,
 }
-
-with open('preguntas.json', 'r', encoding='utf-8') as f:
-    preguntas_data = json.load(f)
+servidores = ConfigServidores(
+    almacen, ajustes_por_defecto, os.environ.get("SERVIDORES_ARCHIVO", "servidores.json"),
+    principal=int(os.environ.get("GUILD_ID", 0)) or None,
+    # En el proceso web, abrir/cerrar y los servidores nuevos los escribe el bot
+    refresco=float(os.environ.get("SERVIDORES_REFRESCO", 5)) if PROCESO == "web" else 0,
+)
+
+# Postulación por chat: "canal" crea un canal privado por postulante; "hilo" abre un
+# hilo privado dentro de un canal fijo y lo archiva al terminar.
+MODO_CHAT = os.environ.get("MODO_CHAT", "canal")
+
+sets_preguntas = SetsPreguntas(almacen, float(os.environ.get("PREGUNTAS_RECARGA_SEG", 2)))
+sets_preguntas.actual(ajustes_por_defecto["preguntas"])   # un archivo roto tiene que fallar al arrancar
+
+def preguntas_de(guild_id):
+    """Set de preguntas vigente del servidor (el por defecto si no hay servidor)."""
+    if not guild_id:
+        return sets_preguntas.actual(ajustes_por_defecto["preguntas"])
+    return sets_preguntas.actual(servidores.obtener(guild_id)["preguntas"])
+
+def preguntas_version(version, guild_id=None):
+    """Set con el que se respondió una postulación; si no lo registró, el vigente del servidor."""
+    return sets_preguntas.version(version) or preguntas_de(guild_id)
+
+@functools.lru_cache(maxsize=64)
+def _validador(version):
+    return ValidadorPostulacion(sets_preguntas.version(version))
+
+def validador_de(preguntas):
+    """Validador del formulario web, compilado una vez por versión del set."""
+    return _validador(preguntas["version"])
+
+def tiempo_limite_min(preguntas):
+    """Tiempo para completar la postulación; cada set de preguntas puede definir el suyo."""
+    return preguntas.get("tiempo_limite_minutos", 34)
 
 try:
     with open('imagenes.json', 'r', encoding='utf-8') as f:
@@ -207,178 +762,529 @@ try:
 except:
     imagenes_config = {"imagen_aceptado": "", "imagen_rechazado": ""}
 
-postulaciones_activas = {}
+# Postulaciones por chat en curso { user_id: {...} }; se restauran al reiniciar.
+postulaciones_activas = almacen.activas
 
-def guardar_config():
-    pass
+despachador = Despachador(workers=int(os.environ.get("DESPACHADOR_WORKERS", 8)))
+canales = ResolutorCanales(servidores)
+planificador = PlanificadorPlazos(almacen)
+tareas = TareasFondo()
+miembros = CacheMiembros(
+    ttl=float(os.environ.get("MIEMBROS_CACHE_SEG", 300)),
+    maximo=int(os.environ.get("MIEMBROS_CACHE_MAX", 5000)),
+    simultaneas=int(os.environ.get("MIEMBROS_CONSULTAS_SIMULTANEAS", 5)),
+)
+
+# ─────────────────────────────────────────
+#  PLANTILLAS DEL DM DE ESTADO
+# ─────────────────────────────────────────
+# El DM "Pendiente" se reescribe al decidir; las tres versiones se arman una sola vez.
+_ESTADOS_DM = {
+    "Pendiente": ("`Pendiente`",    discord.Color.red(),   True),
+    "Aceptado":  ("`Aceptado` ✅",  discord.Color.green(), False),
+    "Rechazado": ("`Rechazado` ❌", discord.Color.red(),   False),
+}
+
+def _plantilla_dm(estado):
+    texto, color, con_imagen = _ESTADOS_DM[estado]
+    embed = discord.Embed(
+        title="<:duda_mineback:1472653801679884333> HEMOS RECIBIDO TU POSTULACION",
+        description=(
+            "Esta notificación aclara que la recibimos correctamente.\n\n"
+            "Hemos recibido tu `postulación para formar parte del equipo staff de PandaMC` "
+            "y se encuentra pendiente de revisión.\n"
+            "Desde ahora, hasta la resolución de la postulación, pueden pasar días. "
+            "Por favor, ten paciencia.\n\n"
+            "> Te notificaremos por este medio en cuanto el equipo tome una decisión.\n\n"
+            "<a:articulo_mineback:1454888675124052051> **Actualización del estado**\n"
+            f"> Estado actual: {texto}"
+        ),
+        color=color,
+    )
+    if con_imagen:
+        embed.set_image(url=IMG_PENDIENTE)
+    embed.set_footer(text="PandaMC Staff · Sistema de postulaciones")
+    return embed.to_dict()
+
+PLANTILLAS_DM = {estado: _plantilla_dm(estado) for estado in _ESTADOS_DM}
+
+def embed_dm_estado(estado):
+    embed = discord.Embed.from_dict(PLANTILLAS_DM[estado])
+    embed.timestamp = datetime.now()
+    return embed
+
+# ─────────────────────────────────────────
+#  TRIAJE
+# ─────────────────────────────────────────
+# Antes de publicar, las respuestas pasan por las reglas del bloque "triaje" del
+# set (ver triaje.py) en un pool de procesos; el puntaje y las banderas van en el
+# embed de revisión y se guardan para ordenar el panel. TRIAJE_PROCESOS=0 lo apaga
+# (el pool se crea al principio del módulo, en ESTADO GLOBAL).
+TRIAJE_TIMEOUT  = float(os.environ.get("TRIAJE_TIMEOUT", 10))
+
+def respuestas_de(datos):
+    """{ "p1": ..., } de los datos de una postulación, sin el resto de los campos."""
+    return {k: v for k, v in datos.items() if k[:1] == "p" and k[1:].isdigit() and isinstance(v, str)}
+
+async def triar(datos, preguntas, postulacion_id=None):
+    """(puntaje, banderas) de una postulación, o None si su set no tiene reglas o falló."""
+    config = preguntas.get("triaje")
+    if not config or pool_triaje is None:
+        return None
+    respuestas = respuestas_de(datos)
+    inicio = time.monotonic()
+    try:
+        puntaje, banderas = await asyncio.wait_for(
+            asyncio.get_running_loop().run_in_executor(pool_triaje, triaje.evaluar, config, respuestas),
+            TRIAJE_TIMEOUT)
+    except Exception as e:
+        print(f"⚠️ No se pudo puntuar la postulación {postulacion_id}: {e!r}")
+        return None
+    finally:
+        metrica_triaje.observar(time.monotonic() - inicio)
+    if puntaje is None:
+        return None
+    if postulacion_id:
+        almacen.guardar_triaje(postulacion_id, puntaje, banderas)
+    return puntaje, banderas
+
+def texto_triaje(resultado):
+    """Líneas para la descripción del embed de revisión."""
+    if resultado is None:
+        return ""
+    puntaje, banderas = resultado
+    icono = "🟢" if puntaje >= 75 else "🟡" if puntaje >= 50 else "🔴"
+    lineas = [f"🧮 **Triaje:** {icono} `{puntaje}/100`"]
+    lineas += [f"> ⚠️ {b[:150]}" for b in banderas[:10]]
+    return "\n".join(lineas) + "\n"
+
+# ─────────────────────────────────────────
+#  RESPUESTAS PARECIDAS
+# ─────────────────────────────────────────
+# Las preguntas del bloque "similares" del set se resumen en firmas MinHash (en
+# el mismo pool del triaje) y se buscan en el índice LSH de la base, ver
+# similares.py. Si otra postulación del servidor respondió casi lo mismo, el
+# embed de revisión lo avisa con links a esas postulaciones; después la nueva
+# queda indexada para comparar las que vengan.
+SIMILARES_MAXIMO = int(os.environ.get("SIMILARES_MAXIMO", 5))   # postulaciones listadas en el embed
+
+def _parecidas_en_indice(guild_id, postulacion_id, firmas, umbral):
+    """[(id, { pregunta: similitud }, detalle o None)], las que más preguntas comparten primero."""
+    por_postulacion = {}
+    for pregunta, (firma, claves) in firmas.items():
+        propia = similares.desde_bytes(firma)
+        for otra, firma_otra in almacen.candidatos_parecidos(guild_id, pregunta, claves, excluir=postulacion_id):
+            parecido = similares.similitud(propia, similares.desde_bytes(firma_otra))
+            if parecido >= umbral:
+                por_postulacion.setdefault(otra, {})[pregunta] = parecido
+    mejores = sorted(por_postulacion.items(),
+                     key=lambda item: (len(item[1]), max(item[1].values()), item[0]), reverse=True)
+    mejores = mejores[:SIMILARES_MAXIMO]
+    detalles = {d["id"]: d for d in almacen.detalles_postulaciones([pid for pid, _ in mejores])}
+    return [(pid, coincidencias, detalles.get(pid)) for pid, coincidencias in mejores]
+
+async def buscar_parecidas(datos, preguntas, postulacion_id, guild_id):
+    """Busca las postulaciones con respuestas casi iguales y suma esta al índice. [] si no hay o falló."""
+    config = preguntas.get("similares")
+    if not config or pool_triaje is None or not postulacion_id:
+        return []
+    try:
+        firmas = await asyncio.wait_for(
+            asyncio.get_running_loop().run_in_executor(pool_triaje, similares.firmas_de, config, respuestas_de(datos)),
+            TRIAJE_TIMEOUT)
+        parecidas = await asyncio.to_thread(
+            _parecidas_en_indice, guild_id, postulacion_id, firmas, float(config.get("umbral", 0.6)))
+    except Exception as e:
+        print(f"⚠️ No se pudieron comparar las respuestas de la postulación {postulacion_id}: {e!r}")
+        return []
+    almacen.guardar_firmas(postulacion_id, guild_id, firmas)
+    if parecidas:
+        metrica_parecidas.inc()
+    return parecidas
+
+def texto_parecidas(parecidas, guild_id):
+    """Líneas para la descripción del embed de revisión, con link al mensaje de cada postulación."""
+    if not parecidas:
+        return ""
+    lineas = ["🧬 **Respuestas casi iguales a otras postulaciones:**"]
+    for pid, coincidencias, detalle in parecidas:
+        if detalle and detalle["revision_mensaje_id"]:
+            enlace = (f"[#{pid}](https://discord.com/channels/{guild_id}/"
+                      f"{detalle['revision_canal_id']}/{detalle['revision_mensaje_id']})")
+        else:
+            enlace = f"`#{pid}`"
+        autor = f" de <@{detalle['discord_id']}>" if detalle else ""
+        preguntas = ", ".join(f"{p.upper()} {s:.0%}"
+                              for p, s in sorted(coincidencias.items(), key=lambda item: int(item[0][1:])))
+        lineas.append(f"> {enlace}{autor}: {preguntas}")
+    return "\n".join(lineas) + "\n"
 
 # ─────────────────────────────────────────
 #  TAREA: procesar postulaciones web
 # ─────────────────────────────────────────
-async def procesar_postulaciones_web():
+async def procesar_postulaciones_web(n):
     await bot.wait_until_ready()
     while not bot.is_closed():
-        if postulaciones_web_pendientes:
-            data = postulaciones_web_pendientes.pop(0)
-            try:
-                await enviar_al_canal_revision_web(data)
-            except Exception as e:
-                print(f"Error procesando postulación web: {e}")
-        await asyncio.sleep(3)
+        data = await cola_postulaciones_web.get()
+        pid = data.get("postulacion_id")
+        encolada = data.pop("_encolada_en", None)
+        if encolada is not None:
+            metrica_espera_cola.observar(time.monotonic() - encolada)
+        try:
+            # Una reentrega de algo que ya se publicó (otro proceso, un reinicio) no se repite
+            if pid and await asyncio.to_thread(almacen.estado_postulacion, pid) != ESTADO_EN_COLA:
+                continue
+            await enviar_al_canal_revision_web(data)
+            if pid:
+                # Escrito antes de soltar el id: el reintento no la puede ver "en cola" ya publicada
+                await asyncio.to_thread(almacen.actualizar_estado, pid, ESTADO_PUBLICADA, True)
+        except Exception as e:
+            print(f"Error procesando postulación web #{pid} (consumidor {n}), "
+                  f"se reintenta en {COLA_REINTENTO:.0f}s: {e}")
+        finally:
+            _en_curso_web.discard(pid)
+            cola_postulaciones_web.task_done()
+            _lugares_cola_web.release()
+
+async def tomar_lugar_cola_web():
+    """Espera un lugar en la cola web de a ratos cortos: un hilo trabado en el semáforo
+    no dejaría terminar asyncio.run al apagar. Devuelve False si el bot se cerró."""
+    while not await asyncio.to_thread(_lugares_cola_web.acquire, timeout=0.5):
+        if bot.is_closed():
+            return False
+    return True
+
+def poner_en_cola_web(pid, data):
+    """Pasa una postulación guardada a los consumidores, con su lugar ya tomado.
+    Devuelve False (y no la encola) si ya está en la cola o publicándose."""
+    if pid in _en_curso_web:
+        return False
+    data["postulacion_id"] = pid
+    _en_curso_web.add(pid)
+    cola_postulaciones_web.put_nowait(data)
+    return True
+
+async def reintentar_postulaciones_web():
+    """Vuelve a encolar las postulaciones que siguen "en cola" sin que nadie las tenga: las que
+    fallaron al publicarse o las que se guardaron sin el loop del bot andando."""
+    await bot.wait_until_ready()
+    while not bot.is_closed():
+        await asyncio.sleep(COLA_REINTENTO)
+        try:
+            trabadas = await asyncio.to_thread(almacen.en_cola_sin_tocar, time.time() - COLA_REINTENTO,
+                                               COLA_WEB_MAX)
+        except Exception as e:
+            print(f"Error buscando postulaciones web para reintentar: {e}")
+            continue
+        reintentadas = 0
+        for pid, data in trabadas:
+            if pid in _en_curso_web:
+                continue
+            if not await tomar_lugar_cola_web():
+                return
+            if poner_en_cola_web(pid, data):
+                reintentadas += 1
+            else:
+                _lugares_cola_web.release()
+        if reintentadas:
+            print(f"🔁 {reintentadas} postulaciones web reintentadas")
+
+def iniciar_consumidores_web():
+    """Crea la cola una sola vez y lanza los consumidores que no estén corriendo."""
+    global cola_postulaciones_web, _loop_bot
+    pendientes = []
+    if cola_postulaciones_web is None:
+        # Se leen antes de abrir la cola: lo que llegue después se encola directo desde /enviar.
+        # Con los procesos separados, traer_postulaciones_web levanta las viejas y las nuevas.
+        pendientes = almacen.postulaciones_en_estado(ESTADO_EN_COLA) if PROCESO == "todo" else []
+        cola_postulaciones_web = asyncio.Queue()
+        _loop_bot = asyncio.get_running_loop()
+        tareas.iniciar("recuperar_postulaciones", lambda: recuperar_postulaciones(pendientes))
+    for n in range(max(1, CONSUMIDORES_WEB)):
+        tareas.iniciar(f"consumidor_web:{n}", functools.partial(procesar_postulaciones_web, n))
+    tareas.iniciar("reintentar_postulaciones_web", reintentar_postulaciones_web)
+    if PROCESO == "bot":
+        tareas.iniciar("traer_postulaciones_web", traer_postulaciones_web)
+        tareas.iniciar("atender_comandos_web", atender_comandos_web)
+
+async def recuperar_postulaciones(pendientes):
+    """Reencola las postulaciones web que quedaron sin publicar y retoma las de chat."""
+    for pid, data in pendientes:
+        if not await tomar_lugar_cola_web():
+            return
+        if not poner_en_cola_web(pid, data):
+            _lugares_cola_web.release()
+    if pendientes:
+        print(f"🔁 {len(pendientes)} postulaciones web recuperadas")
+
+    # Los plazos vencidos mientras el bot estaba apagado necesitan los canales en caché
+    await bot.wait_until_ready()
+    planificador.iniciar()
+    for user_id, postulacion in list(postulaciones_activas.items()):
+        if not bot.get_channel(postulacion["canal_id"]):
+            planificador.cancelar(f"chat:{user_id}")
+            almacen.quitar_activa(user_id)
+            continue
+        # Postulaciones guardadas antes de que existiera el planificador
+        if not planificador.tiene(f"chat:{user_id}"):
+            programar_vencimiento_chat(user_id, postulacion["canal_id"], postulacion["tiempo_limite"])
+    if postulaciones_activas:
+        print(f"🔁 {len(postulaciones_activas)} postulaciones por chat retomadas")
+
+# ─────────────────────────────────────────
+#  PROCESOS SEPARADOS (lado del bot)
+# ─────────────────────────────────────────
+# Una postulación sigue "en cola" en SQLite hasta que se publica: si el bot se cae
+# a mitad de camino, al volver la toma de nuevo (entrega al menos una vez). Igual
+# con los comandos del panel que quedaron sin responder y todavía no vencieron.
+async def traer_postulaciones_web():
+    await bot.wait_until_ready()
+    ultimo = 0
+    while not bot.is_closed():
+        try:
+            nuevas = await asyncio.to_thread(almacen.siguientes_en_cola, ultimo)
+        except Exception as e:
+            print(f"Error leyendo la cola de postulaciones web: {e}")
+            nuevas = []
+        for pid, data in nuevas:
+            if not await tomar_lugar_cola_web():
+                return
+            if not poner_en_cola_web(pid, data):
+                _lugares_cola_web.release()
+            ultimo = pid
+        if not nuevas:
+            await asyncio.sleep(IPC_INTERVALO)
+
+async def atender_comandos_web():
+    await bot.wait_until_ready()
+    ultimo = 0
+    proxima_purga = 0.0
+    while not bot.is_closed():
+        try:
+            pendientes = await asyncio.to_thread(almacen.comandos_pendientes, ultimo)
+        except Exception as e:
+            print(f"Error leyendo los comandos de la web: {e}")
+            pendientes = []
+        ahora = time.time()
+        for comando_id, tipo, datos, vence in pendientes:
+            ultimo = comando_id
+            if vence < ahora or tipo not in COMANDOS_BOT:
+                almacen.responder_comando(comando_id, {"error": "vencido" if vence < ahora else "desconocido"})
+                continue
+            tareas.iniciar(f"comando:{comando_id}", functools.partial(_atender_comando, comando_id, tipo, datos))
+        if ahora >= proxima_purga:
+            almacen.purgar_comandos(ahora - 3600)
+            proxima_purga = ahora + 600
+        if not pendientes:
+            await asyncio.sleep(IPC_INTERVALO)
+
+async def _atender_comando(comando_id, tipo, datos):
+    try:
+        respuesta = {"resultado": await COMANDOS_BOT[tipo](**datos)}
+    except Exception as e:
+        print(f"Error atendiendo el comando {tipo} de la web: {e}")
+        respuesta = {"error": str(e)}
+    almacen.responder_comando(comando_id, respuesta)
+
+# Título y pie del embed de revisión según de dónde vino la postulación
+ORIGENES_REVISION = {
+    "web":   ("🌐 Nueva postulación WEB — Staff PandaMC",
+              "Enviado desde la página web · Verificado con Discord OAuth2"),
+    "modal": ("📝 Nueva postulación (formulario Discord) — Staff PandaMC", "Enviado desde formularios de Discord"),
+    "chat":  ("💬 Nueva postulación (chat) — Staff PandaMC", "Enviado desde el canal de postulación"),
+}
 
 async def enviar_al_canal_revision_web(data):
-    guild = next(iter(bot.guilds), None)
+    guild = bot.get_guild(servidores.resolver(data.get("guild_id")) or 0)
+    # Sin servidor o sin canal no se publica: el error deja la postulación "en cola" para reintentarla
     if not guild:
-        return
+        raise LookupError("sin servidor disponible")
 
-    canal_revision = None
-    if config.get("canal_revision_id"):
-        canal_revision = guild.get_channel(config["canal_revision_id"])
-    if not canal_revision:
-        canal_revision = discord.utils.get(guild.text_channels, name="postulaciones-staff")
-    if not canal_revision:
-        try:
-            canal_revision = await guild.create_text_channel(name="postulaciones-staff")
-            config["canal_revision_id"] = canal_revision.id
-        except:
-            return
+    try:
+        canal_revision = await canales.revision(guild)
+    except Exception as e:
+        raise RuntimeError(f"no se pudo crear el canal de revisión: {e}") from e
 
     discord_tag  = data.get('discord', 'No especificado')
     discord_name = data.get('discord_name', discord_tag)
     discord_id   = data.get('discord_id', '')
+    preguntas    = preguntas_version(data.get("preguntas_version"), guild.id)
+    resultado    = await triar(data, preguntas, data.get("postulacion_id"))
+    parecidas    = await buscar_parecidas(data, preguntas, data.get("postulacion_id"), guild.id)
 
+    titulo, pie = ORIGENES_REVISION.get(data.get("origen"), ORIGENES_REVISION["web"])
     embed = discord.Embed(
-        title="🌐 Nueva postulación WEB — Staff PandaMC",
+        title=titulo,
         description=(
             f"📌 **Discord:** `{discord_tag}` ({discord_name})\n"
             f"🆔 **ID:** `{discord_id}`\n"
+            + (f"🗂️ **Postulación:** `#{data['postulacion_id']}`\n" if data.get("postulacion_id") else "")
+            + texto_triaje(resultado)
+            + texto_parecidas(parecidas, guild.id)
         ),
         color=discord.Color.red(),
         timestamp=datetime.now()
     )
 
     # Agregar todas las respuestas del formulario
-    preguntas = preguntas_data.get("preguntas", [])
-    campos_form = [f"p{i+1}" for i in range(23)]
-    for i, key in enumerate(campos_form):
-        valor = data.get(key, "").strip()
+    for i, titulo in enumerate(preguntas.get("preguntas", [])):
+        valor = data.get(f"p{i+1}", "").strip()
         if valor:
-            titulo = preguntas[i] if i < len(preguntas) else f"Pregunta {i+1}"
             embed.add_field(name=f"P{i+1}: {titulo[:100]}", value=valor[:1024], inline=False)
 
-    embed.set_footer(text="Enviado desde la página web · Verificado con Discord OAuth2")
+    embed.set_footer(text=pie)
 
-    view = BotonesRevision(int(discord_id) if discord_id else 0, discord_tag)
-    await canal_revision.send(embed=embed, view=view)
+    view = vista_revision(int(discord_id) if discord_id else 0, data.get("postulacion_id") or 0)
+    mensaje = await despachador.enviar(ruta_canal(canal_revision), PRIORIDAD_REVISION,
+                                       lambda: canal_revision.send(embed=embed, view=view))
+    if data.get("postulacion_id"):
+        almacen.guardar_revision(data["postulacion_id"], mensaje.channel.id, mensaje.id)
 
     # ── Enviar DM al usuario con estado PENDIENTE ──
     if discord_id:
         try:
-            miembro = guild.get_member(int(discord_id))
+            miembro = await miembros.obtener(guild, int(discord_id))
             if not miembro:
-                miembro = await guild.fetch_member(int(discord_id))
-            if miembro:
-                dm_embed = discord.Embed(
-                    title="<:duda_mineback:1472653801679884333> HEMOS RECIBIDO TU POSTULACION",
-                    description=(
-                        "Esta notificación aclara que la recibimos correctamente.\n\n"
-                        "Hemos recibido tu `postulación para formar parte del equipo staff de PandaMC` "
-                        "y se encuentra pendiente de revisión.\n"
-                        "Desde ahora, hasta la resolución de la postulación, pueden pasar días. "
-                        "Por favor, ten paciencia.\n\n"
-                        "> Te notificaremos por este medio en cuanto el equipo tome una decisión.\n\n"
-                        "<a:articulo_mineback:1454888675124052051> **Actualización del estado**\n"
-                        "> Estado actual: `Pendiente`"
-                    ),
-                    color=discord.Color.red(),
-                    timestamp=datetime.now()
-                )
-                dm_embed.set_image(url=IMG_PENDIENTE)
-                dm_embed.set_footer(text="PandaMC Staff · Sistema de postulaciones")
+                raise LookupError("ya no está en el servidor")
+            dm_embed = embed_dm_estado("Pendiente")
 
-                dm_msg = await miembro.send(embed=dm_embed)
-                # Guardar el message_id del DM para editarlo después
-                dm_mensajes_postulacion[str(discord_id)] = dm_msg.id
+            dm_msg = await despachador.enviar(ruta_dm(discord_id), PRIORIDAD_DM,
+                                              lambda: miembro.send(embed=dm_embed))
+            # Guardar el message_id del DM para editarlo después
+            almacen.guardar_dm(discord_id, dm_msg.id, dm_msg.channel.id, guild.id)
         except Exception as e:
+            metrica_dm_fallidos.etiquetar("pendiente").inc()
             print(f"No se pudo enviar DM al postulante: {e}")
 
 # ─────────────────────────────────────────
 #  VISTAS / BOTONES
 # ─────────────────────────────────────────
+def url_postulacion(guild_id=None):
+    """Link a la página web, apuntando al servidor desde el que se abre."""
+    return f"{WEB_URL}/?servidor={guild_id}" if guild_id else WEB_URL
+
+
 class BotonPostular(discord.ui.View):
-    def __init__(self):
+    def __init__(self, guild_id=None):
         super().__init__(timeout=None)
         self.add_item(discord.ui.Button(
             label="Postularse (Web)",
             style=discord.ButtonStyle.link,
-            url=os.environ.get("WEB_URL", "http://localhost:5000"),
+            url=url_postulacion(guild_id),
             emoji="🌐"
         ))
 
+    @discord.ui.button(label="Postularse (Formulario)", style=discord.ButtonStyle.primary, custom_id="postular_modal", emoji="📝")
+    async def postular_modal(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await abrir_postulacion_modal(interaction)
+
     @discord.ui.button(label="Postularse (Chat)", style=discord.ButtonStyle.primary, custom_id="postular_button", emoji="<a:articulo_mineback:1454888675124052051>")
     async def postular_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if not servidores.abierto(interaction.guild_id):
+            await interaction.response.send_message("🔒 Las postulaciones están cerradas.", ephemeral=True)
+            return
         if interaction.user.id in postulaciones_activas:
             await interaction.response.send_message("❌ Ya tienes una postulación en proceso.", ephemeral=True)
             return
 
         guild = interaction.guild
-        categoria = None
-        if config.get("categoria_postulaciones_id"):
-            categoria = discord.utils.get(guild.categories, id=config["categoria_postulaciones_id"])
-        if not categoria:
-            categoria = discord.utils.get(guild.categories, name="📝 Postulaciones")
-            if not categoria:
-                try:
-                    categoria = await guild.create_category("📝 Postulaciones")
-                    config["categoria_postulaciones_id"] = categoria.id
-                except Exception as e:
-                    await interaction.response.send_message(f"❌ Error: {e}", ephemeral=True)
-                    return
+        if MODO_CHAT == "hilo":
+            try:
+                canal = await abrir_hilo_postulacion(guild, interaction.user)
+            except Exception as e:
+                await interaction.response.send_message(f"❌ Error al crear el hilo: {e}", ephemeral=True)
+                return
+        else:
+            try:
+                categoria = await canales.categoria(guild)
+            except Exception as e:
+                await interaction.response.send_message(f"❌ Error: {e}", ephemeral=True)
+                return
 
-        try:
-            overwrites = {
-                guild.default_role: discord.PermissionOverwrite(read_messages=False),
-                interaction.user: discord.PermissionOverwrite(read_messages=True, send_messages=True),
-                guild.me: discord.PermissionOverwrite(read_messages=True, send_messages=True)
-            }
-            canal = await categoria.create_text_channel(
-                name=f"🔨・postulacion-{interaction.user.name}",
-                overwrites=overwrites
-            )
-        except Exception as e:
-            await interaction.response.send_message(f"❌ Error al crear canal: {e}", ephemeral=True)
-            return
+            try:
+                overwrites = {
+                    guild.default_role: discord.PermissionOverwrite(read_messages=False),
+                    interaction.user: discord.PermissionOverwrite(read_messages=True, send_messages=True),
+                    guild.me: discord.PermissionOverwrite(read_messages=True, send_messages=True)
+                }
+                canal = await categoria.create_text_channel(
+                    name=f"🔨・postulacion-{interaction.user.name}",
+                    overwrites=overwrites
+                )
+            except Exception as e:
+                await interaction.response.send_message(f"❌ Error al crear canal: {e}", ephemeral=True)
+                return
 
-        postulaciones_activas[interaction.user.id] = {
+        preguntas = preguntas_de(guild.id)
+        tiempo_limite = datetime.now() + timedelta(minutes=tiempo_limite_min(preguntas))
+        almacen.guardar_activa(interaction.user.id, {
             "canal_id": canal.id,
             "respuestas": {},
             "pregunta_actual": 0,
+            "preguntas_version": preguntas["version"],
             "inicio": datetime.now().isoformat(),
-            "tiempo_limite": datetime.now() + timedelta(minutes=34)
-        }
+            "tiempo_limite": tiempo_limite
+        })
+        programar_vencimiento_chat(interaction.user.id, canal.id, tiempo_limite)
 
         await interaction.response.send_message(
             f"> <:si_mineback:1454893106179735642> Canal creado: {canal.mention}", ephemeral=True
         )
         await iniciar_postulacion(canal, interaction.user)
-        asyncio.create_task(temporizador_postulacion(canal, interaction.user.id, 34))
 
 
-async def temporizador_postulacion(canal, user_id, minutos):
-    await asyncio.sleep(minutos * 60)
-    if user_id in postulaciones_activas:
-        postulacion = postulaciones_activas[user_id]
-        if postulacion["canal_id"] == canal.id:
-            try:
-                await canal.send("⏰ **Tiempo agotado.** El canal se cerrará en 10 segundos.")
-                await asyncio.sleep(10)
-                await canal.delete()
-                del postulaciones_activas[user_id]
-            except:
-                pass
+async def abrir_hilo_postulacion(guild, usuario):
+    """Crea un hilo privado para el postulante bajo el canal fijo de postulaciones por chat."""
+    canal_base = await canales.hilos(guild)
+    hilo = await canal_base.create_thread(
+        name=f"postulacion-{usuario.name}",
+        type=discord.ChannelType.private_thread,
+        invitable=False,
+        auto_archive_duration=1440,
+    )
+    await hilo.add_user(usuario)
+    return hilo
+
+
+async def cerrar_canal_postulacion(canal):
+    """Archiva el hilo (modo "hilo") o borra el canal (modo "canal") de una postulación."""
+    if isinstance(canal, discord.Thread):
+        await canal.edit(archived=True, locked=True)
+    else:
+        await canal.delete()
+
+
+def programar_vencimiento_chat(user_id, canal_id, tiempo_limite):
+    planificador.programar(f"chat:{user_id}", "postulacion_chat", tiempo_limite.timestamp(),
+                           {"user_id": user_id, "canal_id": canal_id})
+
+
+async def vencer_postulacion_chat(datos):
+    user_id = datos["user_id"]
+    postulacion = postulaciones_activas.get(user_id)
+    if not postulacion or postulacion["canal_id"] != datos["canal_id"]:
+        return
+    canal = bot.get_channel(datos["canal_id"])
+    almacen.quitar_activa(user_id)
+    if not canal:
+        return
+    try:
+        await canal.send("⏰ **Tiempo agotado.** El canal se cerrará en 10 segundos.")
+        await asyncio.sleep(10)
+        await cerrar_canal_postulacion(canal)
+    except Exception as e:
+        print(f"No se pudo cerrar el canal vencido: {e}")
+
+planificador.registrar("postulacion_chat", vencer_postulacion_chat)
+
+
+def preguntas_de_chat(postulacion, guild_id):
+    """Set de una postulación por chat: el de la versión con la que empezó."""
+    return preguntas_version((postulacion or {}).get("preguntas_version"), guild_id)
 
 
 async def iniciar_postulacion(canal, usuario):
+    preguntas = preguntas_de_chat(postulaciones_activas.get(usuario.id), canal.guild.id)
     embed = discord.Embed(
         title="<:mineback:1454904946452598794> Proceso de Postulación — Staff PandaMC",
         description=f"¡Hola {usuario.mention}! Bienvenido a tu canal privado de postulación.",
@@ -387,14 +1293,14 @@ async def iniciar_postulacion(canal, usuario):
     embed.add_field(name="<a:articulo_mineback:1454888675124052051> Instrucciones", value=(
         "**1.** Responde cada pregunta de forma clara y detallada.\n"
         "**2.** Revisa tus respuestas antes de enviar.\n"
-        "**3.** Tienes **34 minutos** para completar el proceso."
+        f"**3.** Tienes **{tiempo_limite_min(preguntas)} minutos** para completar el proceso."
     ), inline=False)
     await canal.send(embed=embed)
     await enviar_pregunta(canal, usuario.id, 0)
 
 
 async def enviar_pregunta(canal, user_id, indice):
-    preguntas = preguntas_data["preguntas"]
+    preguntas = preguntas_de_chat(postulaciones_activas.get(user_id), canal.guild.id)["preguntas"]
     if indice >= len(preguntas):
         await finalizar_postulacion(canal, user_id)
         return
@@ -406,230 +1312,776 @@ async def finalizar_postulacion(canal, user_id):
     if not postulacion:
         return
     embed = discord.Embed(title="📋 Resumen de tu postulación", color=discord.Color.red())
-    for i, pregunta in enumerate(preguntas_data["preguntas"]):
+    for i, pregunta in enumerate(preguntas_de_chat(postulacion, canal.guild.id)["preguntas"]):
         embed.add_field(name=f"P{i+1}: {pregunta}", value=postulacion["respuestas"].get(i, "Sin respuesta")[:1024], inline=False)
-    await canal.send(embed=embed, view=ConfirmarPostulacion(user_id))
+    await canal.send(embed=embed, view=vista_confirmar_postulacion(user_id))
 
 
-class BotonesRevision(discord.ui.View):
-    def __init__(self, user_id, username):
-        super().__init__(timeout=None)
-        self.user_id  = user_id
-        self.username = username
-
-    async def _get_canal_resultados(self, guild):
-        canal = guild.get_channel(config.get("canal_resultados_id")) if config.get("canal_resultados_id") else None
-        if not canal:
-            canal = discord.utils.get(guild.text_channels, name="resultados-postulaciones")
-        return canal
-
-    async def _editar_dm_estado(self, guild, nuevo_estado: str, color: discord.Color, emoji_estado: str):
-        """Edita el DM original del postulante para cambiar el estado."""
-        usuario = guild.get_member(self.user_id)
-        if not usuario:
-            return
-        dm_msg_id = dm_mensajes_postulacion.get(str(self.user_id))
-        if not dm_msg_id:
-            return
-        try:
-            dm_channel = await usuario.create_dm()
-            dm_msg = await dm_channel.fetch_message(dm_msg_id)
-            embed = dm_msg.embeds[0] if dm_msg.embeds else None
-            if embed:
-                embed_dict = embed.to_dict()
-                desc = embed_dict.get("description", "")
-                import re
-                desc = re.sub(
-                    r"> Estado actual: `[^`]+`",
-                    f"> Estado actual: `{nuevo_estado}` {emoji_estado}",
-                    desc
-                )
-                embed_dict["description"] = desc
-                embed_dict["color"] = color.value
-                embed_dict.pop("image", None)
-                new_embed = discord.Embed.from_dict(embed_dict)
-                await dm_msg.edit(embed=new_embed)
-        except Exception as e:
-            print(f"No se pudo editar el DM: {e}")
+# ─────────────────────────────────────────
+#  REVISIÓN (botones persistentes)
+# ─────────────────────────────────────────
+# El custom_id lleva el postulante y la postulación ("revision:aceptar:<user_id>:<postulacion_id>"),
+# así un único handler dinámico atiende todos los mensajes, incluso después de reiniciar,
+# sin guardar una View por cada postulación pendiente.
 
-    @discord.ui.button(label="Aceptar", style=discord.ButtonStyle.success, custom_id="aceptar_postulacion", emoji="<:si_mineback:1455742911739199724>")
-    async def aceptar(self, interaction: discord.Interaction, button: discord.ui.Button):
-        guild     = interaction.guild
-        canal_res = await self._get_canal_resultados(guild)
-        usuario   = guild.get_member(self.user_id)
+_decisiones_en_curso = set()
 
-        if canal_res:
-            nombre = usuario.mention if usuario else f"**{self.username}**"
-            e = discord.Embed(
-                title=f"[INGRESO] El postulante {self.username} fue admitido en el Staff de PandaMC",
-                description=(
-                    f"{nombre} fue admitido en el Staff de PandaMC\n\n"
-                    "Al igual que los demás postulantes y staff, esperamos que logre alcanzar sus metas, "
-                    "y demostrar lo mucho que vale dentro de PandaMC.\n\n"
-                    "> ➡ Recuerda que entrar al staff es solo el comienzo. Hay muchas etapas que aprobar una vez logres entrar.\n"
-                    "> ¡Mantenerse y crecer es lo difícil!\n\n"
-                    'Un día un sabio dijo... "*Las pequeñas cosas son las responsables de los **grandes cambios**"'
-                ),
-                color=discord.Color.red(),
-                timestamp=datetime.now()
-            )
-            e.set_image(url="https://media.discordapp.net/attachments/1145130881124667422/1473781003116871964/admitivo.png?ex=69977504&is=69962384&hm=28c70011e74532ebe684585222949724f4e2dbb2599ff568a2a9c60ea19aeeab&=&format=webp&quality=lossless&width=842&height=562")
-            await canal_res.send(embed=e)
+async def _editar_dm_estado(guild, user_id, nuevo_estado: str):
+    """Reescribe el DM "Pendiente" del postulante con el nuevo estado, sin leerlo antes."""
+    canal_id, dm_msg_id = almacen.dm_de(user_id, guild.id)
+    if not dm_msg_id:
+        return
+    ruta = ruta_dm(user_id)
+    try:
+        if not canal_id:
+            # DMs guardados antes de registrar el canal: hay que abrirlo una vez
+            usuario = await miembros.obtener(guild, user_id)
+            if not usuario:
+                return
+            dm_channel = usuario.dm_channel or await despachador.enviar(ruta, PRIORIDAD_DM, usuario.create_dm,
+                                                                          idempotente=True)
+            canal_id = dm_channel.id
+        mensaje = bot.get_partial_messageable(canal_id, type=discord.ChannelType.private).get_partial_message(dm_msg_id)
+        nuevo_embed = embed_dm_estado(nuevo_estado)
+        await despachador.enviar(ruta, PRIORIDAD_DM, lambda: mensaje.edit(embed=nuevo_embed), idempotente=True)
+    except Exception as e:
+        metrica_dm_fallidos.etiquetar("edicion").inc()
+        print(f"No se pudo editar el DM: {e}")
 
-        if usuario:
-            try:
-                e_dm = discord.Embed(
-                    title="<:si_mineback:1455742911739199724> ACTUALIZACION DE TU POSTULACION",
-                    description=(
-                        "¡Tu postulación fue **aceptada**! ¡Bienvenido al equipo! 🎊\n\n"
-                        "<a:articulo_mineback:1454888675124052051> **Actualización del estado**\n"
-                        "> Estado actual: `Aceptado` ✅"
-                    ),
-                    color=discord.Color.green(),
-                    timestamp=datetime.now()
-                )
-                e_dm.set_footer(text="PandaMC Staff · Sistema de postulaciones")
-                await usuario.send(embed=e_dm)
-            except:
-                pass
 
-        await self._editar_dm_estado(guild, "Aceptado", discord.Color.green(), "✅")
+def vista_revision(user_id, postulacion_id, deshabilitada=False):
+    """View de Aceptar/Rechazar. Sólo tiene ítems dinámicos, así que discord.py no la retiene."""
+    view = discord.ui.View(timeout=None)
+    for accion in ("aceptar", "rechazar"):
+        boton = BotonRevision(accion, user_id, postulacion_id)
+        boton.item.disabled = deshabilitada
+        view.add_item(boton)
+    return view
 
-        embed = interaction.message.embeds[0]
-        embed.title = "✅ POSTULACIÓN ACEPTADA"
-        for item in self.children: item.disabled = True
-        await interaction.response.edit_message(embed=embed, view=self)
-        await interaction.followup.send(f"> ✅ Aceptada por {interaction.user.mention}")
 
-    @discord.ui.button(label="Rechazar", style=discord.ButtonStyle.danger, custom_id="rechazar_postulacion", emoji="<:No_mineback:1455742851601268868>")
-    async def rechazar(self, interaction: discord.Interaction, button: discord.ui.Button):
-        guild     = interaction.guild
-        canal_res = await self._get_canal_resultados(guild)
-        usuario   = guild.get_member(self.user_id)
+def _nombre_postulante(usuario, user_id, postulacion_id):
+    if usuario:
+        return usuario.name
+    if postulacion_id:
+        datos = almacen.obtener_postulacion(postulacion_id)
+        if datos and datos.get("discord"):
+            return datos["discord"]
+    return str(user_id)
 
-        if canal_res:
-            nombre = usuario.mention if usuario else f"**{self.username}**"
-            e = discord.Embed(
-                title=f"[RESULTADO] La postulación de {self.username} fue rechazada en el Staff de PandaMC",
-                description=(
-                    f"{nombre} tu postulación para formar parte del Staff de PandaMC ha sido revisada, "
-                    "y en esta ocasión no ha sido aprobada.\n\n"
-                    "Agradecemos el tiempo, esfuerzo e interés que mostraste al querer formar parte del equipo de PandaMC.\n\n"
-                    "> ➡ Recuerda: un rechazo no define tu capacidad. Siempre puedes mejorar, aprender y volver a intentarlo en el futuro.\n"
-                    "> Cada experiencia es una oportunidad para crecer.\n\n"
-                    'Un día un sabio dijo... "Los grandes logros nacen después de muchos intentos."'
-                ),
-                color=discord.Color.red(),
-                timestamp=datetime.now()
-            )
-            e.set_image(url="https://media.discordapp.net/attachments/1472406542824378490/1473783165616263344/rechazado.jpg?ex=69977708&is=69962588&hm=14bf8058f83868ed48178bb37d2fa6429f7472fdbe0f8bd324684ca41a8b6254&=&format=webp&width=842&height=562")
-            await canal_res.send(embed=e)
 
-        if usuario:
+def _titulo_decision(aceptada):
+    return "✅ POSTULACIÓN ACEPTADA" if aceptada else "❌ POSTULACIÓN RECHAZADA"
+
+
+def marcar_embed_decision(embed, aceptada):
+    """Deja el embed de revisión con el resultado (título y color), igual desde cualquier camino."""
+    embed.title = _titulo_decision(aceptada)
+    embed.color = discord.Color.green() if aceptada else discord.Color.dark_red()
+    return embed
+
+
+def _aviso_decision(aceptada, revisor):
+    return f"> ✅ Aceptada por {revisor}" if aceptada else f"> ❌ Rechazada por {revisor}"
+
+
+async def es_revisor(guild_id, user_id):
+    """¿Puede este miembro revisar postulaciones en el servidor? (para el panel web)"""
+    guild = bot.get_guild(guild_id)
+    if not guild:
+        return False
+    miembro = await miembros.obtener(guild, user_id)
+    if not miembro:
+        return False
+    permisos = miembro.guild_permissions
+    if permisos.administrator or permisos.manage_guild:
+        return True
+    return bool(ROL_REVISOR_ID) and any(rol.id == ROL_REVISOR_ID for rol in miembro.roles)
+
+
+async def resolver_postulacion(interaction: discord.Interaction, accion, user_id, postulacion_id):
+    """Botones de revisión: marca el mensaje desde la interacción y aplica la decisión."""
+    clave = postulacion_id or f"u{user_id}"
+    if clave in _decisiones_en_curso:
+        await interaction.response.send_message("⚠️ Otro miembro del staff ya está resolviendo esta postulación.", ephemeral=True)
+        return
+    _decisiones_en_curso.add(clave)
+    try:
+        aceptada = accion == "aceptar"
+        embed = marcar_embed_decision(interaction.message.embeds[0], aceptada)
+        view  = vista_revision(user_id, postulacion_id, deshabilitada=True)
+        await despachador.enviar(ruta_interaccion(interaction), PRIORIDAD_INTERACCION,
+                                 lambda: interaction.response.edit_message(embed=embed, view=view), reintentos=0)
+        aviso = _aviso_decision(aceptada, interaction.user.mention)
+        despachador.programar(ruta_interaccion(interaction), PRIORIDAD_INTERACCION,
+                              lambda: interaction.followup.send(aviso), descripcion="aviso de decisión")
+        await aplicar_decision(interaction.guild, accion, user_id, postulacion_id)
+    finally:
+        _decisiones_en_curso.discard(clave)
+
+
+async def decidir_desde_panel(postulacion_id, accion, revisor_id, guild_id):
+    """Decisión tomada en el panel web. Devuelve None si se aplicó, o el motivo si no."""
+    ficha = await asyncio.to_thread(almacen.detalle_postulacion, postulacion_id)
+    if not ficha or (ficha["guild_id"] or servidores.principal_id) != guild_id:
+        return "no_existe"
+    if ficha["estado"] in (ESTADO_ACEPTADA, ESTADO_RECHAZADA):
+        return "ya_resuelta"
+    guild = bot.get_guild(guild_id)
+    if not guild:
+        return "sin_servidor"
+    if postulacion_id in _decisiones_en_curso:
+        return "en_curso"
+    _decisiones_en_curso.add(postulacion_id)
+    try:
+        user_id  = int(ficha["discord_id"])
+        aceptada = accion == "aceptar"
+        canal    = bot.get_channel(ficha["revision_canal_id"] or 0)
+        if canal and ficha["revision_mensaje_id"]:
+            # Mismo resultado que el botón: el mensaje de revisión queda marcado y sin botones activos
+            ruta = ruta_canal(canal)
             try:
-                e_dm = discord.Embed(
-                    title="<:No_mineback:1455742851601268868> ACTUALIZACION DE TU POSTULACION",
-                    description=(
-                        "Tu postulación fue **rechazada**. Puedes reintentar en 14 días. 💪\n\n"
-                        "<a:articulo_mineback:1454888675124052051> **Actualización del estado**\n"
-                        "> Estado actual: `Rechazado` ❌"
-                    ),
-                    color=discord.Color.red(),
-                    timestamp=datetime.now()
-                )
-                e_dm.set_footer(text="PandaMC Staff · Sistema de postulaciones")
-                await usuario.send(embed=e_dm)
-            except:
-                pass
+                mensaje = await despachador.enviar(ruta, PRIORIDAD_INTERACCION,
+                                                   lambda: canal.fetch_message(ficha["revision_mensaje_id"]),
+                                                   idempotente=True)
+                embed = marcar_embed_decision(mensaje.embeds[0], aceptada)
+                view = vista_revision(user_id, postulacion_id, deshabilitada=True)
+                await despachador.enviar(ruta, PRIORIDAD_INTERACCION, lambda: mensaje.edit(embed=embed, view=view),
+                                         idempotente=True)
+                aviso = _aviso_decision(aceptada, f"<@{revisor_id}> (panel web)")
+                despachador.programar(ruta, PRIORIDAD_INTERACCION,
+                                      lambda: mensaje.reply(aviso, mention_author=False), descripcion="aviso de decisión")
+            except Exception as e:
+                print(f"No se pudo marcar el mensaje de revisión de {postulacion_id}: {e}")
+        await aplicar_decision(guild, accion, user_id, postulacion_id)
+    finally:
+        _decisiones_en_curso.discard(postulacion_id)
+    return None
+
+COMANDOS_BOT.update(es_revisor=es_revisor, decidir=decidir_desde_panel)
+
+
+IMG_ACEPTADO  = "https://media.discordapp.net/attachments/1145130881124667422/1473781003116871964/admitivo.png?ex=69977504&is=69962384&hm=28c70011e74532ebe684585222949724f4e2dbb2599ff568a2a9c60ea19aeeab&=&format=webp&quality=lossless&width=842&height=562"
+IMG_RECHAZADO = "https://media.discordapp.net/attachments/1472406542824378490/1473783165616263344/rechazado.jpg?ex=69977708&is=69962588&hm=14bf8058f83868ed48178bb37d2fa6429f7472fdbe0f8bd324684ca41a8b6254&=&format=webp&width=842&height=562"
+
+
+def embed_resultado(aceptada, username, nombre):
+    """Anuncio en el canal de resultados para una sola postulación."""
+    if aceptada:
+        e = discord.Embed(
+            title=f"[INGRESO] El postulante {username} fue admitido en el Staff de PandaMC",
+            description=(
+                f"{nombre} fue admitido en el Staff de PandaMC\n\n"
+                "Al igual que los demás postulantes y staff, esperamos que logre alcanzar sus metas, "
+                "y demostrar lo mucho que vale dentro de PandaMC.\n\n"
+                "> ➡ Recuerda que entrar al staff es solo el comienzo. Hay muchas etapas que aprobar una vez logres entrar.\n"
+                "> ¡Mantenerse y crecer es lo difícil!\n\n"
+                'Un día un sabio dijo... "*Las pequeñas cosas son las responsables de los **grandes cambios**"'
+            ),
+            color=discord.Color.red(),
+            timestamp=datetime.now()
+        )
+        e.set_image(url=IMG_ACEPTADO)
+    else:
+        e = discord.Embed(
+            title=f"[RESULTADO] La postulación de {username} fue rechazada en el Staff de PandaMC",
+            description=(
+                f"{nombre} tu postulación para formar parte del Staff de PandaMC ha sido revisada, "
+                "y en esta ocasión no ha sido aprobada.\n\n"
+                "Agradecemos el tiempo, esfuerzo e interés que mostraste al querer formar parte del equipo de PandaMC.\n\n"
+                "> ➡ Recuerda: un rechazo no define tu capacidad. Siempre puedes mejorar, aprender y volver a intentarlo en el futuro.\n"
+                "> Cada experiencia es una oportunidad para crecer.\n\n"
+                'Un día un sabio dijo... "Los grandes logros nacen después de muchos intentos."'
+            ),
+            color=discord.Color.red(),
+            timestamp=datetime.now()
+        )
+        e.set_image(url=IMG_RECHAZADO)
+    return e
+
+
+def embed_dm_resultado(aceptada):
+    if aceptada:
+        e_dm = discord.Embed(
+            title="<:si_mineback:1455742911739199724> ACTUALIZACION DE TU POSTULACION",
+            description=(
+                "¡Tu postulación fue **aceptada**! ¡Bienvenido al equipo! 🎊\n\n"
+                "<a:articulo_mineback:1454888675124052051> **Actualización del estado**\n"
+                "> Estado actual: `Aceptado` ✅"
+            ),
+            color=discord.Color.green(),
+            timestamp=datetime.now()
+        )
+    else:
+        e_dm = discord.Embed(
+            title="<:No_mineback:1455742851601268868> ACTUALIZACION DE TU POSTULACION",
+            description=(
+                "Tu postulación fue **rechazada**. Puedes reintentar en 14 días. 💪\n\n"
+                "<a:articulo_mineback:1454888675124052051> **Actualización del estado**\n"
+                "> Estado actual: `Rechazado` ❌"
+            ),
+            color=discord.Color.red(),
+            timestamp=datetime.now()
+        )
+    e_dm.set_footer(text="PandaMC Staff · Sistema de postulaciones")
+    return e_dm
 
-        await self._editar_dm_estado(guild, "Rechazado", discord.Color.red(), "❌")
 
-        embed = interaction.message.embeds[0]
-        embed.title = "❌ POSTULACIÓN RECHAZADA"
-        for item in self.children: item.disabled = True
-        await interaction.response.edit_message(embed=embed, view=self)
-        await interaction.followup.send(f"> ❌ Rechazada por {interaction.user.mention}")
+async def aplicar_decision(guild, accion, user_id, postulacion_id):
+    """Guarda la decisión, la anuncia en resultados y avisa al postulante por DM."""
+    aceptada = accion == "aceptar"
+    estado = ESTADO_ACEPTADA if aceptada else ESTADO_RECHAZADA
+    if postulacion_id:
+        almacen.actualizar_estado(postulacion_id, estado)
+    else:
+        almacen.actualizar_estado_por_usuario(user_id, estado, guild.id)
 
+    canal_res = await canales.resultados(guild)
+    try:
+        usuario = await miembros.obtener(guild, user_id)
+    except discord.HTTPException as e:
+        print(f"No se pudo buscar al postulante {user_id}: {e}")
+        usuario = None
+    username  = _nombre_postulante(usuario, user_id, postulacion_id)
+
+    if canal_res:
+        e = embed_resultado(aceptada, username, usuario.mention if usuario else f"**{username}**")
+        despachador.programar(ruta_canal(canal_res), PRIORIDAD_RESULTADO,
+                              lambda: canal_res.send(embed=e), descripcion=f"anuncio de {accion}")
+
+    if usuario:
+        e_dm = embed_dm_resultado(aceptada)
+        despachador.programar(ruta_dm(user_id), PRIORIDAD_DM,
+                              lambda: usuario.send(embed=e_dm), descripcion=f"DM de {accion}",
+                              al_fallar=lambda e: metrica_dm_fallidos.etiquetar("resultado").inc())
+
+    await _editar_dm_estado(guild, user_id, "Aceptado" if aceptada else "Rechazado")
+
+
+class BotonRevision(discord.ui.DynamicItem[discord.ui.Button],
+                    template=r"revision:(?P<accion>aceptar|rechazar):(?P<user_id>\d+):(?P<postulacion_id>\d+)"):
+    def __init__(self, accion, user_id, postulacion_id):
+        aceptar = accion == "aceptar"
+        super().__init__(discord.ui.Button(
+            label="Aceptar" if aceptar else "Rechazar",
+            style=discord.ButtonStyle.success if aceptar else discord.ButtonStyle.danger,
+            custom_id=f"revision:{accion}:{user_id}:{postulacion_id}",
+            emoji="<:si_mineback:1455742911739199724>" if aceptar else "<:No_mineback:1455742851601268868>",
+        ))
+        self.accion         = accion
+        self.user_id        = user_id
+        self.postulacion_id = postulacion_id
 
-class ConfirmarPostulacion(discord.ui.View):
-    def __init__(self, user_id):
-        super().__init__(timeout=None)
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(match["accion"], int(match["user_id"]), int(match["postulacion_id"]))
+
+    async def callback(self, interaction: discord.Interaction):
+        await resolver_postulacion(interaction, self.accion, self.user_id, self.postulacion_id)
+
+
+class BotonRevisionLegado(discord.ui.DynamicItem[discord.ui.Button],
+                          template=r"(?P<accion>aceptar|rechazar)_postulacion"):
+    """Botones publicados antes de codificar el id en el custom_id: el id sale del embed."""
+    ID_EN_EMBED = re.compile(r"\*\*ID:\*\* `?(\d+)`?")
+
+    def __init__(self, accion):
+        super().__init__(discord.ui.Button(custom_id=f"{accion}_postulacion"))
+        self.accion = accion
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(match["accion"])
+
+    async def callback(self, interaction: discord.Interaction):
+        embeds = interaction.message.embeds if interaction.message else []
+        m = self.ID_EN_EMBED.search(embeds[0].description or "") if embeds else None
+        if not m:
+            await interaction.response.send_message("❌ No se pudo identificar al postulante de este mensaje.", ephemeral=True)
+            return
+        await resolver_postulacion(interaction, self.accion, int(m.group(1)), 0)
+
+
+class BotonConfirmarPostulacion(discord.ui.DynamicItem[discord.ui.Button],
+                                template=r"postulacion_chat:(?P<accion>enviar|cancelar):(?P<user_id>\d+)"):
+    """Enviar/Cancelar del resumen de una postulación por chat. El postulante va en el
+    custom_id, así el botón sigue andando después de reiniciar."""
+    def __init__(self, accion, user_id):
+        enviar = accion == "enviar"
+        super().__init__(discord.ui.Button(
+            label="Enviar postulación" if enviar else "Cancelar",
+            style=discord.ButtonStyle.success if enviar else discord.ButtonStyle.danger,
+            custom_id=f"postulacion_chat:{accion}:{user_id}",
+            emoji="<:si_mineback:1455742911739199724>" if enviar else "<:No_mineback:1455742851601268868>",
+        ))
+        self.accion  = accion
         self.user_id = user_id
 
-    @discord.ui.button(label="Enviar postulación", style=discord.ButtonStyle.success, emoji="<:si_mineback:1455742911739199724>")
-    async def enviar(self, interaction: discord.Interaction, button: discord.ui.Button):
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(match["accion"], int(match["user_id"]))
+
+    async def callback(self, interaction: discord.Interaction):
         if interaction.user.id != self.user_id:
             await interaction.response.send_message("❌ Esta no es tu postulación.", ephemeral=True)
             return
+        if self.accion == "enviar":
+            await enviar_postulacion_chat(interaction, self.user_id)
+        else:
+            await cancelar_postulacion_chat(interaction, self.user_id)
 
-        postulacion = postulaciones_activas.get(self.user_id)
-        if not postulacion:
-            await interaction.response.send_message("❌ Error al encontrar tu postulación.", ephemeral=True)
-            return
 
-        guild = interaction.guild
-        canal_revision = guild.get_channel(config.get("canal_revision_id")) if config.get("canal_revision_id") else None
-        if not canal_revision:
-            canal_revision = discord.utils.get(guild.text_channels, name="postulaciones-staff")
-            if not canal_revision:
-                try:
-                    canal_revision = await guild.create_text_channel(name="postulaciones-staff")
-                    config["canal_revision_id"] = canal_revision.id
-                except: pass
+def vista_confirmar_postulacion(user_id):
+    view = discord.ui.View(timeout=None)
+    for accion in ("enviar", "cancelar"):
+        view.add_item(BotonConfirmarPostulacion(accion, user_id))
+    return view
 
-        if canal_revision:
-            embed = discord.Embed(
-                title="<:llave_mineback:1454888619478351973> Nueva postulación de staff",
-                description=f"**Usuario:** {interaction.user.mention} | **ID:** {interaction.user.id}",
-                color=discord.Color.red(), timestamp=datetime.now()
-            )
-            for i, pregunta in enumerate(preguntas_data["preguntas"]):
-                embed.add_field(name=pregunta, value=postulacion["respuestas"].get(i, "Sin respuesta")[:1024], inline=False)
-            embed.set_thumbnail(url=interaction.user.display_avatar.url)
-            embed.set_footer(text=f"Postulación de {interaction.user.name}")
-            await canal_revision.send(embed=embed, view=BotonesRevision(interaction.user.id, interaction.user.name))
 
-        await interaction.response.send_message("✅ **¡Postulación enviada!** Este canal se cerrará en 5 segundos.")
+async def enviar_postulacion_chat(interaction: discord.Interaction, user_id):
+    postulacion = postulaciones_activas.get(user_id)
+    if not postulacion:
+        await interaction.response.send_message("❌ Error al encontrar tu postulación.", ephemeral=True)
+        return
+
+    await despachador.enviar(ruta_interaccion(interaction), PRIORIDAD_INTERACCION,
+                             lambda: interaction.response.send_message("✅ **¡Postulación enviada!** Este canal se cerrará en 5 segundos."),
+                             reintentos=0)
+
+    datos = {
+        "origen": "chat",
+        "discord": interaction.user.name,
+        "discord_id": str(interaction.user.id),
+        "discord_name": interaction.user.global_name or interaction.user.name,
+        "guild_id": str(interaction.guild_id) if interaction.guild_id else None,
+    }
+    datos.update({f"p{i+1}": r for i, r in postulacion["respuestas"].items()})
+    datos["preguntas_version"] = preguntas_de_chat(postulacion, interaction.guild_id)["version"]
+    # Queda "en cola" hasta que el mensaje de revisión existe: si publicarla falla,
+    # la toman el reintento o la recuperación al arrancar, como a las de la web
+    postulacion_id = 0
+    try:
+        postulacion_id = await asyncio.to_thread(
+            almacen.crear_postulacion, interaction.user.id, "chat", datos, guild_id=interaction.guild_id,
+        )
+        datos["postulacion_id"] = postulacion_id
+        _en_curso_web.add(postulacion_id)
+    except Exception as e:
+        print(f"No se pudo guardar la postulación (chat): {e}")
 
+    guild = interaction.guild
+    publicada = False
+    try:
+        canal_revision = await canales.revision(guild)
+        resultado = await triar(datos, preguntas_de_chat(postulacion, guild.id), postulacion_id)
+        parecidas = await buscar_parecidas(datos, preguntas_de_chat(postulacion, guild.id), postulacion_id,
+                                           guild.id)
+        embed = discord.Embed(
+            title="<:llave_mineback:1454888619478351973> Nueva postulación de staff",
+            description=f"**Usuario:** {interaction.user.mention} | **ID:** {interaction.user.id}"
+                        + (f" | **Postulación:** #{postulacion_id}" if postulacion_id else "")
+                        + ("\n" + texto_triaje(resultado) if resultado else "")
+                        + ("\n" + texto_parecidas(parecidas, guild.id) if parecidas else ""),
+            color=discord.Color.red(), timestamp=datetime.now()
+        )
+        for i, pregunta in enumerate(preguntas_de_chat(postulacion, guild.id)["preguntas"]):
+            embed.add_field(name=pregunta, value=postulacion["respuestas"].get(i, "Sin respuesta")[:1024], inline=False)
+        embed.set_thumbnail(url=interaction.user.display_avatar.url)
+        embed.set_footer(text=f"Postulación de {interaction.user.name}")
+        view = vista_revision(interaction.user.id, postulacion_id)
+        mensaje = await despachador.enviar(ruta_canal(canal_revision), PRIORIDAD_REVISION,
+                                           lambda: canal_revision.send(embed=embed, view=view))
+        if postulacion_id:
+            almacen.guardar_revision(postulacion_id, mensaje.channel.id, mensaje.id)
+            await asyncio.to_thread(almacen.actualizar_estado, postulacion_id, ESTADO_PUBLICADA, True)
+        publicada = True
+    except Exception as e:
+        sigue = ", queda en cola para reintentarla" if postulacion_id else ""
+        print(f"No se pudo publicar la postulación (chat){sigue}: {e}")
+    finally:
+        _en_curso_web.discard(postulacion_id)
+
+    # Si quedó en cola, el DM "Pendiente" sale cuando se publique
+    if publicada:
         try:
-            dm_embed = discord.Embed(
-                title="<:duda_mineback:1472653801679884333> HEMOS RECIBIDO TU POSTULACION",
-                description=(
-                    "Esta notificación aclara que la recibimos correctamente.\n\n"
-                    "Hemos recibido tu `postulación para formar parte del equipo staff de PandaMC` "
-                    "y se encuentra pendiente de revisión.\n"
-                    "Desde ahora, hasta la resolución de la postulación, pueden pasar días. "
-                    "Por favor, ten paciencia.\n\n"
-                    "> Te notificaremos por este medio en cuanto el equipo tome una decisión.\n\n"
-                    "<a:articulo_mineback:1454888675124052051> **Actualización del estado**\n"
-                    "> Estado actual: `Pendiente`"
-                ),
-                color=discord.Color.red(),
-                timestamp=datetime.now()
-            )
-            dm_embed.set_image(url=IMG_PENDIENTE)
-            dm_embed.set_footer(text="PandaMC Staff · Sistema de postulaciones")
-            dm_msg = await interaction.user.send(embed=dm_embed)
-            dm_mensajes_postulacion[str(interaction.user.id)] = dm_msg.id
+            dm_embed = embed_dm_estado("Pendiente")
+            dm_msg = await despachador.enviar(ruta_dm(interaction.user.id), PRIORIDAD_DM,
+                                              lambda: interaction.user.send(embed=dm_embed))
+            almacen.guardar_dm(interaction.user.id, dm_msg.id, dm_msg.channel.id, interaction.guild_id)
         except Exception as e:
+            metrica_dm_fallidos.etiquetar("pendiente").inc()
             print(f"No se pudo enviar DM (chat): {e}")
 
-        del postulaciones_activas[self.user_id]
-        await asyncio.sleep(5)
-        try: await interaction.channel.delete()
-        except: pass
+    almacen.quitar_activa(user_id)
+    planificador.cancelar(f"chat:{user_id}")
+    await asyncio.sleep(5)
+    try: await cerrar_canal_postulacion(interaction.channel)
+    except Exception as e: print(f"No se pudo cerrar el canal de postulación: {e}")
 
-    @discord.ui.button(label="Cancelar", style=discord.ButtonStyle.danger, emoji="<:No_mineback:1455742851601268868>")
-    async def cancelar(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if interaction.user.id != self.user_id:
-            await interaction.response.send_message("❌ Esta no es tu postulación.", ephemeral=True)
+
+async def cancelar_postulacion_chat(interaction: discord.Interaction, user_id):
+    await interaction.response.send_message("❌ Postulación cancelada. Cerrando en 5 segundos.")
+    almacen.quitar_activa(user_id)
+    planificador.cancelar(f"chat:{user_id}")
+    await asyncio.sleep(5)
+    try: await cerrar_canal_postulacion(interaction.channel)
+    except Exception as e: print(f"No se pudo cerrar el canal de postulación: {e}")
+
+
+# ─────────────────────────────────────────
+#  REVISIÓN EN LOTE
+# ─────────────────────────────────────────
+# Acepta o rechaza muchas postulaciones de una vez (/revisar_lote o el panel web).
+# Los estados se guardan en una transacción, los mensajes de revisión se marcan
+# con una sola edición cada uno (texto y botones, sin releer el embed), los
+# anuncios se juntan en la menor cantidad de mensajes que permite Discord y los
+# DMs salen de a poco en un trabajo de fondo que va informando su avance.
+LOTE_MAX             = int(os.environ.get("LOTE_MAX", 300))
+LOTE_DMS_POR_SEGUNDO = float(os.environ.get("LOTE_DMS_POR_SEGUNDO", 2))
+
+# Límites de Discord por mensaje
+_EMBEDS_POR_MENSAJE       = 10
+_CARACTERES_POR_MENSAJE   = 6000
+_CARACTERES_POR_EMBED     = 4096
+
+trabajos_lote = {}   # id -> TrabajoLote, los más recientes
+_ids_trabajo  = itertools.count(1)
+
+
+class TrabajoLote:
+    """Envío en segundo plano de los DMs de un lote."""
+    def __init__(self, guild_id, accion, total):
+        self.id        = next(_ids_trabajo)
+        self.guild_id  = guild_id
+        self.accion    = accion
+        self.total     = total
+        self.enviados  = 0
+        self.fallidos  = 0
+        self.terminado = False
+        self.tarea     = None
+
+    def resumen(self):
+        return {"id": self.id, "accion": self.accion, "total": self.total, "enviados": self.enviados,
+                "fallidos": self.fallidos, "terminado": self.terminado}
+
+    def texto(self):
+        estado = "terminado ✅" if self.terminado else "en curso ⏳"
+        return f"📨 DMs: {self.enviados + self.fallidos}/{self.total} ({self.fallidos} sin entregar) · {estado}"
+
+
+def parsear_ids(texto):
+    """"12, 15 20-25" → {12, 15, 20, ..., 25}. None si hay algo que no es un id o un rango."""
+    ids = set()
+    for parte in re.split(r"[\s,;]+", texto.strip()):
+        if not parte:
+            continue
+        m = re.fullmatch(r"#?(\d+)(?:-#?(\d+))?", parte)
+        if not m:
+            return None
+        desde, hasta = int(m[1]), int(m[2] or m[1])
+        if hasta < desde or hasta - desde >= LOTE_MAX:
+            return None
+        ids.update(range(desde, hasta + 1))
+    return ids
+
+
+def embeds_resultado_lote(aceptada, nombres):
+    """Anuncio de varias decisiones: la lista de nombres repartida en embeds y los embeds
+    agrupados en la menor cantidad de mensajes. Devuelve una lista de embeds por mensaje."""
+    if aceptada:
+        titulo = "[INGRESO] Nuevos integrantes del Staff de PandaMC"
+        intro  = "Fueron admitidos en el Staff de PandaMC. ¡Esperamos que logren alcanzar sus metas!\n\n"
+        imagen = IMG_ACEPTADO
+    else:
+        titulo = "[RESULTADO] Postulaciones revisadas en el Staff de PandaMC"
+        intro  = ("Estas postulaciones fueron revisadas y en esta ocasión no fueron aprobadas. "
+                  "Siempre pueden mejorar y volver a intentarlo.\n\n")
+        imagen = IMG_RECHAZADO
+
+    # Margen para el título y el pie, que también cuentan para el límite del mensaje
+    limite_mensaje = _CARACTERES_POR_MENSAJE - len(titulo) - 100
+    mensajes, usados, desc = [[]], 0, intro
+    for linea in (f"• {nombre}\n" for nombre in nombres):
+        lleno_embed   = len(desc) + len(linea) > _CARACTERES_POR_EMBED
+        lleno_mensaje = usados + len(desc) + len(linea) > limite_mensaje
+        if lleno_embed or lleno_mensaje:
+            mensajes[-1].append(desc)
+            usados += len(desc)
+            desc = ""
+            if lleno_mensaje or len(mensajes[-1]) == _EMBEDS_POR_MENSAJE:
+                mensajes.append([])
+                usados = 0
+        desc += linea
+    mensajes[-1].append(desc)
+
+    resultado = []
+    for n, descripciones in enumerate(mensajes, start=1):
+        embeds = [discord.Embed(description=d, color=discord.Color.red()) for d in descripciones]
+        embeds[0].title = titulo if len(mensajes) == 1 else f"{titulo} ({n}/{len(mensajes)})"
+        embeds[-1].set_image(url=imagen)
+        embeds[-1].timestamp = datetime.now()
+        resultado.append(embeds)
+    return resultado
+
+
+async def decidir_lote(guild, accion, postulacion_ids, revisor, al_avanzar=None):
+    """Aplica la misma decisión a varias postulaciones del servidor.
+    Devuelve (ids resueltos, ids omitidos, TrabajoLote de los DMs o None)."""
+    aceptada = accion == "aceptar"
+    fichas = await asyncio.to_thread(almacen.detalles_postulaciones, sorted(postulacion_ids))
+    encontradas = {f["id"] for f in fichas}
+    omitidas = sorted(set(postulacion_ids) - encontradas)
+    resueltas = []
+    for ficha in fichas:
+        if ((ficha["guild_id"] or servidores.principal_id) != guild.id
+                or ficha["estado"] in (ESTADO_ACEPTADA, ESTADO_RECHAZADA)
+                or ficha["id"] in _decisiones_en_curso):
+            omitidas.append(ficha["id"])
+        else:
+            resueltas.append(ficha)
+    if not resueltas:
+        return [], sorted(omitidas), None
+
+    ids = [f["id"] for f in resueltas]
+    _decisiones_en_curso.update(ids)
+    try:
+        almacen.actualizar_estados(ids, ESTADO_ACEPTADA if aceptada else ESTADO_RECHAZADA)
+
+        aviso = _aviso_decision(aceptada, revisor) + " (en lote)"
+
+        async def marcar(parcial, view):
+            # Como una decisión suelta: el embed pasa a aceptada/rechazada, además del aviso
+            mensaje = await parcial.fetch()
+            if mensaje.embeds:
+                marcar_embed_decision(mensaje.embeds[0], aceptada)
+            await mensaje.edit(content=aviso, embeds=mensaje.embeds, view=view)
+
+        for ficha in resueltas:
+            canal = bot.get_channel(ficha["revision_canal_id"] or 0)
+            if not canal or not ficha["revision_mensaje_id"]:
+                continue
+            parcial = canal.get_partial_message(ficha["revision_mensaje_id"])
+            view = vista_revision(int(ficha["discord_id"]), ficha["id"], deshabilitada=True)
+            despachador.programar(ruta_canal(canal), PRIORIDAD_RESULTADO,
+                                  lambda m=parcial, v=view: marcar(m, v),
+                                  descripcion="marca de revisión en lote", idempotente=True)
+
+        canal_res = await canales.resultados(guild)
+        if canal_res:
+            usuarios = await asyncio.gather(
+                *(miembros.obtener(guild, int(f["discord_id"])) for f in resueltas), return_exceptions=True)
+            nombres = [
+                usuario.mention if isinstance(usuario, discord.Member)
+                else f"**{ficha['datos'].get('discord') or ficha['discord_id']}**"
+                for ficha, usuario in zip(resueltas, usuarios)
+            ]
+            for embeds in embeds_resultado_lote(aceptada, nombres):
+                despachador.programar(ruta_canal(canal_res), PRIORIDAD_RESULTADO,
+                                      lambda e=embeds: canal_res.send(embeds=e), descripcion=f"anuncio en lote de {accion}")
+    finally:
+        _decisiones_en_curso.difference_update(ids)
+
+    trabajo = TrabajoLote(guild.id, accion, len(resueltas))
+    trabajos_lote[trabajo.id] = trabajo
+    for viejo in list(trabajos_lote)[:-20]:
+        if trabajos_lote[viejo].terminado:
+            del trabajos_lote[viejo]
+    trabajo.tarea = tareas.iniciar(f"lote:{trabajo.id}", functools.partial(
+        _enviar_dms_lote, guild, trabajo, [int(f["discord_id"]) for f in resueltas], aceptada, al_avanzar))
+    return ids, sorted(omitidas), trabajo
+
+
+async def _enviar_dms_lote(guild, trabajo, user_ids, aceptada, al_avanzar):
+    intervalo = 1 / LOTE_DMS_POR_SEGUNDO if LOTE_DMS_POR_SEGUNDO > 0 else 0
+    loop = asyncio.get_running_loop()
+    e_dm = embed_dm_resultado(aceptada)
+    try:
+        for user_id in user_ids:
+            inicio = loop.time()
+            try:
+                usuario = await miembros.obtener(guild, user_id)
+                if not usuario:
+                    raise LookupError("ya no está en el servidor")
+                await despachador.enviar(ruta_dm(user_id), PRIORIDAD_DM, lambda: usuario.send(embed=e_dm))
+                trabajo.enviados += 1
+            except Exception as e:
+                trabajo.fallidos += 1
+                metrica_dm_fallidos.etiquetar("resultado").inc()
+                print(f"No se pudo enviar el DM del lote a {user_id}: {e}")
+            await _editar_dm_estado(guild, user_id, "Aceptado" if aceptada else "Rechazado")
+            if al_avanzar:
+                await al_avanzar(trabajo)
+            await asyncio.sleep(max(0.0, intervalo - (loop.time() - inicio)))
+    finally:
+        trabajo.terminado = True
+        if al_avanzar:
+            await al_avanzar(trabajo)
+
+
+async def lote_desde_panel(guild_id, accion, ids, revisor_id):
+    """Lote pedido desde el panel web: [resueltas, omitidas, avance de los DMs], o None sin servidor."""
+    guild = bot.get_guild(guild_id)
+    if not guild:
+        return None
+    resueltas, omitidas, trabajo = await decidir_lote(guild, accion, set(ids), f"<@{revisor_id}> (panel web)")
+    return [resueltas, omitidas, trabajo.resumen() if trabajo else None]
+
+
+async def avance_lote(trabajo_id, guild_id):
+    trabajo = trabajos_lote.get(trabajo_id)
+    if not trabajo or trabajo.guild_id != guild_id:
+        return None
+    return trabajo.resumen()
+
+COMANDOS_BOT.update(lote=lote_desde_panel, avance_lote=avance_lote)
+
+
+# ─────────────────────────────────────────
+#  POSTULACIÓN POR FORMULARIOS (modales)
+# ─────────────────────────────────────────
+# Las preguntas se reparten en modales de hasta 5 campos, armados desde el set del servidor.
+# Discord no deja abrir un modal desde otro, así que entre página y página se muestra
+# un botón "Continuar". No hace falta canal y las respuestas no generan mensajes.
+CAMPOS_POR_MODAL = 5
+
+# { user_id: {"respuestas": {indice: texto}, "pagina": n, "version": versión del set} }
+postulaciones_modal = {}
+
+
+@functools.lru_cache(maxsize=32)
+def _paginas_modal(preguntas):
+    paginas = []
+    for inicio in range(0, len(preguntas), CAMPOS_POR_MODAL):
+        campos = []
+        for i in range(inicio, min(inicio + CAMPOS_POR_MODAL, len(preguntas))):
+            etiqueta = f"P{i+1}. {preguntas[i]}"
+            if len(etiqueta) > 45:
+                etiqueta = etiqueta[:44] + "…"
+            campos.append((i, etiqueta, preguntas[i][:100]))
+        paginas.append(campos)
+    return paginas
+
+def paginas_modal(preguntas):
+    return _paginas_modal(tuple(preguntas["preguntas"]))
+
+
+class ModalPostulacion(discord.ui.Modal):
+    def __init__(self, pagina, preguntas):
+        self.paginas = paginas_modal(preguntas)
+        super().__init__(title=f"Postulación Staff PandaMC ({pagina + 1}/{len(self.paginas)})",
+                         timeout=tiempo_limite_min(preguntas) * 60)
+        self.version = preguntas["version"]
+        self.pagina = pagina
+        self.campos = []
+        for indice, etiqueta, placeholder in self.paginas[pagina]:
+            campo = discord.ui.TextInput(label=etiqueta, placeholder=placeholder,
+                                         style=discord.TextStyle.paragraph, max_length=1024)
+            self.campos.append((indice, campo))
+            self.add_item(campo)
+
+    async def on_submit(self, interaction: discord.Interaction):
+        uid = interaction.user.id
+        estado = postulaciones_modal.setdefault(uid, {"respuestas": {}, "pagina": 0, "version": self.version})
+        for indice, campo in self.campos:
+            estado["respuestas"][indice] = campo.value
+        estado["pagina"] = self.pagina + 1
+
+        if estado["pagina"] < len(self.paginas):
+            view = discord.ui.View(timeout=None)
+            view.add_item(BotonContinuarModal(estado["pagina"]))
+            await interaction.response.send_message(
+                f"> 📝 Parte {self.pagina + 1} de {len(self.paginas)} guardada. Continúa cuando quieras.",
+                view=view, ephemeral=True
+            )
+            return
+
+        postulaciones_modal.pop(uid, None)
+        planificador.cancelar(f"modal:{uid}")
+        # Mientras completaba el formulario pudo cerrarse el servidor o llegar su postulación web
+        if not await confirmar_puede_postular(interaction):
             return
-        await interaction.response.send_message("❌ Postulación cancelada. Cerrando en 5 segundos.")
-        if self.user_id in postulaciones_activas:
-            del postulaciones_activas[self.user_id]
-        await asyncio.sleep(5)
-        try: await interaction.channel.delete()
-        except: pass
+        data = {
+            "origen":       "modal",
+            "discord":      interaction.user.name,
+            "discord_id":   str(uid),
+            "discord_name": interaction.user.global_name or interaction.user.name,
+            "guild_id":     str(interaction.guild_id) if interaction.guild_id else None,
+            "preguntas_version": estado["version"],
+        }
+        data.update({f"p{i+1}": r for i, r in estado["respuestas"].items()})
+        try:
+            encolada = await asyncio.to_thread(encolar_postulacion_web, data)
+        except YaPostulo:
+            await interaction.response.send_message("❌ Ya enviaste una postulación.", ephemeral=True)
+            return
+        if encolada:
+            await interaction.response.send_message(
+                "✅ **¡Postulación enviada!** Te avisaremos por DM cuando el equipo tome una decisión.", ephemeral=True
+            )
+        else:
+            postulaciones_modal[uid] = estado
+            estado["pagina"] = self.pagina
+            view = discord.ui.View(timeout=None)
+            view.add_item(BotonContinuarModal(self.pagina))
+            await interaction.response.send_message(
+                "⚠️ Hay muchas postulaciones en este momento. Tus respuestas quedaron guardadas; "
+                f"vuelve a enviar en {COLA_RETRY_AFTER} segundos.", view=view, ephemeral=True
+            )
+
+
+class BotonContinuarModal(discord.ui.DynamicItem[discord.ui.Button],
+                          template=r"postulacion_modal:(?P<pagina>\d+)"):
+    def __init__(self, pagina):
+        super().__init__(discord.ui.Button(
+            label="Continuar", style=discord.ButtonStyle.primary,
+            custom_id=f"postulacion_modal:{pagina}", emoji="➡️"
+        ))
+        self.pagina = pagina
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(int(match["pagina"]))
+
+    async def callback(self, interaction: discord.Interaction):
+        if not await confirmar_puede_postular(interaction):
+            return
+        estado = postulaciones_modal.get(interaction.user.id)
+        if self.pagina > 0 and (not estado or estado["pagina"] < self.pagina):
+            await interaction.response.send_message("❌ Tu postulación expiró. Vuelve a empezar.", ephemeral=True)
+            return
+        preguntas = preguntas_version(estado and estado.get("version"), interaction.guild_id)
+        await interaction.response.send_modal(ModalPostulacion(self.pagina, preguntas))
+
+
+async def confirmar_puede_postular(interaction: discord.Interaction):
+    """Avisa y devuelve False si el servidor está cerrado o la persona ya envió una postulación."""
+    if not servidores.abierto(interaction.guild_id):
+        await interaction.response.send_message("🔒 Las postulaciones están cerradas.", ephemeral=True)
+        return False
+    if almacen.ya_envio(interaction.user.id, interaction.guild_id):
+        await interaction.response.send_message("❌ Ya enviaste una postulación.", ephemeral=True)
+        return False
+    return True
+
+
+async def abrir_postulacion_modal(interaction: discord.Interaction):
+    uid = interaction.user.id
+    if not await confirmar_puede_postular(interaction):
+        return
+    if uid in postulaciones_activas:
+        await interaction.response.send_message("❌ Ya tienes una postulación en proceso.", ephemeral=True)
+        return
+    preguntas = preguntas_de(interaction.guild_id)
+    postulaciones_modal[uid] = {"respuestas": {}, "pagina": 0, "version": preguntas["version"]}
+    planificador.programar(f"modal:{uid}", "postulacion_modal",
+                           (datetime.now() + timedelta(minutes=tiempo_limite_min(preguntas))).timestamp(),
+                           {"user_id": uid})
+    await interaction.response.send_modal(ModalPostulacion(0, preguntas))
+
+
+async def vencer_postulacion_modal(datos):
+    postulaciones_modal.pop(datos["user_id"], None)
+
+planificador.registrar("postulacion_modal", vencer_postulacion_modal)
 
 
 # ─────────────────────────────────────────
@@ -639,9 +2091,9 @@ class ConfirmarPostulacion(discord.ui.View):
 @bot.tree.command(name="abrir_postulaciones", description="Abre las postulaciones de staff")
 @app_commands.checks.has_permissions(administrator=True)
 async def abrir_postulaciones(interaction: discord.Interaction):
-    estado_postulaciones["abierto"] = True
-    postulaciones_enviadas.clear()
-    dm_mensajes_postulacion.clear()
+    servidores.actualizar(interaction.guild_id, abierto=True)
+    reseteados = almacen.limpiar_enviadas(interaction.guild_id)
+    almacen.limpiar_dms(reseteados, interaction.guild_id)
     embed = discord.Embed(
         title="✅ Postulaciones abiertas",
         description=(
@@ -657,9 +2109,9 @@ async def abrir_postulaciones(interaction: discord.Interaction):
 @app_commands.describe(usuario="El usuario al que quieres resetear la postulación")
 async def limpiar_postulacion(interaction: discord.Interaction, usuario: discord.Member):
     uid = str(usuario.id)
-    eliminado = uid in postulaciones_enviadas
-    postulaciones_enviadas.discard(uid)
-    dm_mensajes_postulacion.pop(uid, None)
+    eliminado = almacen.ya_envio(uid, interaction.guild_id)
+    almacen.quitar_enviada(uid, interaction.guild_id)
+    almacen.quitar_dm(uid, interaction.guild_id)
 
     if eliminado:
         embed = discord.Embed(
@@ -678,23 +2130,122 @@ async def limpiar_postulacion(interaction: discord.Interaction, usuario: discord
 @bot.tree.command(name="cerrar_postulaciones", description="Cierra las postulaciones de staff")
 @app_commands.checks.has_permissions(administrator=True)
 async def cerrar_postulaciones(interaction: discord.Interaction):
-    estado_postulaciones["abierto"] = False
+    servidores.actualizar(interaction.guild_id, abierto=False)
     embed = discord.Embed(title="🔒 Postulaciones cerradas", description="Las postulaciones de staff están ahora **cerradas**.", color=discord.Color.red())
     await interaction.response.send_message(embed=embed, ephemeral=True)
 
-@bot.event
-async def on_ready():
-    print(f'✅ Bot conectado como {bot.user}')
-    print(f'🌐 Página web activa con OAuth2 Discord')
+@bot.tree.command(name="revisar_lote", description="Acepta o rechaza varias postulaciones a la vez")
+@app_commands.checks.has_permissions(administrator=True)
+@app_commands.describe(accion="Qué hacer con todas", ids="Números de postulación, por ejemplo: 12, 15, 20-25")
+@app_commands.choices(accion=[
+    app_commands.Choice(name="Aceptar", value="aceptar"),
+    app_commands.Choice(name="Rechazar", value="rechazar"),
+])
+async def revisar_lote(interaction: discord.Interaction, accion: app_commands.Choice[str], ids: str):
+    postulacion_ids = parsear_ids(ids)
+    if not postulacion_ids or len(postulacion_ids) > LOTE_MAX:
+        await interaction.response.send_message(
+            f"❌ Indica entre 1 y {LOTE_MAX} números de postulación (por ejemplo `12, 15, 20-25`).", ephemeral=True)
+        return
+    await interaction.response.defer(ephemeral=True, thinking=True)
+
+    encabezado = []
+    ultimo = 0.0
+    async def informar(trabajo):
+        # El mensaje se edita a lo sumo cada 3 segundos, y siempre al terminar
+        nonlocal ultimo
+        if not trabajo.terminado and time.monotonic() - ultimo < 3:
+            return
+        ultimo = time.monotonic()
+        try:
+            await interaction.edit_original_response(content="\n".join(encabezado + [trabajo.texto()]))
+        except Exception as e:
+            print(f"No se pudo actualizar el avance del lote: {e}")
+
+    resueltas, omitidas, trabajo = await decidir_lote(
+        interaction.guild, accion.value, postulacion_ids, interaction.user.mention, al_avanzar=informar)
+    verbo = "aceptadas" if accion.value == "aceptar" else "rechazadas"
+    encabezado.append(f"✅ {len(resueltas)} postulaciones {verbo}.")
+    if omitidas:
+        lista = ", ".join(f"#{i}" for i in omitidas[:30]) + (" …" if len(omitidas) > 30 else "")
+        encabezado.append(f"⚠️ {len(omitidas)} omitidas (no existen, son de otro servidor o ya estaban resueltas): {lista}")
+    await interaction.edit_original_response(
+        content="\n".join(encabezado + ([trabajo.texto()] if trabajo else [])))
+
+# ─────────────────────────────────────────
+#  CICLO DE VIDA DEL BOT
+# ─────────────────────────────────────────
+# SINCRONIZAR_COMANDOS=auto sincroniza los slash commands solo si cambiaron desde
+# la última vez (se compara un hash del árbol); "siempre" y "nunca" fuerzan.
+SINCRONIZAR_COMANDOS = os.environ.get("SINCRONIZAR_COMANDOS", "auto").lower()
+
+def hash_comandos():
+    """Hash del árbol de comandos tal como se manda a Discord (y de la aplicación)."""
+    comandos = sorted((c.to_dict(bot.tree) for c in bot.tree.get_commands()), key=lambda c: (c["name"], c.get("type", 1)))
+    texto = json.dumps({"aplicacion": bot.application_id, "comandos": comandos}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(texto.encode()).hexdigest()
+
+async def sincronizar_comandos():
+    if SINCRONIZAR_COMANDOS == "nunca":
+        return
+    actual = hash_comandos()
+    if SINCRONIZAR_COMANDOS != "siempre" and almacen.estado_bot("hash_comandos") == actual:
+        print("✅ Comandos sin cambios, no se sincronizan")
+        return
     try:
         synced = await bot.tree.sync()
-        print(f'✅ {len(synced)} comandos sincronizados')
     except Exception as e:
-        print(f'❌ Error: {e}')
+        print(f'❌ Error sincronizando comandos: {e}')
+        return
+    almacen.guardar_estado_bot("hash_comandos", actual)
+    print(f'✅ {len(synced)} comandos sincronizados')
+
+async def preparar_bot():
+    """Lo que se hace una sola vez por proceso, antes de conectar al gateway."""
     bot.add_view(BotonPostular())
-    bot.add_view(BotonesRevision(0, ""))
-    bot.loop.create_task(procesar_postulaciones_web())
-    print("✅ Sistema listo")
+    bot.add_dynamic_items(BotonRevision, BotonRevisionLegado, BotonContinuarModal, BotonConfirmarPostulacion)
+    iniciar_consumidores_web()
+    # En segundo plano: sync es lento y tiene su propio rate limit global
+    tareas.iniciar("sincronizar_comandos", sincronizar_comandos)
+
+async def detener_bot():
+    """Cancela las tareas de fondo y deja escrito lo pendiente antes de cerrar la conexión."""
+    await tareas.cerrar()
+    await planificador.cerrar()
+    await despachador.cerrar()
+    if pool_triaje is not None:
+        pool_triaje.shutdown(wait=False, cancel_futures=True)
+    await asyncio.to_thread(almacen.vaciar)
+    print("👋 Tareas de fondo detenidas")
+
+@bot.event
+async def on_ready():
+    # Se repite en cada reconexión: solo informa
+    print(f'✅ Bot conectado como {bot.user} ({len(bot.guilds)} servidores)')
+
+
+# guild_available llega por cada servidor antes de on_ready (y cuando uno vuelve de una
+# caída), así que los consumidores ya encuentran el servidor registrado al arrancar
+@bot.event
+async def on_guild_available(guild):
+    servidores.registrar(guild.id)
+
+@bot.event
+async def on_guild_join(guild):
+    servidores.registrar(guild.id)
+
+@bot.event
+async def on_guild_channel_create(channel):
+    canales.invalidar(channel.guild.id)
+
+@bot.event
+async def on_guild_channel_delete(channel):
+    canales.invalidar(channel.guild.id)
+
+@bot.event
+async def on_guild_channel_update(before, after):
+    if before.name != after.name or before.category_id != after.category_id:
+        canales.invalidar(after.guild.id)
 
 
 @bot.event
@@ -705,9 +2256,10 @@ async def on_message(message):
         postulacion = postulaciones_activas[message.author.id]
         if message.channel.id == postulacion["canal_id"]:
             pregunta_actual = postulacion["pregunta_actual"]
-            if pregunta_actual < len(preguntas_data["preguntas"]):
+            if pregunta_actual < len(preguntas_de_chat(postulacion, message.guild.id)["preguntas"]):
                 postulacion["respuestas"][pregunta_actual] = message.content
                 postulacion["pregunta_actual"] += 1
+                almacen.guardar_activa(message.author.id, postulacion)
                 try: await message.add_reaction("✅")
                 except: pass
                 try: await enviar_pregunta(message.channel, message.author.id, postulacion["pregunta_actual"])
@@ -717,7 +2269,12 @@ async def on_message(message):
 
 @bot.tree.command(name="setup_postulaciones", description="Configura el sistema de postulaciones (Solo administradores)")
 @app_commands.checks.has_permissions(administrator=True)
-async def setup_postulaciones(interaction: discord.Interaction):
+@app_commands.describe(modo="Botones del panel: sólo web, o también postulación dentro de Discord")
+@app_commands.choices(modo=[
+    app_commands.Choice(name="Web", value="web"),
+    app_commands.Choice(name="Web + Discord (formulario y chat)", value="discord"),
+])
+async def setup_postulaciones(interaction: discord.Interaction, modo: app_commands.Choice[str] = None):
     embed = discord.Embed(
         description=(
             "# <:mineback:1454904946452598794> - ¡POSTULACIONES ABIERTAS!\n"
@@ -735,13 +2292,16 @@ async def setup_postulaciones(interaction: discord.Interaction):
         color=discord.Color.red()
     )
 
-    view = discord.ui.View(timeout=None)
-    view.add_item(discord.ui.Button(
-        label="Postularse",
-        style=discord.ButtonStyle.link,
-        url=WEB_URL or "https://minedashpostulaciones.up.railway.app/",
-        emoji="🌐"
-    ))
+    if modo and modo.value == "discord":
+        view = BotonPostular(interaction.guild_id)
+    else:
+        view = discord.ui.View(timeout=None)
+        view.add_item(discord.ui.Button(
+            label="Postularse",
+            style=discord.ButtonStyle.link,
+            url=url_postulacion(interaction.guild_id) if WEB_URL else "https://minedashpostulaciones.up.railway.app/",
+            emoji="🌐"
+        ))
 
     await interaction.response.send_message("✅ Configurado!", ephemeral=True)
     await interaction.channel.send(embed=embed, view=view)
@@ -758,15 +2318,24 @@ async def ayuda_postulaciones(interaction: discord.Interaction):
 # ─────────────────────────────────────────
 #  ARRANQUE
 # ─────────────────────────────────────────
-if __name__ == "__main__":
+if __name__ == "__main__" and PROCESO == "web":
+    print("🌐 Proceso web: el bot corre aparte (PROCESO=bot)")
+    iniciar_servidor_web()
+elif __name__ == "__main__":
     TOKEN = os.environ.get("TOKEN") or os.environ.get("token") or ""
     TOKEN = TOKEN.strip()
     print(f"DEBUG: TOKEN existe={bool(TOKEN)}, largo={len(TOKEN)}")
     if not TOKEN:
         print("❌ ERROR: Variable de entorno TOKEN no configurada.")
     else:
-        hilo_web = threading.Thread(target=iniciar_servidor_web, daemon=True)
-        hilo_web.start()
+        if PROCESO == "todo":
+            hilo_web = threading.Thread(target=iniciar_servidor_web, daemon=True)
+            hilo_web.start()
+        elif os.environ.get("METRICAS_PUERTO"):
+            hilo_metricas = threading.Thread(
+                target=iniciar_servidor_web,
+                args=(app_metricas, int(os.environ["METRICAS_PUERTO"]), 2), daemon=True)
+            hilo_metricas.start()
         try:
             bot.run(TOKEN)
         except discord.LoginFailure:
@@ -0,0 +1,280 @@
+import bisect
+import re
+import threading
+import time
+
+# ─────────────────────────────────────────
+#  MÉTRICAS (formato de texto de Prometheus)
+# ─────────────────────────────────────────
+# Contadores, medidores e histogramas en memoria, sin dependencias. Registrar
+# una observación es un bisect y tres sumas bajo el lock del hijo, así que los
+# cronómetros pueden quedar siempre prendidos. /metrics arma el texto al vuelo.
+
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _etiquetas(nombres, valores, extra=""):
+    partes = [f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores)]
+    if extra:
+        partes.append(extra)
+    return "{" + ",".join(partes) + "}" if partes else ""
+
+
+def _numero(valor):
+    if valor == float("inf"):
+        return "+Inf"
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return repr(valor) if isinstance(valor, float) else str(valor)
+
+
+class _Metrica:
+    tipo = ""
+
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        self.nombre    = nombre
+        self.ayuda     = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._hijos    = {}
+        self._lock     = threading.Lock()
+        if not self.etiquetas:
+            self.etiquetar()   # sin etiquetas, la serie existe desde el arranque (en 0)
+
+    def etiquetar(self, *valores):
+        """Devuelve la serie para esos valores de etiqueta (se crea la primera vez)."""
+        hijo = self._hijos.get(valores)
+        if hijo is None:
+            with self._lock:
+                hijo = self._hijos.get(valores)
+                if hijo is None:
+                    hijo = self._hijos[valores] = self._nuevo()
+        return hijo
+
+    def _sin_etiquetas(self):
+        return self.etiquetar()
+
+    def exponer(self):
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}"]
+        for valores, hijo in sorted(self._hijos.items()):
+            lineas.extend(self._lineas(valores, hijo))
+        return lineas
+
+
+class _ValorContador:
+    __slots__ = ("valor", "_lock")
+
+    def __init__(self):
+        self.valor = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, n=1):
+        with self._lock:
+            self.valor += n
+
+
+class Contador(_Metrica):
+    tipo = "counter"
+    _nuevo = _ValorContador
+
+    def inc(self, n=1):
+        self._sin_etiquetas().inc(n)
+
+    def _lineas(self, valores, hijo):
+        return [f"{self.nombre}{_etiquetas(self.etiquetas, valores)} {_numero(hijo.valor)}"]
+
+
+class _ValorMedidor(_ValorContador):
+    __slots__ = ()
+
+    def set(self, valor):
+        self.valor = valor
+
+    def dec(self, n=1):
+        self.inc(-n)
+
+
+class Medidor(_Metrica):
+    """Gauge. Con `funcion`, el valor se lee al exponer (p. ej. el largo de una cola)."""
+    tipo = "gauge"
+    _nuevo = _ValorMedidor
+
+    def __init__(self, nombre, ayuda, etiquetas=(), funcion=None):
+        self.funcion = funcion
+        super().__init__(nombre, ayuda, etiquetas)
+
+    def set(self, valor):
+        self._sin_etiquetas().set(valor)
+
+    def inc(self, n=1):
+        self._sin_etiquetas().inc(n)
+
+    def dec(self, n=1):
+        self._sin_etiquetas().inc(-n)
+
+    def exponer(self):
+        if self.funcion is not None:
+            try:
+                self._sin_etiquetas().set(self.funcion())
+            except Exception:
+                pass
+        return super().exponer()
+
+    def _lineas(self, valores, hijo):
+        return [f"{self.nombre}{_etiquetas(self.etiquetas, valores)} {_numero(hijo.valor)}"]
+
+
+class _Cronometro:
+    __slots__ = ("_hijo", "_inicio")
+
+    def __init__(self, hijo):
+        self._hijo = hijo
+
+    def __enter__(self):
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._hijo.observar(time.perf_counter() - self._inicio)
+        return False
+
+
+class _ValorHistograma:
+    __slots__ = ("limites", "cuentas", "suma", "_lock")
+
+    def __init__(self, limites):
+        self.limites = limites
+        self.cuentas = [0] * (len(limites) + 1)
+        self.suma    = 0.0
+        self._lock   = threading.Lock()
+
+    def observar(self, valor):
+        i = bisect.bisect_left(self.limites, valor)
+        with self._lock:
+            self.cuentas[i] += 1
+            self.suma += valor
+
+    def medir(self):
+        """`with hist.medir(): ...` observa la duración del bloque en segundos."""
+        return _Cronometro(self)
+
+
+class Histograma(_Metrica):
+    tipo = "histogram"
+
+    def __init__(self, nombre, ayuda, etiquetas=(), buckets=BUCKETS_SEGUNDOS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(nombre, ayuda, etiquetas)
+
+    def _nuevo(self):
+        return _ValorHistograma(self.buckets)
+
+    def observar(self, valor):
+        self._sin_etiquetas().observar(valor)
+
+    def medir(self):
+        return self._sin_etiquetas().medir()
+
+    def _lineas(self, valores, hijo):
+        with hijo._lock:
+            cuentas, suma = list(hijo.cuentas), hijo.suma
+        lineas, acumulado = [], 0
+        for limite, cuenta in zip(self.buckets + (float("inf"),), cuentas):
+            acumulado += cuenta
+            le = f'le="{_numero(float(limite))}"'
+            lineas.append(f"{self.nombre}_bucket{_etiquetas(self.etiquetas, valores, le)} {acumulado}")
+        base = _etiquetas(self.etiquetas, valores)
+        lineas.append(f"{self.nombre}_sum{base} {_numero(suma)}")
+        lineas.append(f"{self.nombre}_count{base} {acumulado}")
+        return lineas
+
+
+class Registro:
+    def __init__(self):
+        self._metricas = {}
+        self._lock     = threading.Lock()
+
+    def _agregar(self, metrica):
+        with self._lock:
+            existente = self._metricas.get(metrica.nombre)
+            if existente is not None:
+                return existente
+            self._metricas[metrica.nombre] = metrica
+            return metrica
+
+    def contador(self, nombre, ayuda, etiquetas=()):
+        return self._agregar(Contador(nombre, ayuda, etiquetas))
+
+    def medidor(self, nombre, ayuda, etiquetas=(), funcion=None):
+        return self._agregar(Medidor(nombre, ayuda, etiquetas, funcion))
+
+    def histograma(self, nombre, ayuda, etiquetas=(), buckets=BUCKETS_SEGUNDOS):
+        return self._agregar(Histograma(nombre, ayuda, etiquetas, buckets))
+
+    def exponer(self):
+        lineas = []
+        for metrica in list(self._metricas.values()):
+            lineas.extend(metrica.exponer())
+        return "\n".join(lineas) + "\n"
+
+
+registro = Registro()
+
+
+# ─────────────────────────────────────────
+#  LLAMADAS A LA API DE DISCORD
+# ─────────────────────────────────────────
+# discord.py acepta un aiohttp.TraceConfig (`http_trace=`): con eso se mide cada
+# request real, incluidos los 429 que la librería reintenta sola. La ruta se
+# normaliza para que los ids no disparen la cardinalidad.
+
+_RE_API       = re.compile(r"^/api(?:/v\d+)?")
+_RE_SNOWFLAKE = re.compile(r"/\d{6,}")
+_RE_TOKEN     = re.compile(r"(/(?:webhooks|interactions)/\{id\})/[^/]+")
+_RE_REACCION  = re.compile(r"/reactions/[^/]+")
+
+
+def plantilla_ruta(metodo, ruta):
+    """"POST /api/v10/channels/123/messages" → "POST /channels/{id}/messages"."""
+    ruta = _RE_API.sub("", ruta)
+    ruta = _RE_SNOWFLAKE.sub("/{id}", ruta)
+    ruta = _RE_TOKEN.sub(r"\1/{token}", ruta)
+    ruta = _RE_REACCION.sub("/reactions/{emoji}", ruta)
+    return f"{metodo} {ruta}"
+
+
+def traza_api_discord(reg=registro):
+    """TraceConfig de aiohttp que cuenta y cronometra cada llamada a Discord por ruta."""
+    import aiohttp
+
+    duracion = reg.histograma("discord_api_duracion_segundos",
+                              "Duración de las llamadas REST a Discord", ("ruta",))
+    llamadas = reg.contador("discord_api_llamadas_total",
+                            "Llamadas REST a Discord por ruta y código de respuesta", ("ruta", "codigo"))
+    limitadas = reg.contador("discord_api_429_total",
+                             "Respuestas 429 (rate limit) de Discord por ruta", ("ruta",))
+
+    async def inicio(sesion, ctx, params):
+        ctx.inicio = time.perf_counter()
+
+    async def fin(sesion, ctx, params):
+        ruta = plantilla_ruta(params.method, params.url.path)
+        duracion.etiquetar(ruta).observar(time.perf_counter() - ctx.inicio)
+        codigo = params.response.status
+        llamadas.etiquetar(ruta, str(codigo)).inc()
+        if codigo == 429:
+            limitadas.etiquetar(ruta).inc()
+
+    async def error(sesion, ctx, params):
+        ruta = plantilla_ruta(params.method, params.url.path)
+        duracion.etiquetar(ruta).observar(time.perf_counter() - ctx.inicio)
+        llamadas.etiquetar(ruta, "error").inc()
+
+    traza = aiohttp.TraceConfig()
+    traza.on_request_start.append(inicio)
+    traza.on_request_end.append(fin)
+    traza.on_request_exception.append(error)
+    return traza
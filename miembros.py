@@ -0,0 +1,80 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+import discord
+
+from metricas import registro
+
+# ─────────────────────────────────────────
+#  RESOLUCIÓN DE MIEMBROS
+# ─────────────────────────────────────────
+# Sin el intent privilegiado de miembros, discord.py no guarda la lista del
+# servidor: los miembros se piden uno por uno con fetch_member y quedan en una
+# caché LRU acotada, con vencimiento (los roles pueden cambiar y sin el intent
+# no llegan eventos de miembros). "No está en el servidor" también se guarda,
+# con un vencimiento más corto. Si varias tareas piden el mismo miembro a la
+# vez, sale una sola consulta y todas esperan su resultado. Las consultas a
+# Discord van de a `simultaneas` (un lote grande no dispara una ola de 429).
+# Con el intent activo, lo que ya está en la caché de discord.py se usa directo.
+
+_consultas = registro.contador("miembros_consultas_total",
+                               "Búsquedas de miembros por resultado (cache, discord, compartida)", ("origen",))
+
+
+class CacheMiembros:
+    def __init__(self, ttl=300.0, ttl_ausente=60.0, maximo=5000, simultaneas=5):
+        self.ttl         = ttl
+        self.ttl_ausente = ttl_ausente
+        self.maximo      = maximo
+        self._limite     = asyncio.Semaphore(max(1, simultaneas))
+        self._cache      = OrderedDict()   # (guild_id, user_id) -> (vence, miembro o None)
+        self._en_vuelo   = {}              # (guild_id, user_id) -> asyncio.Future
+        registro.medidor("miembros_cache_tamano", "Miembros guardados en la caché propia", funcion=self.__len__)
+
+    def __len__(self):
+        return len(self._cache)
+
+    async def obtener(self, guild, user_id):
+        """El miembro, o None si no está en el servidor. Otros errores de Discord se propagan."""
+        miembro = guild.get_member(user_id)
+        if miembro is not None:
+            _consultas.etiquetar("cache").inc()
+            return miembro
+
+        clave = (guild.id, user_id)
+        entrada = self._cache.get(clave)
+        if entrada is not None:
+            if entrada[0] > time.monotonic():
+                self._cache.move_to_end(clave)
+                _consultas.etiquetar("cache").inc()
+                return entrada[1]
+            del self._cache[clave]
+
+        tarea = self._en_vuelo.get(clave)
+        if tarea is not None:
+            _consultas.etiquetar("compartida").inc()
+        else:
+            _consultas.etiquetar("discord").inc()
+            tarea = self._en_vuelo[clave] = asyncio.create_task(self._buscar(guild, user_id, clave))
+        # La consulta es una tarea aparte: si se cancela quien la pidió, los demás siguen esperando
+        return await asyncio.shield(tarea)
+
+    async def _buscar(self, guild, user_id, clave):
+        try:
+            try:
+                async with self._limite:
+                    miembro = await guild.fetch_member(user_id)
+            except discord.NotFound:
+                miembro = None
+            self._guardar(clave, miembro)
+            return miembro
+        finally:
+            del self._en_vuelo[clave]
+
+    def _guardar(self, clave, miembro):
+        vence = time.monotonic() + (self.ttl if miembro is not None else self.ttl_ausente)
+        self._cache[clave] = (vence, miembro)
+        self._cache.move_to_end(clave)
+        while len(self._cache) > self.maximo:
+            self._cache.popitem(last=False)
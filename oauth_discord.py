@@ -0,0 +1,228 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import OrderedDict
+try:
+    import requests as _requests
+    from requests.adapters import HTTPAdapter
+except ImportError:
+    _requests = None
+
+# ─────────────────────────────────────────
+#  CLIENTE OAUTH2 DE DISCORD
+# ─────────────────────────────────────────
+# Una sola sesión HTTP con keep-alive para todo el proceso, timeouts estrictos,
+# reintentos en 429/5xx respetando Retry-After y una caché corta de /users/@me
+# por access token. ClienteOAuthDiscordAsync hace lo mismo sobre aiohttp.
+
+# DISCORD_API_URL permite apuntar a un Discord de pruebas (ver benchmark/)
+DISCORD_API_URL   = os.environ.get("DISCORD_API_URL", "https://discord.com/api").rstrip("/")
+DISCORD_AUTH_URL  = f"{DISCORD_API_URL}/oauth2/authorize"
+DISCORD_TOKEN_URL = f"{DISCORD_API_URL}/oauth2/token"
+DISCORD_USER_URL  = f"{DISCORD_API_URL}/users/@me"
+USER_AGENT        = "DiscordBot (PandaMC, 1.0)"
+
+
+class ErrorOAuth(Exception):
+    def __init__(self, mensaje, status=None, cuerpo=None):
+        super().__init__(mensaje)
+        self.status = status
+        self.cuerpo = cuerpo
+
+
+class _CacheUsuarios:
+    """Caché LRU con TTL de /users/@me. La clave es un hash del token, nunca el token."""
+
+    def __init__(self, ttl, maximo=1024):
+        self.ttl    = ttl
+        self.maximo = maximo
+        self._datos = OrderedDict()
+        self._lock  = threading.Lock()
+
+    @staticmethod
+    def _clave(access_token):
+        return hashlib.sha256(access_token.encode()).hexdigest()
+
+    def obtener(self, access_token):
+        if self.ttl <= 0:
+            return None
+        clave = self._clave(access_token)
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                return None
+            vence, usuario = entrada
+            if vence < time.monotonic():
+                del self._datos[clave]
+                return None
+            self._datos.move_to_end(clave)
+            return usuario
+
+    def guardar(self, access_token, usuario):
+        if self.ttl <= 0:
+            return
+        clave = self._clave(access_token)
+        with self._lock:
+            self._datos[clave] = (time.monotonic() + self.ttl, usuario)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.maximo:
+                self._datos.popitem(last=False)
+
+
+def _espera_reintento(intento, retry_after, espera_max):
+    espera = min(espera_max, 0.5 * (2 ** intento))
+    if retry_after:
+        try:
+            espera = max(espera, float(retry_after))
+        except ValueError:
+            pass
+    return min(espera, espera_max)
+
+
+def _reintentable(status):
+    return status == 429 or status >= 500
+
+
+class _ClienteBase:
+    def __init__(self, client_id, client_secret, redirect_uri, *,
+                 timeout_conexion=3.0, timeout_lectura=7.0, reintentos=2, espera_max=5.0,
+                 cache_ttl=60.0):
+        self.client_id        = client_id
+        self.client_secret    = client_secret
+        self.redirect_uri     = redirect_uri
+        self.timeout_conexion = timeout_conexion
+        self.timeout_lectura  = timeout_lectura
+        self.reintentos       = reintentos
+        self.espera_max       = espera_max
+        self.cache            = _CacheUsuarios(cache_ttl)
+
+    def _datos_token(self, code):
+        return {
+            "client_id":     self.client_id,
+            "client_secret": self.client_secret,
+            "grant_type":    "authorization_code",
+            "code":          code,
+            "redirect_uri":  self.redirect_uri,
+        }
+
+
+class ClienteOAuthDiscord(_ClienteBase):
+    """Cliente síncrono, para usar desde los workers de Flask."""
+
+    def __init__(self, *args, pool=16, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._sesion = None
+        if _requests:
+            self._sesion = _requests.Session()
+            adaptador = HTTPAdapter(pool_connections=2, pool_maxsize=pool, max_retries=0)
+            self._sesion.mount("https://", adaptador)
+            self._sesion.mount("http://", adaptador)
+            self._sesion.headers["User-Agent"] = USER_AGENT
+
+    def _pedir(self, metodo, url, *, data=None, headers=None):
+        headers = dict(headers or {})
+        for intento in range(self.reintentos + 1):
+            status, cabeceras, cuerpo = self._pedir_una_vez(metodo, url, data, headers)
+            if _reintentable(status) and intento < self.reintentos:
+                time.sleep(_espera_reintento(intento, cabeceras.get("Retry-After"), self.espera_max))
+                continue
+            try:
+                contenido = json.loads(cuerpo) if cuerpo else {}
+            except ValueError:
+                raise ErrorOAuth(f"Respuesta no JSON de {url}", status, cuerpo[:200])
+            if status >= 400:
+                raise ErrorOAuth(f"Discord respondió {status} en {url}", status, contenido)
+            return contenido
+
+    def _pedir_una_vez(self, metodo, url, data, headers):
+        try:
+            if self._sesion is not None:
+                r = self._sesion.request(metodo, url, data=data, headers=headers,
+                                         timeout=(self.timeout_conexion, self.timeout_lectura))
+                return r.status_code, r.headers, r.content
+            cuerpo = urllib.parse.urlencode(data).encode() if data else None
+            headers.setdefault("User-Agent", USER_AGENT)
+            req = urllib.request.Request(url, data=cuerpo, headers=headers, method=metodo)
+            try:
+                with urllib.request.urlopen(req, timeout=self.timeout_conexion + self.timeout_lectura) as resp:
+                    return resp.status, resp.headers, resp.read()
+            except urllib.error.HTTPError as e:
+                return e.code, e.headers, e.read()
+        except Exception as e:
+            raise ErrorOAuth(f"Error de red con {url}: {e}") from e
+
+    def canjear_codigo(self, code):
+        """Cambia el `code` del callback por el token. Devuelve el JSON de Discord."""
+        return self._pedir("POST", DISCORD_TOKEN_URL, data=self._datos_token(code),
+                           headers={"Content-Type": "application/x-www-form-urlencoded"})
+
+    def obtener_usuario(self, access_token):
+        usuario = self.cache.obtener(access_token)
+        if usuario is not None:
+            return usuario
+        usuario = self._pedir("GET", DISCORD_USER_URL, headers={"Authorization": f"Bearer {access_token}"})
+        self.cache.guardar(access_token, usuario)
+        return usuario
+
+    def cerrar(self):
+        if self._sesion is not None:
+            self._sesion.close()
+
+
+class ClienteOAuthDiscordAsync(_ClienteBase):
+    """Variante asíncrona sobre aiohttp (ya viene con discord.py)."""
+
+    def __init__(self, *args, pool=16, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool    = pool
+        self._sesion = None
+
+    def _obtener_sesion(self):
+        import aiohttp
+        if self._sesion is None or self._sesion.closed:
+            self._sesion = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool, keepalive_timeout=30),
+                timeout=aiohttp.ClientTimeout(sock_connect=self.timeout_conexion, sock_read=self.timeout_lectura),
+                headers={"User-Agent": USER_AGENT},
+            )
+        return self._sesion
+
+    async def _pedir(self, metodo, url, *, data=None, headers=None):
+        sesion = self._obtener_sesion()
+        for intento in range(self.reintentos + 1):
+            try:
+                async with sesion.request(metodo, url, data=data, headers=headers) as r:
+                    status, cabeceras, cuerpo = r.status, r.headers, await r.read()
+            except Exception as e:
+                raise ErrorOAuth(f"Error de red con {url}: {e}") from e
+            if _reintentable(status) and intento < self.reintentos:
+                await asyncio.sleep(_espera_reintento(intento, cabeceras.get("Retry-After"), self.espera_max))
+                continue
+            try:
+                contenido = json.loads(cuerpo) if cuerpo else {}
+            except ValueError:
+                raise ErrorOAuth(f"Respuesta no JSON de {url}", status, cuerpo[:200])
+            if status >= 400:
+                raise ErrorOAuth(f"Discord respondió {status} en {url}", status, contenido)
+            return contenido
+
+    async def canjear_codigo(self, code):
+        return await self._pedir("POST", DISCORD_TOKEN_URL, data=self._datos_token(code))
+
+    async def obtener_usuario(self, access_token):
+        usuario = self.cache.obtener(access_token)
+        if usuario is not None:
+            return usuario
+        usuario = await self._pedir("GET", DISCORD_USER_URL, headers={"Authorization": f"Bearer {access_token}"})
+        self.cache.guardar(access_token, usuario)
+        return usuario
+
+    async def cerrar(self):
+        if self._sesion is not None and not self._sesion.closed:
+            await self._sesion.close()
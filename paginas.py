@@ -0,0 +1,88 @@
+import gzip
+import hashlib
+import os
+from email.utils import formatdate, parsedate_to_datetime
+
+from flask import Response, request
+try:
+    import brotli as _brotli
+except ImportError:
+    _brotli = None
+
+# ─────────────────────────────────────────
+#  PÁGINAS PRECARGADAS
+# ─────────────────────────────────────────
+# Las páginas HTML se leen una sola vez y se guardan en memoria ya comprimidas
+# (br / gzip). Cada variante lleva su ETag, así que un navegador que ya la tiene
+# recibe un 304 sin cuerpo.
+
+
+class Pagina:
+    def __init__(self, ruta):
+        with open(ruta, "rb") as f:
+            cuerpo = f.read()
+        self.mtime  = int(os.path.getmtime(ruta))
+        self.ultima_modificacion = formatdate(self.mtime, usegmt=True)
+        huella = hashlib.sha256(cuerpo).hexdigest()[:16]
+        self.variantes = {None: (cuerpo, f'"{huella}"')}
+        self.variantes["gzip"] = (gzip.compress(cuerpo, compresslevel=9, mtime=0), f'"{huella}-gz"')
+        if _brotli is not None:
+            self.variantes["br"] = (_brotli.compress(cuerpo, quality=11), f'"{huella}-br"')
+
+
+def _elegir_codificacion(variantes):
+    aceptadas = set()
+    for parte in request.headers.get("Accept-Encoding", "").split(","):
+        cod, _, params = parte.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                pass
+        if cod and q > 0:
+            aceptadas.add(cod.strip().lower())
+    for cod in ("br", "gzip"):
+        if cod in aceptadas and cod in variantes:
+            return cod
+    return None
+
+
+class PaginasEstaticas:
+    def __init__(self, carpeta, nombres, cache_control="private, no-cache"):
+        self.carpeta = carpeta
+        self.cache_control = cache_control
+        self.paginas = {nombre: Pagina(os.path.join(carpeta, nombre)) for nombre in nombres}
+
+    def servir(self, nombre):
+        """Devuelve la página como Response, respetando Accept-Encoding e If-None-Match."""
+        pagina = self.paginas[nombre]
+        cod = _elegir_codificacion(pagina.variantes)
+        cuerpo, etag = pagina.variantes[cod]
+
+        cabeceras = {
+            "ETag": etag,
+            "Last-Modified": pagina.ultima_modificacion,
+            "Cache-Control": self.cache_control,
+            "Vary": "Accept-Encoding, Cookie",
+        }
+        if cod:
+            cabeceras["Content-Encoding"] = cod
+
+        if self._no_modificada(pagina, etag):
+            return Response(status=304, headers=cabeceras)
+        return Response(cuerpo, status=200, headers=cabeceras, mimetype="text/html")
+
+    @staticmethod
+    def _no_modificada(pagina, etag):
+        if_none_match = request.headers.get("If-None-Match")
+        if if_none_match is not None:
+            etiquetas = {e.strip().removeprefix("W/") for e in if_none_match.split(",")}
+            return etag in etiquetas or "*" in etiquetas
+        if_modified_since = request.headers.get("If-Modified-Since")
+        if if_modified_since:
+            try:
+                return parsedate_to_datetime(if_modified_since).timestamp() >= pagina.mtime
+            except (TypeError, ValueError):
+                return False
+        return False
@@ -0,0 +1,108 @@
+import asyncio
+import heapq
+import itertools
+import time
+
+# ─────────────────────────────────────────
+#  PLANIFICADOR DE PLAZOS
+# ─────────────────────────────────────────
+# Un único heap de vencimientos (hora de pared, para sobrevivir reinicios) y una
+# sola tarea que duerme hasta el próximo. Cancelar borra la clave del índice y
+# la entrada del heap se descarta al salir; si la basura supera la mitad del
+# heap, se reconstruye. Cada manejador corre en su propia tarea, que queda
+# guardada hasta que termina (al cerrar se la espera).
+
+
+class PlanificadorPlazos:
+    def __init__(self, almacen=None):
+        self.almacen       = almacen
+        self._heap         = []
+        self._vigentes     = {}   # clave -> (vence, orden, tipo, datos)
+        self._manejadores  = {}
+        self._orden        = itertools.count()
+        self._despertar    = None
+        self._tarea        = None
+        self._corriendo    = set()   # manejadores lanzados que todavía no terminaron
+
+    def registrar(self, tipo, manejador):
+        """`manejador(datos)` es una corrutina que se lanza cuando vence un plazo de ese tipo."""
+        self._manejadores[tipo] = manejador
+
+    def programar(self, clave, tipo, vence, datos=None, persistir=True):
+        """Programa (o reprograma) `clave` para la hora `vence` (timestamp)."""
+        entrada = (vence, next(self._orden), tipo, datos or {})
+        self._vigentes[clave] = entrada
+        heapq.heappush(self._heap, (vence, entrada[1], clave))
+        if persistir and self.almacen is not None:
+            self.almacen.guardar_plazo(clave, tipo, vence, entrada[3])
+        if self._despertar is not None:
+            self._despertar.set()
+
+    def cancelar(self, clave):
+        entrada = self._vigentes.pop(clave, None)
+        if entrada is None:
+            return False
+        if self.almacen is not None:
+            self.almacen.quitar_plazo(clave)
+        if len(self._heap) > 64 and len(self._heap) > 2 * len(self._vigentes):
+            self._heap = [(v, o, c) for c, (v, o, _, _) in self._vigentes.items()]
+            heapq.heapify(self._heap)
+        return True
+
+    def tiene(self, clave):
+        return clave in self._vigentes
+
+    def iniciar(self):
+        if self._tarea is not None:
+            return
+        if self.almacen is not None:
+            for clave, tipo, vence, datos in self.almacen.plazos():
+                if clave not in self._vigentes:
+                    self.programar(clave, tipo, vence, datos, persistir=False)
+        self._despertar = asyncio.Event()
+        self._tarea = asyncio.create_task(self._bucle())
+
+    def _vigente(self, item):
+        vence, orden, clave = item
+        entrada = self._vigentes.get(clave)
+        return entrada is not None and entrada[1] == orden
+
+    async def _bucle(self):
+        while True:
+            self._despertar.clear()
+            while self._heap and not self._vigente(self._heap[0]):
+                heapq.heappop(self._heap)
+            if self._heap and self._heap[0][0] <= time.time():
+                _, _, clave = heapq.heappop(self._heap)
+                _, _, tipo, datos = self._vigentes.pop(clave)
+                if self.almacen is not None:
+                    self.almacen.quitar_plazo(clave)
+                self._despachar(clave, tipo, datos)
+                continue
+            espera = self._heap[0][0] - time.time() if self._heap else None
+            try:
+                await asyncio.wait_for(self._despertar.wait(), espera)
+            except asyncio.TimeoutError:
+                pass
+
+    def _despachar(self, clave, tipo, datos):
+        manejador = self._manejadores.get(tipo)
+        if manejador is None:
+            print(f"⚠️ Plazo {clave} sin manejador para '{tipo}'")
+            return
+        tarea = asyncio.create_task(manejador(datos), name=f"plazo {clave}")
+        self._corriendo.add(tarea)
+        tarea.add_done_callback(self._al_terminar)
+
+    def _al_terminar(self, tarea):
+        self._corriendo.discard(tarea)
+        if not tarea.cancelled() and tarea.exception() is not None:
+            print(f"❌ Error al vencer el {tarea.get_name()}: {tarea.exception()!r}")
+
+    async def cerrar(self):
+        if self._tarea is not None:
+            self._tarea.cancel()
+            await asyncio.gather(self._tarea, return_exceptions=True)
+            self._tarea = None
+        if self._corriendo:
+            await asyncio.wait(list(self._corriendo), timeout=10)
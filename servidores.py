@@ -0,0 +1,189 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+# ─────────────────────────────────────────
+#  CONFIGURACIÓN POR SERVIDOR
+# ─────────────────────────────────────────
+# Índice { guild_id: ajustes } con los canales, el set de preguntas y si las
+# postulaciones están abiertas en cada servidor. Cada servidor parte de los
+# valores por defecto (variables de entorno), encima van los de servidores.json
+# y encima lo que cambió el bot (canales creados, abrir/cerrar), que se guarda
+# en SQLite para sobrevivir reinicios. Con `refresco`, un proceso que no es el
+# bot (la web en modo separado) relee eso cada tantos segundos.
+
+AJUSTES = ("canal_revision_id", "canal_resultados_id", "categoria_postulaciones_id",
+           "canal_hilos_id", "preguntas", "abierto")
+
+
+def _cargar_archivo(ruta):
+    try:
+        with open(ruta, 'r', encoding='utf-8') as f:
+            datos = json.load(f)
+    except FileNotFoundError:
+        return {}
+    return {int(gid): ajustes for gid, ajustes in datos.items()}
+
+
+class ConfigServidores:
+    def __init__(self, almacen, por_defecto, ruta="servidores.json", principal=None, refresco=0):
+        self.almacen     = almacen
+        self.por_defecto = dict(por_defecto)
+        self.principal_id = principal
+        self.refresco    = refresco
+        self._lock       = threading.Lock()
+        self._indice     = {}
+        for gid, ajustes in _cargar_archivo(ruta).items():
+            self._indice[gid] = self._armar(ajustes)
+        self._mezclar_guardados()
+
+    def _mezclar_guardados(self):
+        for gid, ajustes in self.almacen.servidores().items():
+            config = self._indice.get(gid)
+            if config is None:
+                with self._lock:
+                    config = self._indice.setdefault(gid, self._armar({}))
+            config.update(ajustes)
+        if self.principal_id is None and len(self._indice) == 1:
+            self.principal_id = next(iter(self._indice))
+        self._refrescado = time.monotonic()
+
+    def _al_dia(self):
+        if self.refresco and time.monotonic() - self._refrescado >= self.refresco:
+            self._refrescado = time.monotonic()   # un solo hilo relee; el resto sigue con lo que hay
+            self._mezclar_guardados()
+
+    def _armar(self, ajustes):
+        config = dict(self.por_defecto)
+        config.update({k: v for k, v in ajustes.items() if k in AJUSTES})
+        return config
+
+    def obtener(self, guild_id):
+        """Devuelve los ajustes del servidor (los por defecto si todavía no tiene propios)."""
+        self._al_dia()
+        config = self._indice.get(guild_id)
+        if config is None:
+            with self._lock:
+                config = self._indice.setdefault(guild_id, self._armar({}))
+        return config
+
+    def actualizar(self, guild_id, **cambios):
+        """Cambia ajustes de un servidor y los persiste."""
+        config = self.obtener(guild_id)
+        with self._lock:
+            config.update(cambios)
+        self.almacen.guardar_servidor(guild_id, cambios)
+
+    def conocido(self, guild_id):
+        self._al_dia()
+        return guild_id in self._indice
+
+    def registrar(self, guild_id):
+        """Agrega al índice un servidor en el que está el bot (y lo guarda, para que la web lo conozca)."""
+        if not self.conocido(guild_id):
+            self.almacen.guardar_servidor(guild_id, {})
+        self.obtener(guild_id)
+        if self.principal_id is None:
+            self.principal_id = guild_id
+
+    def resolver(self, guild_id=None):
+        """Servidor destino de una postulación: el pedido si se conoce, si no el principal."""
+        self._al_dia()
+        try:
+            guild_id = int(guild_id) if guild_id else None
+        except (TypeError, ValueError):
+            guild_id = None
+        if guild_id and self.conocido(guild_id):
+            return guild_id
+        if self.principal_id is None and self.refresco:
+            # El bot pudo haber registrado el servidor recién: no se espera al próximo refresco
+            self._mezclar_guardados()
+        return self.principal_id
+
+    def abierto(self, guild_id):
+        # Sin servidor resuelto (varios y ninguno principal, o todavía ninguno) no se sabe
+        # qué /cerrar_postulaciones vale: se trata como cerrado
+        if guild_id is None:
+            return False
+        return bool(self.obtener(guild_id).get("abierto", True))
+
+
+# ─────────────────────────────────────────
+#  SETS DE PREGUNTAS (versionados, con recarga en caliente)
+# ─────────────────────────────────────────
+# Cada contenido distinto de un archivo de preguntas es una versión: el hash de
+# su JSON. El archivo se vuelve a mirar (un stat) como mucho cada `intervalo`
+# segundos y solo se relee si cambió; un JSON roto deja la versión anterior.
+# Todas las versiones quedan en el índice (y en SQLite), así una postulación
+# respondida con un set viejo se sigue mostrando con sus propias preguntas.
+
+def version_de(datos):
+    """Id estable de un set: mismo contenido, misma versión."""
+    canonico = json.dumps(datos, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonico.encode("utf-8")).hexdigest()[:12]
+
+
+class SetsPreguntas:
+    def __init__(self, almacen=None, intervalo=2.0):
+        self.almacen    = almacen
+        self.intervalo  = intervalo
+        self._lock      = threading.Lock()
+        self._actuales  = {}   # { archivo: [set, mtime_ns, tamaño, último stat] }
+        self._versiones = {}   # { version: set }
+        if almacen is not None:
+            for version, (archivo, datos) in almacen.sets_preguntas().items():
+                self._versiones[version] = self._armar(version, archivo, datos)
+
+    @staticmethod
+    def _armar(version, archivo, datos):
+        armado = dict(datos)
+        armado["version"] = version
+        armado["archivo"] = archivo
+        return armado
+
+    def actual(self, archivo="preguntas.json"):
+        """Set vigente de un archivo (se recarga solo si el archivo cambió)."""
+        archivo = os.path.normpath(archivo)
+        entrada = self._actuales.get(archivo)
+        ahora = time.monotonic()
+        if entrada is not None and ahora - entrada[3] < self.intervalo:
+            return entrada[0]
+        with self._lock:
+            entrada = self._actuales.get(archivo)
+            if entrada is not None and ahora - entrada[3] < self.intervalo:
+                return entrada[0]
+            try:
+                stat = os.stat(archivo)
+            except OSError:
+                if entrada is None:
+                    raise
+                entrada[3] = ahora   # el archivo desapareció: sigue el último bueno
+                return entrada[0]
+            if entrada is not None and (stat.st_mtime_ns, stat.st_size) == (entrada[1], entrada[2]):
+                entrada[3] = ahora
+                return entrada[0]
+            try:
+                with open(archivo, 'r', encoding='utf-8') as f:
+                    datos = json.load(f)
+            except (OSError, ValueError) as e:
+                if entrada is None:
+                    raise
+                print(f"⚠️ No se pudo recargar {archivo}, sigue la versión {entrada[0]['version']}: {e}")
+                entrada[1:] = [stat.st_mtime_ns, stat.st_size, ahora]
+                return entrada[0]
+            version = version_de(datos)
+            armado = self._versiones.get(version)
+            if armado is None:
+                armado = self._versiones[version] = self._armar(version, archivo, datos)
+                if self.almacen is not None:
+                    self.almacen.guardar_set_preguntas(version, archivo, datos)
+            if entrada is not None and entrada[0] is not armado:
+                print(f"🔄 {archivo}: versión {entrada[0]['version']} → {version}")
+            self._actuales[archivo] = [armado, stat.st_mtime_ns, stat.st_size, ahora]
+            return armado
+
+    def version(self, version):
+        """Set de una versión concreta (None si no se conoce)."""
+        return self._versiones.get(version) if version else None
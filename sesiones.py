@@ -0,0 +1,225 @@
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask.sessions import SessionInterface, SessionMixin, session_json_serializer
+from itsdangerous import BadSignature, Signer
+from werkzeug.datastructures import CallbackDict
+
+# ─────────────────────────────────────────
+#  SESIONES DEL LADO DEL SERVIDOR
+# ─────────────────────────────────────────
+# La cookie solo lleva un id aleatorio firmado; los datos viven en SQLite o en
+# una carpeta de archivos que comparten todos los workers web. Delante hay una
+# caché LRU corta por proceso para no ir al disco en cada request; como otro
+# worker puede cambiar la misma sesión, las entradas de la caché duran pocos
+# segundos. Las sesiones vencen a los `ttl` segundos sin uso.
+
+
+def clave_firma(ruta):
+    """Clave de firma estable: se genera una vez y todos los procesos leen la misma."""
+    try:
+        fd = os.open(ruta, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        for _ in range(50):   # otro proceso la está creando
+            with open(ruta, 'r', encoding='utf-8') as f:
+                clave = f.read().strip()
+            if clave:
+                return clave
+            time.sleep(0.1)
+        raise RuntimeError(f"{ruta} está vacío")
+    clave = secrets.token_hex(32)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(clave)
+    return clave
+
+
+class SesionServidor(CallbackDict, SessionMixin):
+    def __init__(self, datos=None, sid=None, vence=0.0):
+        def al_cambiar(_):
+            self.modified = True
+        super().__init__(datos, al_cambiar)
+        self.sid      = sid
+        self.vence    = vence
+        self.new      = sid is None
+        self.modified = False
+        self.rotar_id = False
+
+    def rotar(self):
+        """Pide un id nuevo al guardar (al iniciar sesión, para que el id de antes no sirva)."""
+        self.rotar_id = True
+        self.modified = True
+
+
+class SesionesSQLite:
+    def __init__(self, ruta):
+        self.ruta   = ruta
+        self._local = threading.local()
+        with self._con() as con:
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS sesiones ("
+                " sid TEXT PRIMARY KEY, datos TEXT NOT NULL, vence REAL NOT NULL)"
+            )
+            con.execute("CREATE INDEX IF NOT EXISTS idx_sesiones_vence ON sesiones(vence)")
+
+    def _con(self):
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = self._local.con = sqlite3.connect(self.ruta, timeout=10, isolation_level=None)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+        return con
+
+    def leer(self, sid):
+        fila = self._con().execute("SELECT datos, vence FROM sesiones WHERE sid = ?", (sid,)).fetchone()
+        return (fila[0], fila[1]) if fila else None
+
+    def guardar(self, sid, datos, vence):
+        self._con().execute("INSERT OR REPLACE INTO sesiones (sid, datos, vence) VALUES (?, ?, ?)",
+                            (sid, datos, vence))
+
+    def borrar(self, sid):
+        self._con().execute("DELETE FROM sesiones WHERE sid = ?", (sid,))
+
+    def purgar(self, ahora):
+        self._con().execute("DELETE FROM sesiones WHERE vence < ?", (ahora,))
+
+
+class SesionesArchivos:
+    def __init__(self, carpeta):
+        self.carpeta = carpeta
+        os.makedirs(carpeta, mode=0o700, exist_ok=True)
+
+    def _ruta(self, sid):
+        return os.path.join(self.carpeta, sid)
+
+    def leer(self, sid):
+        try:
+            with open(self._ruta(sid), 'r', encoding='utf-8') as f:
+                entrada = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return entrada["datos"], entrada["vence"]
+
+    def guardar(self, sid, datos, vence):
+        temporal = f"{self._ruta(sid)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump({"datos": datos, "vence": vence}, f)
+        os.replace(temporal, self._ruta(sid))
+
+    def borrar(self, sid):
+        try:
+            os.remove(self._ruta(sid))
+        except FileNotFoundError:
+            pass
+
+    def purgar(self, ahora):
+        for nombre in os.listdir(self.carpeta):
+            if nombre.endswith(".tmp"):
+                continue
+            entrada = self.leer(nombre)
+            if entrada is not None and entrada[1] < ahora:
+                self.borrar(nombre)
+
+
+class InterfazSesionesServidor(SessionInterface):
+    """SessionInterface de Flask sobre un almacén compartido, con caché LRU por proceso."""
+
+    def __init__(self, almacen, ttl=7 * 86400, cache_max=1024, cache_ttl=5.0, purga_cada=600):
+        self.almacen    = almacen
+        self.ttl        = ttl
+        self.cache_max  = cache_max
+        self.cache_ttl  = cache_ttl
+        self.purga_cada = purga_cada
+        self._cache     = OrderedDict()   # { sid: (leído en, datos serializados, vence) }
+        self._lock      = threading.Lock()
+        self._proxima_purga = time.time() + purga_cada
+
+    def _firmante(self, app):
+        return Signer(app.secret_key, salt="sesion-servidor")
+
+    def _cacheado(self, sid):
+        with self._lock:
+            entrada = self._cache.get(sid)
+            if entrada is None:
+                return None
+            if time.monotonic() - entrada[0] > self.cache_ttl:
+                del self._cache[sid]
+                return None
+            self._cache.move_to_end(sid)
+            return entrada[1], entrada[2]
+
+    def _cachear(self, sid, datos, vence):
+        with self._lock:
+            self._cache[sid] = (time.monotonic(), datos, vence)
+            self._cache.move_to_end(sid)
+            while len(self._cache) > self.cache_max:
+                self._cache.popitem(last=False)
+
+    def _descachear(self, sid):
+        with self._lock:
+            self._cache.pop(sid, None)
+
+    def open_session(self, app, request):
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if not cookie:
+            return SesionServidor()
+        try:
+            sid = self._firmante(app).unsign(cookie).decode()
+        except BadSignature:
+            return SesionServidor()
+        entrada = self._cacheado(sid)
+        if entrada is None:
+            entrada = self.almacen.leer(sid)
+            if entrada is not None:
+                self._cachear(sid, *entrada)
+        if entrada is None or entrada[1] < time.time():
+            return SesionServidor()
+        datos, vence = entrada
+        return SesionServidor(session_json_serializer.loads(datos), sid, vence)
+
+    def save_session(self, app, session, response):
+        nombre = self.get_cookie_name(app)
+        dominio = self.get_cookie_domain(app)
+        ruta = self.get_cookie_path(app)
+        ahora = time.time()
+
+        if not session:
+            if session.sid is not None and session.modified:
+                self.almacen.borrar(session.sid)
+                self._descachear(session.sid)
+                response.delete_cookie(nombre, domain=dominio, path=ruta)
+            return
+
+        # Sin cambios, solo se reescribe para correr el vencimiento cuando ya pasó la mitad del TTL
+        if not session.modified and not session.new and session.vence - ahora > self.ttl / 2:
+            return
+
+        if session.rotar_id and session.sid is not None:
+            self.almacen.borrar(session.sid)
+            self._descachear(session.sid)
+            session.sid = None
+        if session.sid is None:
+            session.sid = secrets.token_urlsafe(32)
+        datos = session_json_serializer.dumps(dict(session))
+        vence = ahora + self.ttl
+        self.almacen.guardar(session.sid, datos, vence)
+        self._cachear(session.sid, datos, vence)
+
+        response.set_cookie(
+            nombre, self._firmante(app).sign(session.sid).decode(),
+            max_age=self.ttl, httponly=self.get_cookie_httponly(app), secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app), domain=dominio, path=ruta,
+        )
+        response.vary.add("Cookie")
+
+        if ahora >= self._proxima_purga:
+            self._proxima_purga = ahora + self.purga_cada
+            try:
+                self.almacen.purgar(ahora)
+            except Exception as e:
+                print(f"⚠️ No se pudieron purgar las sesiones vencidas: {e}")
@@ -0,0 +1,91 @@
+import hashlib
+import random
+import re
+from array import array
+
+from triaje import normalizar
+
+# ─────────────────────────────────────────
+#  RESPUESTAS PARECIDAS (MinHash + LSH)
+# ─────────────────────────────────────────
+# Cada respuesta larga se parte en tejas de 5 caracteres y se resume en una
+# firma MinHash de 64 valores: la proporción de valores iguales entre dos
+# firmas estima la similitud de Jaccard de sus tejas. La firma se corta en 16
+# bandas de 4 filas y cada banda se guarda como una clave en SQLite (con
+# índice): dos respuestas con similitud ~0.5 o más comparten alguna banda con
+# alta probabilidad, así que buscar parecidas es leer unas pocas claves en vez
+# de comparar contra todo el historial. Los candidatos se confirman con la
+# firma completa.
+#
+# En el set de preguntas, el bloque "similares" elige qué preguntas se indexan:
+#   {"preguntas": ["p15", "p17", "p20"], "umbral": 0.6, "minimo_caracteres": 40}
+
+TEJA          = 5
+PERMUTACIONES = 64
+FILAS         = 4
+BANDAS        = PERMUTACIONES // FILAS
+_PRIMO        = (1 << 61) - 1
+
+# Fijas (semilla constante): las firmas guardadas tienen que seguir sirviendo tras reiniciar
+_azar = random.Random(20240517)
+_PERMUTACIONES = [(_azar.randrange(1, _PRIMO), _azar.randrange(0, _PRIMO)) for _ in range(PERMUTACIONES)]
+_NO_PALABRA = re.compile(r"[\W_]+")
+
+
+def _hash64(datos):
+    return int.from_bytes(hashlib.blake2b(datos, digest_size=8).digest(), "little")
+
+
+def tejas(texto):
+    """Conjunto de hashes de las tejas de caracteres del texto normalizado."""
+    plano = _NO_PALABRA.sub(" ", normalizar(texto)).strip()
+    if len(plano) <= TEJA:
+        return {_hash64(plano.encode())} if plano else set()
+    return {_hash64(plano[i:i + TEJA].encode()) for i in range(len(plano) - TEJA + 1)}
+
+
+def firma(texto):
+    """Firma MinHash (tupla de PERMUTACIONES enteros), o None si el texto no tiene tejas."""
+    hashes = tejas(texto)
+    if not hashes:
+        return None
+    return tuple(min((a * h + b) % _PRIMO for h in hashes) for a, b in _PERMUTACIONES)
+
+
+def claves_lsh(firma_):
+    """Una clave entera (con signo, para SQLite) por banda de la firma."""
+    claves = []
+    for banda in range(BANDAS):
+        filas = firma_[banda * FILAS:(banda + 1) * FILAS]
+        datos = banda.to_bytes(1, "little") + b"".join(v.to_bytes(8, "little") for v in filas)
+        claves.append(int.from_bytes(hashlib.blake2b(datos, digest_size=8).digest(), "little", signed=True))
+    return claves
+
+
+def similitud(firma_a, firma_b):
+    """Similitud de Jaccard estimada entre dos firmas."""
+    return sum(1 for a, b in zip(firma_a, firma_b) if a == b) / PERMUTACIONES
+
+
+def a_bytes(firma_):
+    return array("Q", firma_).tobytes()
+
+
+def desde_bytes(datos):
+    valores = array("Q")
+    valores.frombytes(datos)
+    return tuple(valores)
+
+
+def firmas_de(config, respuestas):
+    """{ pregunta: (firma en bytes, claves LSH) } de las respuestas a indexar. Corre en el pool."""
+    minimo = config.get("minimo_caracteres", 40)
+    resultado = {}
+    for pregunta in config.get("preguntas", ()):
+        texto = respuestas.get(pregunta) or ""
+        if len(texto.strip()) < minimo:
+            continue
+        f = firma(texto)
+        if f is not None:
+            resultado[pregunta] = (a_bytes(f), claves_lsh(f))
+    return resultado
@@ -0,0 +1,49 @@
+import asyncio
+
+# ─────────────────────────────────────────
+#  TAREAS DE FONDO
+# ─────────────────────────────────────────
+# Cada tarea de fondo tiene un nombre y corre una sola vez: pedir que arranque
+# una que ya está viva no hace nada, así que se puede llamar desde cualquier
+# evento (setup_hook, reconexiones) sin multiplicar consumidores. Al apagar se
+# cancelan todas y se espera a que terminen.
+
+
+class TareasFondo:
+    def __init__(self):
+        self._tareas = {}   # nombre -> asyncio.Task
+
+    def iniciar(self, nombre, fabrica):
+        """Lanza `fabrica()` (una función que devuelve la corrutina) si `nombre` no está corriendo."""
+        tarea = self._tareas.get(nombre)
+        if tarea is not None and not tarea.done():
+            return tarea
+        tarea = asyncio.create_task(fabrica(), name=nombre)
+        tarea.add_done_callback(self._al_terminar)
+        self._tareas[nombre] = tarea
+        return tarea
+
+    def activa(self, nombre):
+        tarea = self._tareas.get(nombre)
+        return tarea is not None and not tarea.done()
+
+    def _al_terminar(self, tarea):
+        if self._tareas.get(tarea.get_name()) is tarea:
+            del self._tareas[tarea.get_name()]
+        if tarea.cancelled():
+            return
+        error = tarea.exception()
+        if error is not None:
+            print(f"❌ La tarea de fondo {tarea.get_name()} terminó con error: {error!r}")
+
+    def __len__(self):
+        return len(self._tareas)
+
+    async def cerrar(self, espera=10):
+        """Cancela todas las tareas y espera (hasta `espera` segundos) a que terminen."""
+        tareas = [t for t in self._tareas.values() if not t.done()]
+        self._tareas.clear()
+        for tarea in tareas:
+            tarea.cancel()
+        if tareas:
+            await asyncio.wait(tareas, timeout=espera)
@@ -0,0 +1,174 @@
+import multiprocessing
+import re
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# ─────────────────────────────────────────
+#  TRIAJE AUTOMÁTICO DE RESPUESTAS
+# ─────────────────────────────────────────
+# Un puntaje de 0 a 100 y una lista de banderas para que el staff lea primero
+# las postulaciones más sólidas. Las reglas van en el bloque "triaje" de cada
+# set de preguntas (así cambian con la versión del set); cada una tiene un peso
+# y el puntaje es el porcentaje del peso total que se cumplió:
+#
+#   {"reglas": [
+#     {"tipo": "edad", "pregunta": "p1", "minimo": 14, "peso": 25},
+#     {"tipo": "opcion", "pregunta": "p3", "valores": ["Sí"], "peso": 15, "bandera": "No es premium"},
+#     {"tipo": "comandos", "pregunta": "p10", "minimo": 3, "excluidos": ["/ban"], "peso": 15},
+#     {"tipo": "palabras_clave", "pregunta": "p20", "palabras": ["pantalla"], "minimo": 1, "peso": 5},
+#     {"tipo": "largo", "preguntas": ["p8", "p14"], "palabras_minimas": 8, "peso": 20},
+#     {"tipo": "ortografia", "preguntas": ["p8", "p14"], "maximo": 0.08, "peso": 20}]}
+#
+# La ortografía se estima sin diccionario: proporción de palabras que son
+# abreviaturas de chat ("xq", "tmb"), letras estiradas ("holaaa") o palabras
+# comunes escritas sin su tilde ("tambien"). Las listas se pueden ampliar en la regla.
+#
+# Se evalúa en un pool de procesos: el loop del bot solo espera el resultado.
+
+ABREVIATURAS = frozenset((
+    "q", "k", "xq", "pq", "porq", "ke", "tmb", "tb", "tbn", "xd", "ntp", "bn", "pa", "x",
+    "d", "dnd", "npn", "ps", "wey", "alv", "aki", "nse", "nc", "msj", "xfa", "porfa",
+))
+SIN_TILDE = frozenset((
+    "tambien", "despues", "ademas", "aqui", "alli", "asi", "facil", "dificil", "rapido", "razon",
+    "informacion", "situacion", "sancion", "opinion", "accion", "atencion", "administracion",
+    "jamas", "todavia", "quizas", "ultimo", "numero", "pagina", "estan", "sabado", "dia", "dias",
+))
+_PALABRA = re.compile(r"[^\W\d_]+")
+_NUMERO  = re.compile(r"\b\d{1,2}\b")
+_COMANDO = re.compile(r"/[a-z][\w:.-]*")
+_ESTIRADA = re.compile(r"([a-z])\1\1")
+
+
+def normalizar(texto):
+    """Minúsculas y sin tildes, para comparar respuestas escritas de cualquier forma."""
+    texto = unicodedata.normalize("NFKD", (texto or "").lower())
+    return "".join(c for c in texto if not unicodedata.combining(c)).strip()
+
+
+# ── Reglas ──
+# Cada una recibe las respuestas y devuelve (cumple, bandera si no cumple);
+# cumple es None si no hay qué evaluar, y entonces su peso no cuenta.
+
+def _edad(regla, respuestas):
+    texto = normalizar(respuestas.get(regla["pregunta"]))
+    minimo = regla.get("minimo", 14)
+    # "Juan, 15 años" o "tengo 15": se prefiere el número seguido de "año"
+    con_anios = re.search(r"\b(\d{1,2})\s*anos?\b", texto)
+    candidatos = [int(n) for n in _NUMERO.findall(texto) if 6 <= int(n) <= 99]
+    edad = int(con_anios.group(1)) if con_anios else (candidatos[-1] if candidatos else None)
+    if edad is None:
+        return False, regla.get("bandera_sin_dato", "Edad no indicada")
+    if edad < minimo:
+        return False, regla.get("bandera", "Menor de {minimo} años ({edad})").format(minimo=minimo, edad=edad)
+    return True, None
+
+
+def _opcion(regla, respuestas):
+    valor = normalizar(respuestas.get(regla["pregunta"]))
+    if valor in {normalizar(v) for v in regla["valores"]}:
+        return True, None
+    return False, regla.get("bandera", "{pregunta}: «{valor}»").format(
+        pregunta=regla["pregunta"].upper(), valor=respuestas.get(regla["pregunta"], ""))
+
+
+def _comandos(regla, respuestas):
+    excluidos = {normalizar(c) for c in regla.get("excluidos", ())}
+    validos = set(_COMANDO.findall(normalizar(respuestas.get(regla["pregunta"])))) - excluidos
+    minimo = regla.get("minimo", 3)
+    if len(validos) >= minimo:
+        return True, None
+    return False, regla.get("bandera", "{cantidad} comandos válidos (mínimo {minimo})").format(
+        cantidad=len(validos), minimo=minimo)
+
+
+def _palabras_clave(regla, respuestas):
+    texto = normalizar(respuestas.get(regla["pregunta"]))
+    encontradas = sum(1 for p in regla["palabras"] if normalizar(p) in texto)
+    if encontradas >= regla.get("minimo", 1):
+        return True, None
+    return False, regla.get("bandera", "{pregunta}: sin las palabras clave esperadas").format(
+        pregunta=regla["pregunta"].upper())
+
+
+def _largo(regla, respuestas):
+    preguntas = regla["preguntas"]
+    palabras = sum(len(_PALABRA.findall(respuestas.get(p) or "")) for p in preguntas)
+    promedio = palabras / len(preguntas) if preguntas else 0
+    minimo = regla.get("palabras_minimas", 8)
+    if promedio >= minimo:
+        return True, None
+    return False, regla.get("bandera", "Respuestas cortas ({promedio:.0f} palabras en promedio)").format(
+        promedio=promedio, minimo=minimo)
+
+
+def _ortografia(regla, respuestas):
+    abreviaturas = ABREVIATURAS | {normalizar(p) for p in regla.get("abreviaturas", ())}
+    sin_tilde = SIN_TILDE | {normalizar(p) for p in regla.get("sin_tilde", ())}
+    palabras = errores = 0
+    for p in regla["preguntas"]:
+        original = respuestas.get(p) or ""
+        for palabra in _PALABRA.findall(original):
+            palabras += 1
+            plana = normalizar(palabra)
+            # "sin tilde" solo si el original tampoco la tenía
+            if plana in abreviaturas or _ESTIRADA.search(plana) or (plana in sin_tilde and plana == palabra.lower()):
+                errores += 1
+    if not palabras:
+        return None, None   # sin texto no hay qué evaluar; la regla de largo ya lo marca
+    proporcion = errores / palabras
+    maximo = regla.get("maximo", 0.08)
+    if proporcion <= maximo:
+        return True, None
+    return False, regla.get("bandera", "Ortografía descuidada ({porcentaje:.0f}% de palabras)").format(
+        porcentaje=proporcion * 100)
+
+
+REGLAS = {
+    "edad":           _edad,
+    "opcion":         _opcion,
+    "comandos":       _comandos,
+    "palabras_clave": _palabras_clave,
+    "largo":          _largo,
+    "ortografia":     _ortografia,
+}
+
+
+def evaluar(config, respuestas):
+    """(puntaje 0-100, [banderas]) de unas respuestas { "p1": ..., } según el bloque "triaje"."""
+    total = obtenido = 0.0
+    banderas = []
+    for regla in config.get("reglas", ()):
+        funcion = REGLAS.get(regla.get("tipo"))
+        if funcion is None:
+            continue
+        cumple, bandera = funcion(regla, respuestas)
+        if cumple is None:
+            continue
+        peso = float(regla.get("peso", 1))
+        total += peso
+        if cumple:
+            obtenido += peso
+        elif bandera:
+            banderas.append(bandera)
+    puntaje = round(100 * obtenido / total) if total else None
+    return puntaje, banderas
+
+
+def crear_pool(procesos):
+    """Pool para `evaluar`. Con fork, los workers nacen copiando el proceso y solo corren
+    este módulo; donde no hay fork (Windows) se usan hilos, para no reimportar main.py
+    (spawn y forkserver lo vuelven a importar en cada worker).
+
+    Hay que llamarla antes de arrancar hilos: un fork con otro hilo andando puede copiar un
+    lock tomado. Por eso espera a que estén todos los workers, en vez de crearlos a demanda."""
+    if procesos <= 0:
+        return None
+    try:
+        contexto = multiprocessing.get_context("fork")
+    except ValueError:
+        return ThreadPoolExecutor(procesos, thread_name_prefix="triaje")
+    pool = ProcessPoolExecutor(procesos, mp_context=contexto)
+    for futuro in [pool.submit(int) for _ in range(procesos)]:
+        futuro.result()
+    return pool
@@ -0,0 +1,64 @@
+# ─────────────────────────────────────────
+#  VALIDACIÓN DEL FORMULARIO WEB
+# ─────────────────────────────────────────
+# El validador se arma una sola vez por set de preguntas: qué campos existen,
+# cuáles son obligatorios, el largo máximo de cada respuesta y, si corresponde,
+# las opciones válidas. Validar un envío es recorrer esa tupla.
+#
+# En el set de preguntas, el bloque opcional "validacion" ajusta las reglas:
+#   {"largo_maximo": 1024, "opcionales": ["p7"],
+#    "por_pregunta": {"p3": {"opciones": ["Sí", "No"]}, "p1": {"largo_maximo": 200}}}
+
+LARGO_MAXIMO = 1024      # lo que entra en un campo de embed
+BYTES_POR_CARACTER = 4   # peor caso en UTF-8
+MARGEN_JSON = 4096       # claves, comillas y escapes
+
+
+class ValidadorPostulacion:
+    def __init__(self, preguntas_data):
+        reglas       = preguntas_data.get("validacion", {})
+        maximo       = int(reglas.get("largo_maximo", LARGO_MAXIMO))
+        opcionales   = set(reglas.get("opcionales", []))
+        por_pregunta = reglas.get("por_pregunta", {})
+
+        campos = []
+        for i in range(len(preguntas_data.get("preguntas", []))):
+            clave = f"p{i+1}"
+            regla = por_pregunta.get(clave, {})
+            opciones = regla.get("opciones")
+            campos.append((
+                clave,
+                regla.get("requerida", clave not in opcionales),
+                int(regla.get("largo_maximo", maximo)),
+                frozenset(opciones) if opciones else None,
+            ))
+        self.campos     = tuple(campos)
+        self.permitidos = frozenset(c[0] for c in campos)
+        # Tope del cuerpo de /enviar: todas las respuestas al máximo, más el JSON alrededor
+        self.bytes_maximo = BYTES_POR_CARACTER * sum(c[2] for c in campos) + MARGEN_JSON
+
+    def validar(self, datos):
+        """Devuelve (respuestas limpias, errores { campo: motivo }); sin errores, el dict queda vacío."""
+        if not isinstance(datos, dict):
+            return {}, {"_": "formato"}
+        errores = {clave: "desconocido" for clave in datos.keys() - self.permitidos}
+        limpias = {}
+        for clave, requerida, maximo, opciones in self.campos:
+            valor = datos.get(clave)
+            if valor is None:
+                valor = ""
+            if not isinstance(valor, str):
+                errores[clave] = "tipo"
+                continue
+            valor = valor.strip()
+            if not valor:
+                if requerida:
+                    errores[clave] = "requerida"
+                continue
+            if len(valor) > maximo:
+                errores[clave] = "largo"
+            elif opciones is not None and valor not in opciones:
+                errores[clave] = "opcion"
+            else:
+                limpias[clave] = valor
+        return limpias, errores